@@ -30,8 +30,17 @@ def main() -> int:
         from project.gui.screens.d_review import ReviewScreen
         from project.gui.screens.e_printing import PrintingScreen
         from project.gui.screens.f_done import DoneScreen
+        from project.services.health_history import get_health_history
+        from project.services.job_recovery import start_job_recovery
+        from project.services.memory_monitor import get_memory_monitor
         from project.services.storage_cleanup import start_periodic_cleanup
         from project.services.telegram_bot import start_telegram_control_bot
+        from project.services.telegram_notify import start_telegram_outbox, stop_telegram_outbox
+        from project.services.telegram_transport import close_telegram_transport
+        from project.utils.docs.render_pool import shutdown_render_pool
+        from project.utils.metrics import start_metrics_server, stop_metrics_server
+        from project.utils.resource_sampler import get_resource_sampler
+        from project.utils.ui_watchdog import get_ui_watchdog
 
         telegram_bot = None
         cleanup_service = None
@@ -42,7 +51,14 @@ def main() -> int:
         manager.add_frame(screen_ids.PRINTING, PrintingScreen, manager=manager)
         manager.add_frame(screen_ids.DONE, DoneScreen, manager=manager)
         try:
+            start_metrics_server()
+            get_ui_watchdog().start()
+            get_memory_monitor().start()
+            get_resource_sampler().start()
+            get_health_history().start()
+            start_telegram_outbox()
             telegram_bot = start_telegram_control_bot(manager=manager)
+            start_job_recovery()
             cleanup_service = start_periodic_cleanup()
             manager.show_frame(screen_ids.START)
             manager.mainloop()
@@ -51,6 +67,14 @@ def main() -> int:
                 cleanup_service.stop()
             if telegram_bot is not None:
                 telegram_bot.stop()
+            stop_telegram_outbox()
+            close_telegram_transport()
+            shutdown_render_pool()
+            get_health_history().stop()
+            get_resource_sampler().stop()
+            get_memory_monitor().stop()
+            get_ui_watchdog().stop()
+            stop_metrics_server()
         return 0
     except TclError as exc:
         sys.stderr.write(f"[ERROR] Failed to open GUI display: {exc}\n")
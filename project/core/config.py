@@ -170,12 +170,30 @@ DEBUG_DATA = {
 SUBPROCESS_TIMEOUT = _env_int("POTVRDE_SUBPROCESS_TIMEOUT", 60)
 DOCX_CONVERT_TIMEOUT = _env_int("POTVRDE_DOCX_CONVERT_TIMEOUT", 45)
 PRINT_TIMEOUT = _env_int("POTVRDE_PRINT_TIMEOUT", 30)
+# End-to-end budget for one print job; stage timeouts above are caps inside it.
+JOB_DEADLINE_SECONDS = _env_int("POTVRDE_JOB_DEADLINE_SECONDS", 90)
 IDLE_TIMEOUT_MS = _env_int("POTVRDE_IDLE_TIMEOUT_MS", 60_000)
+# The printing screen suspends the idle timer above; after this long a running
+# or failed job there is cancelled and the kiosk returns to the start screen.
+PRINTING_IDLE_TIMEOUT_MS = _env_int("POTVRDE_PRINTING_IDLE_TIMEOUT_MS", 180_000)
 PRINTER_CHECK_RETRY_ATTEMPTS = _env_int("POTVRDE_PRINTER_CHECK_RETRY_ATTEMPTS", 5)
 PRINTER_CHECK_RETRY_DELAY_SECONDS = _env_int("POTVRDE_PRINTER_CHECK_RETRY_DELAY_SECONDS", 3)
 PRINT_RETRY_ATTEMPTS = _env_int("POTVRDE_PRINT_RETRY_ATTEMPTS", 3)
 PRINT_RETRY_DELAY_SECONDS = _env_int("POTVRDE_PRINT_RETRY_DELAY_SECONDS", 3)
 
+# Circuit breakers for Telegram, CUPS and network printers: after this many
+# consecutive failures calls fail fast until the reset period has passed.
+BREAKER_FAILURE_THRESHOLD = _env_int("POTVRDE_BREAKER_FAILURE_THRESHOLD", 3)
+BREAKER_RESET_SECONDS = _env_int("POTVRDE_BREAKER_RESET_SECONDS", 30)
+
+# Each render worker owns an isolated LibreOffice profile, so several DOCX->PDF
+# conversions can run at once. Profiles live on tmpfs when it is available.
+RENDER_POOL_WORKERS = _env_int("POTVRDE_RENDER_POOL_WORKERS", max(1, min(4, os.cpu_count() or 1)))
+RENDER_POOL_QUEUE_SIZE = _env_int("POTVRDE_RENDER_POOL_QUEUE_SIZE", 16)
+RENDER_WORKER_MEMORY_MB = _env_int("POTVRDE_RENDER_WORKER_MEMORY_MB", 1024)
+RENDER_WORKER_MAX_RESTARTS = _env_int("POTVRDE_RENDER_WORKER_MAX_RESTARTS", 1)
+RENDER_PROFILE_DIR = Path(_env("POTVRDE_RENDER_PROFILE_DIR", f"/dev/shm/{APP_ID}/lo-profiles"))
+
 WORKING_HOURS_ENABLED = _env_bool("POTVRDE_WORKING_HOURS_ENABLED", True)
 WORKING_HOURS_START = _env("POTVRDE_WORKING_HOURS_START", "08:00").strip() or "08:00"
 WORKING_HOURS_END = _env("POTVRDE_WORKING_HOURS_END", "15:00").strip() or "15:00"
@@ -186,6 +204,21 @@ SUCCESSFUL_JOB_DOCUMENT_RETENTION_MINUTES = _env_int("POTVRDE_SUCCESSFUL_JOB_DOC
 FAILED_JOB_RETENTION_DAYS = _env_int("POTVRDE_FAILED_JOB_RETENTION_DAYS", 7)
 JOB_JSON_RETENTION_DAYS = _env_int("POTVRDE_JOB_JSON_RETENTION_DAYS", 30)
 
+# Intermediate DOCX/PDF files go to a RAM-backed scratch area; only documents of
+# failed jobs are moved to JOBS_DIR. A full scratch area falls back to disk.
+SCRATCH_ENABLED = _env_bool("POTVRDE_SCRATCH_ENABLED", True)
+SCRATCH_DIR = Path(_env("POTVRDE_SCRATCH_DIR", f"/dev/shm/{APP_ID}/scratch"))
+SCRATCH_MAX_MB = _env_int("POTVRDE_SCRATCH_MAX_MB", 64)
+SCRATCH_JOB_RESERVE_MB = _env_int("POTVRDE_SCRATCH_JOB_RESERVE_MB", 4)
+SCRATCH_STALE_MINUTES = _env_int("POTVRDE_SCRATCH_STALE_MINUTES", 30)
+
+# Startup pass over jobs left in a non-terminal state by a crash or power loss.
+# Resubmitting a certificate nobody is waiting for is opt-in.
+RECOVERY_ENABLED = _env_bool("POTVRDE_RECOVERY_ENABLED", True)
+RECOVERY_TIME_BUDGET_SECONDS = _env_int("POTVRDE_RECOVERY_TIME_BUDGET_SECONDS", 30)
+RECOVERY_RESUBMIT_ENABLED = _env_bool("POTVRDE_RECOVERY_RESUBMIT_ENABLED", False)
+RECOVERY_RESUBMIT_MAX_AGE_MINUTES = _env_int("POTVRDE_RECOVERY_RESUBMIT_MAX_AGE_MINUTES", 10)
+
 STORAGE_ALERT_USED_PERCENT = _env_int("POTVRDE_STORAGE_ALERT_USED_PERCENT", 90)
 STORAGE_CRITICAL_USED_PERCENT = _env_int("POTVRDE_STORAGE_CRITICAL_USED_PERCENT", 95)
 STORAGE_ALERT_MIN_FREE_MB = _env_int("POTVRDE_STORAGE_ALERT_MIN_FREE_MB", 512)
@@ -202,11 +235,51 @@ TELEGRAM_NOTIFY_ONLINE = _env_bool("POTVRDE_TELEGRAM_NOTIFY_ONLINE", True)
 TELEGRAM_NOTIFY_PRINT_JOBS = _env_bool("POTVRDE_TELEGRAM_NOTIFY_PRINT_JOBS", True)
 TELEGRAM_NOTIFY_UPDATE_EVENTS = _env_bool("POTVRDE_TELEGRAM_NOTIFY_UPDATE_EVENTS", True)
 TELEGRAM_ERROR_COOLDOWN_SECONDS = _env_int("POTVRDE_TELEGRAM_ERROR_COOLDOWN_SECONDS", 60)
+# Errors are grouped by fingerprint (ids, paths and numbers ignored): an error
+# that recurs within the cooldown is counted instead of sent, and the counts
+# arrive as one digest every TELEGRAM_ERROR_DIGEST_MINUTES.
+TELEGRAM_ERROR_DIGEST_MINUTES = _env_int("POTVRDE_TELEGRAM_ERROR_DIGEST_MINUTES", 10)
+TELEGRAM_ERROR_FINGERPRINTS = _env_int("POTVRDE_TELEGRAM_ERROR_FINGERPRINTS", 256)
 TELEGRAM_POLL_TIMEOUT = _env_int("POTVRDE_TELEGRAM_POLL_TIMEOUT", 25)
+# All Bot API traffic shares a few keep-alive connections; long polling has its
+# own. The base URL can point at a local fake server (http:// is allowed).
+TELEGRAM_API_BASE_URL = _env("POTVRDE_TELEGRAM_API_BASE_URL", "https://api.telegram.org").strip().rstrip("/") or "https://api.telegram.org"
+TELEGRAM_CONNECT_TIMEOUT = _env_int("POTVRDE_TELEGRAM_CONNECT_TIMEOUT", 10)
+TELEGRAM_POOL_SIZE = _env_int("POTVRDE_TELEGRAM_POOL_SIZE", 2)
+TELEGRAM_KEEPALIVE_IDLE_SECONDS = _env_int("POTVRDE_TELEGRAM_KEEPALIVE_IDLE_SECONDS", 60)
 TELEGRAM_POLL_BACKOFF_MAX_SECONDS = _env_int("POTVRDE_TELEGRAM_POLL_BACKOFF_MAX_SECONDS", 60)
 TELEGRAM_SEND_RETRY_ATTEMPTS = _env_int("POTVRDE_TELEGRAM_SEND_RETRY_ATTEMPTS", 5)
 TELEGRAM_SEND_RETRY_DELAY_SECONDS = _env_int("POTVRDE_TELEGRAM_SEND_RETRY_DELAY_SECONDS", 2)
+# Notifications go through one bounded outbox; same-kind messages arriving
+# within the coalesce window are sent as one. The outbox is kept on disk so it
+# survives offline periods and restarts; very old messages become a summary.
+TELEGRAM_OUTBOX_MAX_MESSAGES = _env_int("POTVRDE_TELEGRAM_OUTBOX_MAX_MESSAGES", 200)
+TELEGRAM_COALESCE_SECONDS = _env_int("POTVRDE_TELEGRAM_COALESCE_SECONDS", 3)
+TELEGRAM_OUTBOX_PERSIST = _env_bool("POTVRDE_TELEGRAM_OUTBOX_PERSIST", True)
+TELEGRAM_OUTBOX_FILE = VAR_DIR / "telegram_outbox.sqlite3"
+TELEGRAM_OUTBOX_OFFLINE_RETRY_SECONDS = _env_int("POTVRDE_TELEGRAM_OUTBOX_OFFLINE_RETRY_SECONDS", 30)
+TELEGRAM_OUTBOX_MAX_AGE_MINUTES = _env_int("POTVRDE_TELEGRAM_OUTBOX_MAX_AGE_MINUTES", 60)
 TELEGRAM_COMMAND_TIMEOUT = _env_int("POTVRDE_TELEGRAM_COMMAND_TIMEOUT", 900)
+# Bot commands run on a small worker pool so slow diagnostics never block
+# polling; update/rollback/restart commands still run alone.
+TELEGRAM_COMMAND_WORKERS = _env_int("POTVRDE_TELEGRAM_COMMAND_WORKERS", 3)
+TELEGRAM_COMMAND_QUEUE_SIZE = _env_int("POTVRDE_TELEGRAM_COMMAND_QUEUE_SIZE", 8)
+TELEGRAM_DIAGNOSTIC_TIMEOUT_SECONDS = _env_int("POTVRDE_TELEGRAM_DIAGNOSTIC_TIMEOUT_SECONDS", 60)
+# /cmd, /eval and /update show their output live by editing one message,
+# continuing in a new message when it fills up.
+TELEGRAM_STREAM_OUTPUT = _env_bool("POTVRDE_TELEGRAM_STREAM_OUTPUT", True)
+TELEGRAM_STREAM_EDIT_INTERVAL_SECONDS = _env_int("POTVRDE_TELEGRAM_STREAM_EDIT_INTERVAL_SECONDS", 3)
+TELEGRAM_STREAM_MESSAGE_CHARS = _env_int("POTVRDE_TELEGRAM_STREAM_MESSAGE_CHARS", 3500)
+# /status answers from a cached health snapshot; probes run concurrently in
+# the background, each bounded by its own timeout.
+HEALTH_REFRESH_SECONDS = _env_int("POTVRDE_HEALTH_REFRESH_SECONDS", 60)
+HEALTH_PROBE_TIMEOUT_SECONDS = _env_int("POTVRDE_HEALTH_PROBE_TIMEOUT_SECONDS", 15)
+HEALTH_STATUS_WAIT_SECONDS = _env_int("POTVRDE_HEALTH_STATUS_WAIT_SECONDS", 3)
+# One 14-byte record per minute in a preallocated circular file (/history);
+# 366 days is about 7 MB.
+HEALTH_HISTORY_ENABLED = _env_bool("POTVRDE_HEALTH_HISTORY_ENABLED", True)
+HEALTH_HISTORY_FILE = Path(_env("POTVRDE_HEALTH_HISTORY_FILE", str(VAR_DIR / "health_history.bin")))
+HEALTH_HISTORY_DAYS = _env_int("POTVRDE_HEALTH_HISTORY_DAYS", 366)
 TELEGRAM_REMOTE_COMMANDS_ENABLED = _env_bool("POTVRDE_TELEGRAM_REMOTE_COMMANDS_ENABLED", True)
 TELEGRAM_REBOOT_COMMAND = _env("POTVRDE_REBOOT_COMMAND", "sudo -n shutdown -r now")
 DEFAULT_UPDATE_REPO_URL = "https://github.com/velimirpaleksic/Raspberry-Pi.git"
@@ -222,10 +295,65 @@ NETWORK_CHECK_TIMEOUT = _env_int("POTVRDE_NETWORK_CHECK_TIMEOUT", 5)
 NETWORK_RECONNECT_COMMAND = _env("POTVRDE_NETWORK_RECONNECT_COMMAND", "")
 CUPS_RESTART_COMMAND = _env("POTVRDE_CUPS_RESTART_COMMAND", "sudo -n systemctl restart cups")
 TELEGRAM_LOG_TAIL_LINES = _env_int("POTVRDE_TELEGRAM_LOG_TAIL_LINES", 80)
+TELEGRAM_LOG_SEARCH_MAX_RESULTS = _env_int("POTVRDE_TELEGRAM_LOG_SEARCH_MAX_RESULTS", 300)
+TELEGRAM_FOLLOW_DEFAULT_MINUTES = _env_int("POTVRDE_TELEGRAM_FOLLOW_DEFAULT_MINUTES", 10)
+TELEGRAM_FOLLOW_MAX_MINUTES = _env_int("POTVRDE_TELEGRAM_FOLLOW_MAX_MINUTES", 60)
+TELEGRAM_FOLLOW_BATCH_SECONDS = _env_int("POTVRDE_TELEGRAM_FOLLOW_BATCH_SECONDS", 5)
 
 ERROR_LOG_DIR = _ensure_dir(VAR_DIR / "logs")
 ERROR_LOG_FILE = ERROR_LOG_DIR / datetime.datetime.now().strftime("error_%d.%m.%Y_%H-%M.log")
 LOG_RETENTION_DAYS = _env_int("POTVRDE_LOG_RETENTION_DAYS", 90)
+# Logging runs on a background thread: records wait in a bounded queue (full
+# queue = record dropped and counted, never a blocked caller) and file writes
+# are buffered until an ERROR record, LOG_BUFFER_RECORDS records or
+# LOG_FLUSH_SECONDS, whichever comes first.
+LOG_QUEUE_SIZE = _env_int("POTVRDE_LOG_QUEUE_SIZE", 2000)
+LOG_BUFFER_RECORDS = _env_int("POTVRDE_LOG_BUFFER_RECORDS", 50)
+LOG_FLUSH_SECONDS = _env_int("POTVRDE_LOG_FLUSH_SECONDS", 2)
+
+# Prometheus-style metrics at http://METRICS_BIND:METRICS_PORT/metrics.
+# Localhost only by default; set the bind address to 0.0.0.0 for a LAN scraper.
+METRICS_ENABLED = _env_bool("POTVRDE_METRICS_ENABLED", True)
+METRICS_BIND = _env("POTVRDE_METRICS_BIND", "127.0.0.1").strip() or "127.0.0.1"
+METRICS_PORT = _env_int("POTVRDE_METRICS_PORT", 9464)
+
+# Span tracing into a ring buffer of the last TRACE_BUFFER_EVENTS spans; /trace
+# sends it as Chrome trace JSON. Turn it off (or use /trace off) to skip recording.
+TRACING_ENABLED = _env_bool("POTVRDE_TRACING_ENABLED", True)
+TRACE_BUFFER_EVENTS = _env_int("POTVRDE_TRACE_BUFFER_EVENTS", 20000)
+
+# /profile samples every thread's stack each PROFILE_INTERVAL_MS for at most
+# PROFILE_MAX_SECONDS.
+PROFILE_DEFAULT_SECONDS = _env_int("POTVRDE_PROFILE_DEFAULT_SECONDS", 10)
+PROFILE_MAX_SECONDS = _env_int("POTVRDE_PROFILE_MAX_SECONDS", 60)
+PROFILE_INTERVAL_MS = _env_int("POTVRDE_PROFILE_INTERVAL_MS", 10)
+
+# A watchdog thread records the Tk main thread's stack whenever the UI stops
+# running its 100 ms timer for UI_STALL_THRESHOLD_MS; /stalls shows the worst.
+UI_WATCHDOG_ENABLED = _env_bool("POTVRDE_UI_WATCHDOG_ENABLED", True)
+UI_STALL_THRESHOLD_MS = _env_int("POTVRDE_UI_STALL_THRESHOLD_MS", 1000)
+
+# Memory samples (RSS, Python heap, GC, threads, Tk widgets) every
+# MEMORY_SAMPLE_SECONDS, kept for MEMORY_HISTORY_HOURS. tracemalloc snapshots
+# every MEMORY_SNAPSHOT_MINUTES name the growing allocation sites; RSS growth
+# past MEMORY_GROWTH_BUDGET_MB over the first snapshot is sent to Telegram.
+MEMORY_MONITOR_ENABLED = _env_bool("POTVRDE_MEMORY_MONITOR_ENABLED", True)
+MEMORY_SAMPLE_SECONDS = _env_int("POTVRDE_MEMORY_SAMPLE_SECONDS", 60)
+MEMORY_HISTORY_HOURS = _env_int("POTVRDE_MEMORY_HISTORY_HOURS", 48)
+MEMORY_TRACEMALLOC_ENABLED = _env_bool("POTVRDE_MEMORY_TRACEMALLOC_ENABLED", True)
+MEMORY_TRACEMALLOC_FRAMES = _env_int("POTVRDE_MEMORY_TRACEMALLOC_FRAMES", 1)
+MEMORY_SNAPSHOT_MINUTES = _env_int("POTVRDE_MEMORY_SNAPSHOT_MINUTES", 30)
+MEMORY_GROWTH_BUDGET_MB = _env_int("POTVRDE_MEMORY_GROWTH_BUDGET_MB", 150)
+MEMORY_ALERT_COOLDOWN_MINUTES = _env_int("POTVRDE_MEMORY_ALERT_COOLDOWN_MINUTES", 360)
+
+# CPU, memory, SD card I/O, temperature and throttling flags every
+# RESOURCE_SAMPLE_SECONDS into a ring buffer of RESOURCE_HISTORY_MINUTES; each
+# job.json gets a summary of its own time window. Without the firmware sysfs
+# node, vcgencmd is asked every RESOURCE_THROTTLE_CHECK_SECONDS.
+RESOURCE_SAMPLER_ENABLED = _env_bool("POTVRDE_RESOURCE_SAMPLER_ENABLED", True)
+RESOURCE_SAMPLE_SECONDS = _env_int("POTVRDE_RESOURCE_SAMPLE_SECONDS", 2)
+RESOURCE_HISTORY_MINUTES = _env_int("POTVRDE_RESOURCE_HISTORY_MINUTES", 60)
+RESOURCE_THROTTLE_CHECK_SECONDS = _env_int("POTVRDE_RESOURCE_THROTTLE_CHECK_SECONDS", 30)
 
 
 def _parse_hhmm(value: str, default: str, name: str) -> datetime.time:
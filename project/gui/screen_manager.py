@@ -1,10 +1,23 @@
 import queue
 import threading
+import time
 import tkinter as tk
 
 from project.core import config
 from project.gui import screen_ids
+from project.services.memory_monitor import get_memory_monitor
+from project.utils import metrics, tracing
 from project.utils.logging_utils import log_error
+from project.utils.ui_watchdog import get_ui_watchdog
+
+
+_UI_PUMP_MS = 100
+# How late the 100 ms UI action pump runs: time the Tk main loop was busy.
+_UI_LAG = metrics.histogram(
+    "kiosk_ui_event_loop_lag_seconds",
+    "Delay of the Tk event loop beyond a scheduled 100 ms timer.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
 
 
 class ScreenManager(tk.Tk):
@@ -81,6 +94,8 @@ class ScreenManager(tk.Tk):
         self._idle_timeout_ms = config.IDLE_TIMEOUT_MS
         self._ui_actions: queue.Queue = queue.Queue()
         self._ui_actions_after_id = None
+        self._ui_pump_due = 0.0
+        self._widget_count_due = 0.0
         self._input_locked = False
         self._input_lock_overlay = None
         self._input_lock_message_var = tk.StringVar(value="")
@@ -109,6 +124,10 @@ class ScreenManager(tk.Tk):
         self.frames[name] = frame
 
     def show_frame(self, name: str, *, force: bool = False):
+        with tracing.span("ScreenManager.show_frame", "ui", frame=name):
+            self._show_frame(name, force=force)
+
+    def _show_frame(self, name: str, *, force: bool = False):
         if self._is_closing:
             return
 
@@ -258,15 +277,34 @@ class ScreenManager(tk.Tk):
             return
         self._ui_actions.put(callback)
 
+    def _count_widgets(self) -> int:
+        count = 0
+        pending = [self]
+        while pending:
+            widget = pending.pop()
+            count += 1
+            try:
+                pending.extend(widget.winfo_children())
+            except Exception:
+                pass
+        return count
+
     def _schedule_ui_action_pump(self) -> None:
         if self._is_closing:
             return
-        self._ui_actions_after_id = self.after(100, self._drain_ui_actions)
+        self._ui_pump_due = time.monotonic() + _UI_PUMP_MS / 1000
+        self._ui_actions_after_id = self.after(_UI_PUMP_MS, self._drain_ui_actions)
 
     def _drain_ui_actions(self) -> None:
         self._ui_actions_after_id = None
         if self._is_closing:
             return
+        lag = max(0.0, time.monotonic() - self._ui_pump_due)
+        _UI_LAG.observe(lag)
+        get_ui_watchdog().beat(lag)
+        if time.monotonic() >= self._widget_count_due:
+            self._widget_count_due = time.monotonic() + max(5, config.MEMORY_SAMPLE_SECONDS)
+            get_memory_monitor().note_widget_count(self._count_widgets())
 
         while True:
             try:
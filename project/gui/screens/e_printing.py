@@ -1,9 +1,12 @@
 import threading
 import tkinter as tk
 
+from project.core import config
 from project.gui import screen_ids
 from project.gui.ui_components import TouchButton
 from project.services.print_job import PrintResult, run_print_job
+from project.utils.cancellation import CancelToken
+from project.utils.circuit_breaker import open_breakers
 
 
 STATUS_TEXT = {
@@ -12,11 +15,14 @@ STATUS_TEXT = {
     "DOCX": "Генеришем DOCX…",
     "PDF": "Чувам PDF…",
     "PRINT": "Шаљем на штампу…",
+    "SUBMITTED": "Документ је послат на штампу…",
     "OUTSIDE_WORKING_HOURS": "Терминал није доступан",
+    "CANCELLED": "Штампа је отказана",
 }
 
 USER_ERROR_TITLE = "ДОШЛО ЈЕ ДО ГРЕШКЕ"
 USER_ERROR_MESSAGE = "Молимо вас, јавите се у секретаријат."
+PRINTER_UNAVAILABLE_MESSAGE = "Штампач тренутно не одговара. Молимо вас, јавите се у секретаријат."
 
 
 class PrintingScreen(tk.Frame):
@@ -29,6 +35,8 @@ class PrintingScreen(tk.Frame):
         self._is_busy = False
         self._last_result: PrintResult | None = None
         self._run_token = 0
+        self._cancel_token: CancelToken | None = None
+        self._timeout_after_id = None
 
         outer = tk.Frame(self, bg="#f5f5f5", padx=24, pady=24)
         outer.pack(fill="both", expand=True)
@@ -48,6 +56,18 @@ class PrintingScreen(tk.Frame):
 
         self.btns = tk.Frame(outer, bg="#f5f5f5")
         self.btns.pack(pady=30)
+        self.cancel_btn = TouchButton(
+            self.btns,
+            text="ОТКАЖИ",
+            font=("Arial", 18, "bold"),
+            padx=28,
+            pady=14,
+            command=self._cancel_and_go_review,
+            bg="#dddddd",
+            fg="#111111",
+            activebackground="#e7e7e7",
+            activeforeground="#111111",
+        )
         self.retry_btn = TouchButton(
             self.btns,
             text="ПОКУШАЈ ПОНОВО",
@@ -80,6 +100,7 @@ class PrintingScreen(tk.Frame):
             return
         if self.manager:
             self.manager.set_idle_suspended(True)
+        self._arm_screen_timeout()
 
         self._last_result = None
         self._set_error_visible(False)
@@ -93,10 +114,55 @@ class PrintingScreen(tk.Frame):
         self._is_busy = True
         self._run_token += 1
         current_token = self._run_token
+        self._cancel_token = CancelToken()
         self.retry_btn.config(state="disabled")
-        self._worker = threading.Thread(target=self._run, args=(form_data, current_token), daemon=True)
+        self.cancel_btn.pack(side="left", padx=10)
+        self._worker = threading.Thread(target=self._run, args=(form_data, current_token, self._cancel_token), daemon=True)
         self._worker.start()
 
+    def on_hide(self):
+        self._disarm_screen_timeout()
+        self._cancel_run("screen left")
+
+    def on_idle_timeout(self):
+        self._disarm_screen_timeout()
+        self._cancel_run("idle timeout")
+        if self.manager:
+            self.manager.clear_state()
+            self.manager.set_idle_suspended(True)
+            self.manager.show_frame(screen_ids.START)
+
+    def _arm_screen_timeout(self):
+        """The manager's idle timer is suspended here, so the screen keeps its own, longer one."""
+        self._disarm_screen_timeout()
+        self._timeout_after_id = self.after(max(1000, config.PRINTING_IDLE_TIMEOUT_MS), self._screen_timeout)
+
+    def _disarm_screen_timeout(self):
+        if self._timeout_after_id is not None:
+            try:
+                self.after_cancel(self._timeout_after_id)
+            except Exception:
+                pass
+            self._timeout_after_id = None
+
+    def _screen_timeout(self):
+        self._timeout_after_id = None
+        if self.manager and self.manager.current_frame is not self:
+            return
+        self.on_idle_timeout()
+
+    def _cancel_run(self, reason: str):
+        """Stop the running job; its result is ignored via the bumped run token."""
+        if not self._is_busy:
+            return
+        self._is_busy = False
+        self._run_token += 1
+        if self._cancel_token is not None:
+            self._cancel_token.cancel(reason)
+            self._cancel_token = None
+        self.cancel_btn.pack_forget()
+        self._set_status("CANCELLED")
+
     def _schedule_ui(self, callback):
         try:
             manager_closing = bool(self.manager and getattr(self.manager, "_is_closing", False))
@@ -107,22 +173,27 @@ class PrintingScreen(tk.Frame):
         except Exception:
             return False
 
-    def _run(self, form_data: dict, run_token: int):
+    def _run(self, form_data: dict, run_token: int, cancel_token: CancelToken):
         def on_status(code: str):
             self._schedule_ui(lambda: self._set_status_if_current(code, run_token))
 
-        result = run_print_job(form_data, on_status=on_status, do_print=True)
+        result = run_print_job(form_data, on_status=on_status, do_print=True, cancel_token=cancel_token)
         self._schedule_ui(lambda: self._finish_run_if_current(result, run_token))
 
     def _set_status_if_current(self, code: str, run_token: int):
         if run_token != self._run_token or not self.winfo_exists():
             return
+        if code == "SUBMITTED":
+            # lp has the document; cancelling now would not stop the printer.
+            self.cancel_btn.pack_forget()
         self._set_status(code)
 
     def _finish_run_if_current(self, result: PrintResult, run_token: int):
         if run_token != self._run_token or not self.winfo_exists():
             return
         self._last_result = result
+        self._cancel_token = None
+        self.cancel_btn.pack_forget()
         if result.ok:
             self._success()
         else:
@@ -179,7 +250,9 @@ class PrintingScreen(tk.Frame):
         else:
             self.status_label.config(text="Дошло је до грешке")
             self.error_title.config(text=USER_ERROR_TITLE)
-            self.error_msg.config(text=USER_ERROR_MESSAGE)
+            # An open CUPS/printer breaker means a retry right now fails too.
+            printer_down = bool(open_breakers("cups") or open_breakers("printer-net:"))
+            self.error_msg.config(text=PRINTER_UNAVAILABLE_MESSAGE if printer_down else USER_ERROR_MESSAGE)
         self.error_detail.config(text="")
         try:
             self.error_detail.pack_forget()
@@ -192,9 +265,11 @@ class PrintingScreen(tk.Frame):
             self.manager.state["last_pdf_path"] = result.pdf_path
             self.manager.state["last_print_error_code"] = result.error_code
             self.manager.set_idle_suspended(True)
+        self._arm_screen_timeout()
 
     def _success(self):
         self._is_busy = False
+        self._disarm_screen_timeout()
         if self.manager:
             self.manager.set_idle_suspended(False)
             self.manager.state["last_job_id"] = self._last_result.job_id if self._last_result else None
@@ -206,6 +281,12 @@ class PrintingScreen(tk.Frame):
             return
         self.on_show()
 
+    def _cancel_and_go_review(self):
+        if self._cancel_token is not None and self._cancel_token.committed:
+            return
+        self._cancel_run("cancelled by user")
+        self._go_review()
+
     def _go_review(self):
         if self.manager:
             self.manager.set_idle_suspended(True)
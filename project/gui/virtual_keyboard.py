@@ -1,36 +1,30 @@
 import logging
 import os
-from logging.handlers import RotatingFileHandler
 from pathlib import Path
 import time
 import tkinter as tk
 from typing import Callable
 
+from project.utils import tracing
+
 
 _TOUCH_DEBUG = os.getenv("POTVRDE_TOUCH_DEBUG", "").strip() in {"1", "true", "TRUE", "yes", "YES", "on", "ON"}
 _KEYBOARD_LOGGER: logging.Logger | None = None
 
 
 def _make_keyboard_log_handler() -> logging.Handler | None:
-    directories: list[Path] = []
     try:
         from project.core import config
-
-        directories.append(config.ERROR_LOG_DIR)
+        from project.utils.logging_utils import json_file_handler
     except Exception:
-        pass
+        return None
+
+    directories: list[Path] = [config.ERROR_LOG_DIR]
     directories.extend([Path("/var/lib/uvjerenja-terminal/logs"), Path.cwd() / "var" / "logs"])
     for directory in directories:
         try:
             directory.mkdir(parents=True, exist_ok=True)
-            handler = RotatingFileHandler(
-                str(directory / "keyboard.log"),
-                maxBytes=1_000_000,
-                backupCount=3,
-                encoding="utf-8",
-            )
-            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s", "%d.%m.%Y %H:%M:%S"))
-            return handler
+            return json_file_handler(directory / "keyboard.log", max_bytes=1_000_000, backup_count=3)
         except Exception:
             continue
     return None
@@ -46,7 +40,13 @@ def keyboard_logger() -> logging.Logger:
     logger.propagate = False
     if not logger.handlers:
         handler = _make_keyboard_log_handler()
-        logger.addHandler(handler if handler is not None else logging.NullHandler())
+        if handler is None:
+            logger.addHandler(logging.NullHandler())
+        else:
+            # Written by the shared logging thread, never on the Tk thread.
+            from project.utils.logging_utils import route_logger
+
+            route_logger(logger, "keyboard", [handler])
     _KEYBOARD_LOGGER = logger
     return logger
 
@@ -482,6 +482,7 @@ class VirtualKeyboard(tk.Frame):
         elif reason in {"no active field", "active field unavailable"}:
             self._log_warning(f"[VK] Key {token!r} ignored: {reason}")
 
+    @tracing.traced("VirtualKeyboard.key_press", "ui")
     def _touch_key_press(self, token: str, key: tk.Frame):
         if self._token_disabled(token):
             key._vk_disabled = True
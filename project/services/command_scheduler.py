@@ -0,0 +1,216 @@
+"""Runs Telegram control commands off the polling thread.
+
+Every command belongs to a concurrency class:
+
+- ``SHARED`` commands (diagnostics, cleanup, shell commands) run side by side,
+  up to ``max_workers`` at a time;
+- ``EXCLUSIVE`` commands (update, rollback, restarts) run alone: they wait for
+  running commands to finish and nothing else starts until they are done.
+
+The queue is FIFO and bounded. A queued exclusive command holds back the
+shared commands behind it, so an update is not starved by a stream of
+/status requests. The same command name is never queued twice.
+
+Python threads cannot be killed, so a command that outlives its timeout is
+reported through ``on_timeout(name, mode, timeout)``. A timed-out shared
+command also gives up its slot (it keeps running in the background and is
+listed as overdue); an exclusive one keeps blocking, because running anything
+next to a half-done update is worse than waiting.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from project.core import config
+from project.utils.logging_utils import log_error
+
+
+SHARED = "shared"
+EXCLUSIVE = "exclusive"
+
+
+@dataclass
+class _Command:
+    id: int
+    name: str
+    target: Callable[[], None]
+    mode: str
+    timeout: float
+    submitted_at: float
+    started_at: float | None = None
+    overdue: bool = False
+    timer: threading.Timer | None = field(default=None, repr=False)
+
+
+class CommandScheduler:
+    def __init__(
+        self,
+        *,
+        max_workers: int | None = None,
+        max_queued: int | None = None,
+        on_timeout: Callable[[str, str, float], None] | None = None,
+    ) -> None:
+        self.max_workers = max(1, max_workers if max_workers is not None else config.TELEGRAM_COMMAND_WORKERS)
+        self.max_queued = max(1, max_queued if max_queued is not None else config.TELEGRAM_COMMAND_QUEUE_SIZE)
+        self.on_timeout = on_timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queue: deque[_Command] = deque()
+        self._running: dict[int, _Command] = {}
+        self._stopped = False
+        self.completed = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    def submit(self, name: str, target: Callable[[], None], *, mode: str = SHARED, timeout: float | None = None) -> tuple[bool, str]:
+        """Queue a command. Returns (accepted, message for the user)."""
+        if mode not in (SHARED, EXCLUSIVE):
+            raise ValueError(f"Unknown command mode: {mode}")
+        command_timeout = float(timeout if timeout is not None else config.TELEGRAM_DIAGNOSTIC_TIMEOUT_SECONDS)
+        with self._lock:
+            if self._stopped:
+                return False, "Command scheduler is stopped."
+            for other in itertools.chain(self._running.values(), self._queue):
+                if other.name == name and not other.overdue:
+                    self.rejected += 1
+                    state = "running" if other.started_at is not None else "queued"
+                    return False, f"{name} is already {state}."
+            if len(self._queue) >= self.max_queued:
+                self.rejected += 1
+                return False, f"Too many queued commands ({len(self._queue)}). Try again later."
+            command = _Command(next(self._ids), name, target, mode, max(1.0, command_timeout), time.time())
+            self._queue.append(command)
+            started = self._dispatch_unlocked()
+            position = self._queue.index(command) + 1 if command in self._queue else 0
+            blocker = self._blocking_description_unlocked() if position else ""
+        for item in started:
+            self._start(item)
+        if position:
+            return True, f"{name} queued (position {position}, waiting for {blocker})."
+        return True, ""
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            self._queue.clear()
+            running = list(self._running.values())
+        for command in running:
+            if command.timer is not None:
+                command.timer.cancel()
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            running = [
+                {
+                    "name": command.name,
+                    "mode": command.mode,
+                    "seconds": round(now - (command.started_at or now), 1),
+                    "timeout": command.timeout,
+                    "overdue": command.overdue,
+                }
+                for command in self._running.values()
+            ]
+            queued = [
+                {"name": command.name, "mode": command.mode, "waiting": round(now - command.submitted_at, 1)}
+                for command in self._queue
+            ]
+            return {
+                "running": running,
+                "queued": queued,
+                "max_workers": self.max_workers,
+                "completed": self.completed,
+                "timed_out": self.timed_out,
+                "rejected": self.rejected,
+            }
+
+    def summary(self) -> str:
+        """Short one-line form for /status."""
+        snap = self.snapshot()
+        running = ", ".join(
+            f"{item['name']}{' (overdue)' if item['overdue'] else ''}" for item in snap["running"]
+        )
+        text = running or "none"
+        if snap["queued"]:
+            text += f"; queued: {', '.join(item['name'] for item in snap['queued'])}"
+        return text
+
+    # -- scheduling --------------------------------------------------------
+
+    def _active_unlocked(self) -> list[_Command]:
+        # Overdue shared commands no longer hold a slot.
+        return [command for command in self._running.values() if not (command.overdue and command.mode == SHARED)]
+
+    def _dispatch_unlocked(self) -> list[_Command]:
+        started: list[_Command] = []
+        while self._queue:
+            active = self._active_unlocked()
+            head = self._queue[0]
+            if any(command.mode == EXCLUSIVE for command in active):
+                break
+            if head.mode == EXCLUSIVE:
+                if active:
+                    break
+            elif len(active) >= self.max_workers:
+                break
+            self._queue.popleft()
+            head.started_at = time.time()
+            self._running[head.id] = head
+            started.append(head)
+            if head.mode == EXCLUSIVE:
+                break
+        return started
+
+    def _blocking_description_unlocked(self) -> str:
+        active = self._active_unlocked()
+        if active:
+            return ", ".join(command.name for command in active)
+        return "earlier commands"
+
+    def _start(self, command: _Command) -> None:
+        command.timer = threading.Timer(command.timeout, self._expire, args=(command,))
+        command.timer.daemon = True
+        command.timer.start()
+        thread = threading.Thread(
+            target=self._run,
+            args=(command,),
+            name=f"telegram-command-{command.name}",
+            daemon=True,
+        )
+        thread.start()
+
+    def _run(self, command: _Command) -> None:
+        try:
+            command.target()
+        except Exception as exc:
+            log_error(f"[Telegram] {command.name} command crashed: {exc}")
+        finally:
+            if command.timer is not None:
+                command.timer.cancel()
+            with self._lock:
+                self._running.pop(command.id, None)
+                self.completed += 1
+                started = [] if self._stopped else self._dispatch_unlocked()
+            for item in started:
+                self._start(item)
+
+    def _expire(self, command: _Command) -> None:
+        with self._lock:
+            if command.id not in self._running:
+                return
+            command.overdue = True
+            self.timed_out += 1
+            started = [] if self._stopped else self._dispatch_unlocked()
+        for item in started:
+            self._start(item)
+        if self.on_timeout is not None:
+            try:
+                self.on_timeout(command.name, command.mode, command.timeout)
+            except Exception as exc:
+                log_error(f"[Telegram] timeout report for {command.name} failed: {exc}")
@@ -0,0 +1,315 @@
+"""On-disk health history: one fixed-width record per minute (/history).
+
+The file is preallocated once for HEALTH_HISTORY_DAYS and never grows: a
+32-byte header followed by ``capacity`` records of ``_RECORD`` (14 bytes),
+so a year is about 7 MB. The record for minute ``m`` (minutes since the
+epoch) lives in slot ``m % capacity``; a slot whose stored minute differs
+from the one asked for is old or empty. Writing is a 14-byte copy into an
+mmap, and a range query reads only the slots of that range.
+
+Per minute it stores free space on the app data disk, printer readiness and
+internet reachability from the health snapshot, jobs finished and failed in
+that minute (deltas of the job counter) and the worst Tk timer lag.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from project.core import config
+from project.services.health_snapshot import get_health_snapshot
+from project.utils import metrics
+from project.utils.log_index import parse_time_arg
+from project.utils.logging_utils import log_error, log_info
+from project.utils.ui_watchdog import get_ui_watchdog
+
+
+_MAGIC = b"KHHIST02"
+_HEADER = struct.Struct("<8sIII8x")
+# minute, disk free MiB, printer ready, internet, jobs done, jobs failed, UI lag ms
+_RECORD = struct.Struct("<IIBBBBH")
+_UNKNOWN_U8 = 0xFF
+_UNKNOWN_U16 = 0xFFFF
+_UNKNOWN_U32 = 0xFFFFFFFF
+SPARK = "▁▂▃▄▅▆▇█"
+
+
+@dataclass(frozen=True)
+class _MetricSpec:
+    field: int
+    title: str
+    unit: str
+    aggregate: str  # "avg", "max", "sum" or "percent"
+    unknown: int
+
+
+METRICS = {
+    "disk": _MetricSpec(1, "free space on app data disk", "MiB", "avg", _UNKNOWN_U32),
+    "printer": _MetricSpec(2, "printer ready", "%", "percent", _UNKNOWN_U8),
+    "internet": _MetricSpec(3, "internet reachable", "%", "percent", _UNKNOWN_U8),
+    "jobs": _MetricSpec(4, "jobs done", "", "sum", _UNKNOWN_U8),
+    "failed": _MetricSpec(5, "jobs failed", "", "sum", _UNKNOWN_U8),
+    "uilag": _MetricSpec(6, "worst UI timer lag", "ms", "max", _UNKNOWN_U16),
+}
+_ALIASES = {"space": "disk", "network": "internet", "failures": "failed", "lag": "uilag", "ui": "uilag"}
+
+
+def _clamp(value: float, limit: int) -> int:
+    return max(0, min(limit - 1, int(round(value))))
+
+
+class HealthHistory:
+    def __init__(self, path: Path | None = None, *, days: int | None = None) -> None:
+        self.path = path or config.HEALTH_HISTORY_FILE
+        self.capacity = max(60, int(days if days is not None else config.HEALTH_HISTORY_DAYS) * 1440)
+        self._size = _HEADER.size + self.capacity * _RECORD.size
+        self._lock = threading.Lock()
+        self._mm: mmap.mmap | None = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._job_totals = (0.0, 0.0)
+
+    # -- file --------------------------------------------------------------
+
+    def _open(self) -> mmap.mmap:
+        if self._mm is not None:
+            return self._mm
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and not self._header_matches():
+            backup = self.path.with_suffix(self.path.suffix + ".old")
+            os.replace(self.path, backup)
+            log_info(f"[History] {self.path.name} has a different layout; moved to {backup.name}")
+        if not self.path.exists():
+            self._create()
+        with open(self.path, "r+b") as handle:
+            self._mm = mmap.mmap(handle.fileno(), self._size)
+        return self._mm
+
+    def _header_matches(self) -> bool:
+        try:
+            with open(self.path, "rb") as handle:
+                header = handle.read(_HEADER.size)
+            if len(header) < _HEADER.size or os.path.getsize(self.path) != self._size:
+                return False
+            magic, record_size, capacity, _ = _HEADER.unpack(header)
+        except (OSError, struct.error):
+            return False
+        return magic == _MAGIC and record_size == _RECORD.size and capacity == self.capacity
+
+    def _create(self) -> None:
+        temporary = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(temporary, "wb") as handle:
+            try:
+                # Reserve the blocks now so a full SD card cannot fail a later write.
+                os.posix_fallocate(handle.fileno(), 0, self._size)
+            except (AttributeError, OSError):
+                handle.truncate(self._size)
+            handle.seek(0)
+            handle.write(_HEADER.pack(_MAGIC, _RECORD.size, self.capacity, 0))
+        os.replace(temporary, self.path)
+        log_info(f"[History] Created {self.path} ({self._size / 1_048_576:.1f} MiB for {self.capacity // 1440} days)")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._mm.close()
+                self._mm = None
+
+    # -- records -----------------------------------------------------------
+
+    def write(self, minute: int, values: tuple[int, int, int, int, int, int]) -> None:
+        record = _RECORD.pack(minute, *values)
+        offset = _HEADER.size + (minute % self.capacity) * _RECORD.size
+        with self._lock:
+            mm = self._open()
+            mm[offset : offset + _RECORD.size] = record
+
+    def read(self, first_minute: int, last_minute: int) -> list[tuple[int, ...]]:
+        """Records for minutes ``first_minute..last_minute`` that exist, oldest first."""
+        first_minute = max(first_minute, last_minute - self.capacity + 1)
+        if last_minute < first_minute:
+            return []
+        start_slot = first_minute % self.capacity
+        count = last_minute - first_minute + 1
+        # At most two contiguous slices: up to the end of the file, then from slot 0.
+        runs = [(start_slot, min(count, self.capacity - start_slot))]
+        if runs[0][1] < count:
+            runs.append((0, count - runs[0][1]))
+        records: list[tuple[int, ...]] = []
+        with self._lock:
+            mm = self._open()
+            for slot, length in runs:
+                begin = _HEADER.size + slot * _RECORD.size
+                records.extend(_RECORD.iter_unpack(mm[begin : begin + length * _RECORD.size]))
+        return [record for record in records if first_minute <= record[0] <= last_minute]
+
+    # -- recorder ----------------------------------------------------------
+
+    def start(self) -> None:
+        if not config.HEALTH_HISTORY_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        # Printer and internet come from the shared snapshot; it is also
+        # started by the Telegram bot, and starting it twice is a no-op.
+        get_health_snapshot().start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="health-history", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(60.5 - time.time() % 60):
+            try:
+                self.record_now()
+            except Exception as exc:
+                log_error(f"[History] Recording failed: {exc}")
+
+    def _collect(self) -> tuple[int, int, int, int, int, int]:
+        try:
+            disk = _clamp(shutil.disk_usage(config.VAR_DIR).free / 1_048_576, _UNKNOWN_U32)
+        except OSError:
+            disk = _UNKNOWN_U32
+        health = get_health_snapshot()
+        printer = health.value("printer", {}) or {}
+        network = health.value("network", {}) or {}
+        printer_ready = _UNKNOWN_U8 if health.is_stale("printer") else int(bool(printer.get("ready")))
+        internet = _UNKNOWN_U8 if health.is_stale("network") else int(bool(network.get("internet")))
+
+        jobs = metrics.REGISTRY.get("kiosk_print_jobs_total")
+        totals = (
+            (jobs.total(outcome="done"), jobs.total(outcome="failed")) if isinstance(jobs, metrics.Counter) else (0.0, 0.0)
+        )
+        done = _clamp(totals[0] - self._job_totals[0], _UNKNOWN_U8)
+        failed = _clamp(totals[1] - self._job_totals[1], _UNKNOWN_U8)
+        self._job_totals = totals
+
+        lag = _clamp(get_ui_watchdog().take_max_lag() * 1000, _UNKNOWN_U16)
+        return disk, printer_ready, internet, done, failed, lag
+
+    def record_now(self) -> None:
+        self.write(int(time.time() // 60), self._collect())
+
+    # -- report ------------------------------------------------------------
+
+    def report(self, metric: str, range_text: str = "", *, width: int = 48, now: float | None = None) -> str:
+        """Sparkline and min/avg/max of ``metric`` over ``range_text`` (default 24h).
+
+        Raises ValueError for an unknown metric or range.
+        """
+        name = _ALIASES.get(metric.strip().lower(), metric.strip().lower())
+        spec = METRICS.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown metric: {metric}")
+        current = time.time() if now is None else now
+        since = _parse_range(range_text or "24h", current)
+        last_minute = int(current // 60)
+        first_minute = max(int(since // 60), last_minute - self.capacity + 1)
+        span = last_minute - first_minute + 1
+        records = self.read(first_minute, last_minute)
+        points = [(record[0], record[spec.field]) for record in records if record[spec.field] != spec.unknown]
+
+        def label(minute: int) -> str:
+            return datetime.fromtimestamp(minute * 60).strftime("%d.%m. %H:%M")
+
+        lines = [
+            f"History: {spec.title}, {label(first_minute)} - {label(last_minute)}",
+            f"Recorded: {len(points)} of {span} minute(s)",
+        ]
+        if not points:
+            lines.append("No data in this range.")
+            return "\n".join(lines)
+
+        columns = max(1, min(width, span))
+        per_column = span / columns
+        buckets: list[list[int]] = [[] for _ in range(columns)]
+        for minute, value in points:
+            buckets[min(columns - 1, int((minute - first_minute) / per_column))].append(value)
+        aggregated = [_aggregate(spec, bucket) for bucket in buckets]
+        lines.append(_sparkline(aggregated, spec))
+        lines.append(f"Each bar: {_format_minutes(per_column)} ({spec.aggregate})")
+
+        values = [value for _, value in points]
+        unit = f" {spec.unit}" if spec.unit and spec.unit != "%" else ""
+        if spec.aggregate == "percent":
+            up = sum(values)
+            lines.append(f"Up {up / len(values) * 100:.1f}% of recorded minutes ({len(values) - up} minute(s) down)")
+        elif spec.aggregate == "sum":
+            busiest = max(aggregated, key=lambda value: value or 0) or 0
+            lines.append(f"Total {sum(values)}, busiest bar {busiest:.0f}, max in one minute {max(values)}")
+        else:
+            lines.append(
+                f"Min {min(values)}{unit}, avg {sum(values) / len(values):.0f}{unit}, "
+                f"max {max(values)}{unit}, latest {values[-1]}{unit}"
+            )
+        return "\n".join(lines)
+
+
+def _aggregate(spec: _MetricSpec, bucket: list[int]) -> float | None:
+    if not bucket:
+        return None
+    if spec.aggregate == "sum":
+        return float(sum(bucket))
+    if spec.aggregate == "max":
+        return float(max(bucket))
+    if spec.aggregate == "percent":
+        return sum(bucket) / len(bucket) * 100
+    return sum(bucket) / len(bucket)
+
+
+def _sparkline(values: list[float | None], spec: _MetricSpec) -> str:
+    present = [value for value in values if value is not None]
+    if spec.aggregate == "percent":
+        low, high = 0.0, 100.0
+    elif spec.aggregate == "sum":
+        low, high = 0.0, max(present)
+    else:
+        low, high = min(present), max(present)
+    scale = (len(SPARK) - 1) / (high - low) if high > low else 0.0
+    return "".join(" " if value is None else SPARK[int((value - low) * scale)] for value in values)
+
+
+def _format_minutes(minutes: float) -> str:
+    if minutes < 90:
+        return f"{minutes:.0f} min"
+    if minutes < 2880:
+        return f"{minutes / 60:.1f} h"
+    return f"{minutes / 1440:.1f} days"
+
+
+def _parse_range(text: str, now: float) -> float:
+    value = text.strip().lower()
+    match = re.match(r"^(\d+)y$", value)
+    if match:
+        return now - int(match.group(1)) * 365 * 86400
+    since = parse_time_arg(value, now=now)
+    if since is None:
+        raise ValueError(f"Unrecognised range: {text}")
+    return since
+
+
+_history_lock = threading.Lock()
+_history: HealthHistory | None = None
+
+
+def get_health_history() -> HealthHistory:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = HealthHistory()
+        return _history
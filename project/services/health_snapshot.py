@@ -0,0 +1,216 @@
+"""Cached health snapshot for /status.
+
+Printer, network, storage and git diagnostics each spawn subprocesses, so
+collecting them one after another made a /status reply take 10+ seconds.
+Here every probe runs in its own thread with its own timeout, all of them at
+once, and the latest result of each is kept with the time it was collected.
+The snapshot is refreshed periodically and on demand; readers get whatever is
+there immediately, with the age of each probe.
+
+A probe that is still running after its timeout is reported as stale; its
+thread is left to finish (Python threads cannot be killed) and its result is
+stored when it arrives. A probe is never started twice at the same time.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from project.core import config
+from project.core.runtime_settings import get_selected_printer
+from project.utils.logging_utils import log_error
+from project.utils.network_status import collect_network_diagnostics
+from project.utils.printing.printer_status import collect_printer_diagnostics
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    name: str
+    value: Any
+    ok: bool
+    error: str
+    collected_at: float
+    duration: float
+
+
+class _Probe:
+    def __init__(self, name: str, func: Callable[[], Any], timeout: float) -> None:
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.result: ProbeResult | None = None
+        self.started_at: float | None = None
+        self.done = threading.Event()
+        self.done.set()
+
+
+class HealthSnapshotService:
+    def __init__(
+        self,
+        *,
+        refresh_seconds: float | None = None,
+        probe_timeout: float | None = None,
+    ) -> None:
+        self.refresh_seconds = max(10.0, float(refresh_seconds if refresh_seconds is not None else config.HEALTH_REFRESH_SECONDS))
+        self.probe_timeout = max(1.0, float(probe_timeout if probe_timeout is not None else config.HEALTH_PROBE_TIMEOUT_SECONDS))
+        self._lock = threading.Lock()
+        self._probes: dict[str, _Probe] = {}
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register_probe(self, name: str, func: Callable[[], Any], *, timeout: float | None = None) -> None:
+        with self._lock:
+            self._probes[name] = _Probe(name, func, max(1.0, float(timeout if timeout is not None else self.probe_timeout)))
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="health-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def refresh(self, *, wait: float = 0.0) -> None:
+        """Start every probe that is not already running; optionally wait for them."""
+        with self._lock:
+            probes = list(self._probes.values())
+            for probe in probes:
+                self._start_unlocked(probe)
+        if wait <= 0:
+            return
+        deadline = time.monotonic() + wait
+        for probe in probes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            probe.done.wait(min(remaining, probe.timeout))
+
+    def ensure_fresh(self, *, max_wait: float | None = None) -> None:
+        """Refresh in the background; block briefly only for probes that never reported."""
+        with self._lock:
+            missing = any(probe.result is None and not self._overdue_unlocked(probe) for probe in self._probes.values())
+        wait = float(max_wait if max_wait is not None else config.HEALTH_STATUS_WAIT_SECONDS) if missing else 0.0
+        self.refresh(wait=wait)
+
+    def get(self, name: str) -> ProbeResult | None:
+        with self._lock:
+            probe = self._probes.get(name)
+            return probe.result if probe is not None else None
+
+    def value(self, name: str, default: Any = None) -> Any:
+        result = self.get(name)
+        # A failed probe keeps the last good value; describe_age() says so.
+        return result.value if result is not None and result.value is not None else default
+
+    def age(self, name: str) -> float | None:
+        result = self.get(name)
+        return None if result is None else max(0.0, time.time() - result.collected_at)
+
+    def is_stale(self, name: str) -> bool:
+        with self._lock:
+            probe = self._probes.get(name)
+            if probe is None or probe.result is None:
+                return True
+            if self._overdue_unlocked(probe):
+                return True
+            return time.time() - probe.result.collected_at > self.refresh_seconds * 3
+
+    def describe_age(self, name: str) -> str:
+        """Short age label for /status, e.g. ``4s`` or ``stale, 3m``."""
+        with self._lock:
+            probe = self._probes.get(name)
+            if probe is None:
+                return "unknown probe"
+            result = probe.result
+            overdue = self._overdue_unlocked(probe)
+            running = not probe.done.is_set()
+        if result is None:
+            return "timed out" if overdue else ("collecting" if running else "no data")
+        text = _format_age(time.time() - result.collected_at)
+        if not result.ok:
+            text += f", failed: {result.error[:80]}"
+        if overdue or time.time() - result.collected_at > self.refresh_seconds * 3:
+            text = f"stale, {text}"
+        return text
+
+    def ages_line(self) -> str:
+        with self._lock:
+            names = list(self._probes)
+        return ", ".join(f"{name} {self.describe_age(name)}" for name in names)
+
+    # -- internals ---------------------------------------------------------
+
+    def _overdue_unlocked(self, probe: _Probe) -> bool:
+        return (
+            not probe.done.is_set()
+            and probe.started_at is not None
+            and time.monotonic() - probe.started_at > probe.timeout
+        )
+
+    def _start_unlocked(self, probe: _Probe) -> None:
+        if not probe.done.is_set():
+            return
+        probe.done.clear()
+        probe.started_at = time.monotonic()
+        thread = threading.Thread(target=self._run_probe, args=(probe,), name=f"health-probe-{probe.name}", daemon=True)
+        thread.start()
+
+    def _run_probe(self, probe: _Probe) -> None:
+        started = time.monotonic()
+        try:
+            value = probe.func()
+            result = ProbeResult(probe.name, value, True, "", time.time(), time.monotonic() - started)
+        except Exception as exc:
+            log_error(f"[Health] {probe.name} probe failed: {exc}")
+            previous = probe.result
+            result = ProbeResult(
+                probe.name,
+                previous.value if previous is not None else None,
+                False,
+                str(exc),
+                time.time(),
+                time.monotonic() - started,
+            )
+        with self._lock:
+            probe.result = result
+            probe.started_at = None
+            probe.done.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as exc:
+                log_error(f"[Health] Snapshot refresh failed: {exc}")
+            self._stop_event.wait(self.refresh_seconds)
+
+
+def _format_age(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    if seconds < 120:
+        return f"{seconds}s"
+    if seconds < 7200:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h"
+
+
+_service_lock = threading.Lock()
+_service: HealthSnapshotService | None = None
+
+
+def get_health_snapshot() -> HealthSnapshotService:
+    """Shared service with the printer and network probes registered."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = HealthSnapshotService()
+            _service.register_probe("printer", lambda: collect_printer_diagnostics(get_selected_printer()))
+            _service.register_probe("network", collect_network_diagnostics)
+        return _service
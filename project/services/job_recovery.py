@@ -0,0 +1,486 @@
+"""Startup recovery for print jobs interrupted by a crash, restart or power loss.
+
+A job directory whose job.json is still in CHECK_PRINTER/BUILD/DOCX/PDF/PRINT
+was abandoned mid-pipeline. The pass below settles every such job:
+
+- PRINT: CUPS is asked about the job, by its recorded request id or, when
+  the crash came between lp and the id being saved, by its title (lp gets
+  ``-t <job_id>``). Queued, printing or completed jobs are done; a job
+  cancelled in CUPS, or one CUPS cannot confirm either way, fails, since
+  printing it again could give the citizen two copies. Only an aborted job,
+  or one CUPS positively does not have, goes on to the rules below.
+- PDF available and resubmission enabled and the job is recent: resubmitted.
+- anything else: failed with INTERRUPTED; its documents follow the normal
+  failed-job retention in storage_cleanup.
+
+Jobs are visited newest first under a fixed time budget. Jobs the budget does
+not reach stay untouched and are picked up on the next start.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from project.core import config
+from project.services.scratch_storage import JobWorkspace, promote_job_document, release_job_workspace
+from project.services.storage_cleanup import cleanup_print_job_documents
+from project.services.telegram_notify import notify_telegram_async
+from project.utils.deadline import Deadline
+from project.utils.logging_utils import log_error, log_info
+from project.utils.printing.print_with_hplip import print_with_hplip
+
+
+TERMINAL_STATES = {"done", "failed", "cancelled"}
+INTERRUPTED_MESSAGE = "Obrada je prekinuta restartom terminala."
+_SUMMARY_JOB_LIMIT = 10
+
+
+@dataclass
+class RecoveryResult:
+    scanned: int = 0
+    done: list[str] = field(default_factory=list)
+    resubmitted: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    not_reached: int = 0
+    errors: list[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def recovered(self) -> int:
+        return len(self.done) + len(self.resubmitted) + len(self.failed)
+
+
+# IPP job-state values (RFC 8011 5.3.7) and the keywords ipptool prints for them.
+_IPP_JOB_STATES = {
+    "3": "queued", "pending": "queued",
+    "4": "queued", "pending-held": "queued",
+    "5": "queued", "processing": "queued",
+    "6": "queued", "processing-stopped": "queued",
+    "7": "cancelled", "canceled": "cancelled",
+    "8": "aborted", "aborted": "aborted",
+    "9": "completed", "completed": "completed",
+}
+
+_IPPTOOL_GET_JOBS = """{
+  OPERATION Get-Jobs
+  GROUP operation-attributes-tag
+  ATTR charset attributes-charset utf-8
+  ATTR naturalLanguage attributes-natural-language en
+  ATTR uri printer-uri $uri
+  ATTR name requesting-user-name $user
+  ATTR keyword which-jobs all
+  ATTR boolean my-jobs false
+  ATTR keyword requested-attributes job-id,job-name,job-state
+  STATUS successful-ok
+  DISPLAY job-id
+  DISPLAY job-name
+  DISPLAY job-state
+}
+"""
+
+
+@dataclass
+class _CupsJobs:
+    """What CUPS knows about our jobs; each listing is loaded once, only if a PRINT job needs it.
+
+    States are "queued", "completed", "cancelled", "aborted" or "unknown"
+    (CUPS could not be asked or does not have the job).
+    """
+
+    loaded: bool = False
+    available: bool = False
+    states: dict[str, str] = field(default_factory=dict)
+    titles_loaded: bool = False
+    titles_available: bool = False
+    by_title: dict[str, tuple[str, str]] = field(default_factory=dict)
+
+    def state_of(self, request_id: str, deadline: Deadline) -> str:
+        if not self.loaded:
+            self.loaded = True
+            completed = _lpstat_job_states("completed", deadline)
+            pending = _lpstat_job_states("not-completed", deadline)
+            self.available = pending is not None and completed is not None
+            self.states = {**(completed or {}), **{job: "queued" for job in (pending or {})}}
+        return self.states.get(request_id, "unknown")
+
+    def find_by_title(self, title: str, deadline: Deadline) -> tuple[str, str] | None:
+        """(CUPS job number, state) of the newest job named ``title``.
+
+        None when CUPS has no such job; raises LookupError when CUPS could not
+        be asked, so the caller never mistakes "no answer" for "not printed".
+        """
+        if not self.titles_loaded:
+            self.titles_loaded = True
+            jobs = _ipptool_jobs(deadline)
+            self.titles_available = jobs is not None
+            for job_number, name, state in jobs or []:
+                current = self.by_title.get(name)
+                if current is None or int(job_number) > int(current[0]):
+                    self.by_title[name] = (job_number, state)
+        if not self.titles_available:
+            raise LookupError("CUPS job list unavailable")
+        return self.by_title.get(title)
+
+
+def _lpstat_job_states(which: str, deadline: Deadline) -> dict[str, str] | None:
+    """Request id -> state from ``lpstat -l``; the Alerts line holds job-state-reasons."""
+    if shutil.which("lpstat") is None or deadline.expired:
+        return None
+    try:
+        proc = subprocess.run(
+            ["lpstat", "-l", "-W", which, "-o"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=deadline.timeout(config.SUBPROCESS_TIMEOUT),
+            env={**os.environ, "LC_ALL": "C"},
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    if proc.returncode != 0:
+        return None
+    states: dict[str, str] = {}
+    current = ""
+    for line in proc.stdout.splitlines():
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            current = line.split()[0]
+            states[current] = "completed"
+            continue
+        text = line.strip()
+        if current and text.startswith("Alerts:"):
+            states[current] = _state_from_reasons(text[len("Alerts:") :].split())
+    return states
+
+
+def _state_from_reasons(reasons: list[str]) -> str:
+    for reason in reasons:
+        if reason.startswith("job-canceled"):
+            return "cancelled"
+        if reason == "aborted-by-system" or reason.startswith("job-aborted") or reason == "job-completed-with-errors":
+            return "aborted"
+    return "completed"
+
+
+def _ipptool_jobs(deadline: Deadline) -> list[tuple[str, str, str]] | None:
+    """(job number, title, state) for every job the local CUPS remembers, or None."""
+    if shutil.which("ipptool") is None or deadline.expired:
+        return None
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix=".test", encoding="utf-8") as test_file:
+            test_file.write(_IPPTOOL_GET_JOBS)
+            test_file.flush()
+            proc = subprocess.run(
+                ["ipptool", "-c", "ipp://localhost/", test_file.name],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=deadline.timeout(config.SUBPROCESS_TIMEOUT),
+                env={**os.environ, "LC_ALL": "C"},
+            )
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    if proc.returncode != 0:
+        return None
+    jobs: list[tuple[str, str, str]] = []
+    for row in csv.reader(proc.stdout.splitlines()):
+        if len(row) < 3 or not row[0].strip().isdigit():
+            continue
+        jobs.append((row[0].strip(), row[1], _IPP_JOB_STATES.get(row[2].strip(), "unknown")))
+    return jobs
+
+
+def _job_dirs_newest_first(root: Path) -> list[Path]:
+    entries: list[tuple[float, str]] = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                try:
+                    if entry.is_symlink() or not entry.is_dir(follow_symlinks=False):
+                        continue
+                    entries.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    entries.sort(reverse=True)
+    return [Path(path) for _, path in entries]
+
+
+def _read_payload(job_dir: Path) -> dict[str, Any] | None:
+    try:
+        payload = json.loads((job_dir / "job.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _write_payload(job_dir: Path, payload: dict[str, Any]) -> None:
+    (job_dir / "job.json").write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _scratch_workspace(job_id: str, job_dir: Path) -> JobWorkspace | None:
+    scratch = config.SCRATCH_DIR / job_id
+    if scratch.is_dir() and not scratch.is_symlink():
+        return JobWorkspace(job_id, scratch, job_dir, True)
+    return None
+
+
+def _find_pdf(payload: dict[str, Any], job_dir: Path, workspace: JobWorkspace | None) -> Path | None:
+    candidates = [payload.get("pdf_path"), job_dir / "output.pdf"]
+    if workspace is not None:
+        candidates.append(workspace.path / "output.pdf")
+    for candidate in candidates:
+        if not candidate:
+            continue
+        path = Path(candidate)
+        try:
+            if path.is_file() and not path.is_symlink() and path.stat().st_size > 0:
+                return path
+        except OSError:
+            continue
+    return None
+
+
+def _discard_documents(job_dir: Path, payload: dict[str, Any], workspace: JobWorkspace | None) -> None:
+    docx = job_dir / "output.docx"
+    pdf = job_dir / "output.pdf"
+    payload.update(cleanup_print_job_documents(job_dir, docx if docx.is_file() else None, pdf if pdf.is_file() else None))
+    if workspace is not None:
+        release_job_workspace(workspace)
+
+
+def _retain_documents(payload: dict[str, Any], workspace: JobWorkspace | None) -> None:
+    if workspace is None:
+        return
+    for key, name in (("docx_path", "output.docx"), ("pdf_path", "output.pdf")):
+        source = workspace.path / name
+        if source.is_file():
+            payload[key] = promote_job_document(workspace, source)
+    release_job_workspace(workspace)
+
+
+def _mark_done(job_dir: Path, payload: dict[str, Any], workspace: JobWorkspace | None, outcome: str) -> None:
+    payload["state"] = "done"
+    payload["printed"] = True
+    payload["recovery"]["outcome"] = outcome
+    _write_payload(job_dir, payload)
+    _discard_documents(job_dir, payload, workspace)
+    _write_payload(job_dir, payload)
+
+
+def _mark_failed(job_dir: Path, payload: dict[str, Any], workspace: JobWorkspace | None, detail: str) -> None:
+    _retain_documents(payload, workspace)
+    payload.update({"state": "failed", "error_code": "INTERRUPTED", "user_message": INTERRUPTED_MESSAGE, "detail": detail})
+    payload["recovery"]["outcome"] = "failed"
+    _write_payload(job_dir, payload)
+
+
+def _resubmit(job_dir: Path, payload: dict[str, Any], workspace: JobWorkspace | None, pdf: Path, deadline: Deadline) -> bool:
+    job_id = str(payload.get("job_id") or job_dir.name)
+    # Record PRINT before lp runs: a crash during the resubmission is then
+    # settled through CUPS next time instead of printing twice. The old
+    # request id belongs to the aborted attempt and must not answer for it.
+    payload["state"] = "PRINT"
+    payload.pop("cups_request_id", None)
+    payload.pop("lp_submitted_at", None)
+    payload["recovery"]["outcome"] = "resubmitting"
+    _write_payload(job_dir, payload)
+
+    def on_submitted(request_id: str) -> None:
+        payload["cups_request_id"] = request_id
+        payload["lp_submitted_at"] = time.time()
+        _write_payload(job_dir, payload)
+
+    result = print_with_hplip(
+        str(pdf),
+        preferred_printer=str(payload.get("resolved_printer") or "").strip() or None,
+        deadline=deadline,
+        title=job_id,
+        on_submitted=on_submitted,
+    )
+    if result.ok:
+        payload["printer_name"] = result.printer_name
+        _mark_done(job_dir, payload, workspace, "resubmitted")
+        return True
+    _mark_failed(job_dir, payload, workspace, f"Resubmission failed: {result.error_code} {result.user_message}".strip())
+    return False
+
+
+def _print_state_in_cups(job_id: str, payload: dict[str, Any], cups: _CupsJobs, deadline: Deadline) -> str:
+    """CUPS state of an interrupted PRINT job, plus "missing" and "unavailable"."""
+    request_id = str(payload.get("cups_request_id") or "").strip()
+    if request_id:
+        state = cups.state_of(request_id, deadline)
+        if state != "unknown":
+            return state
+        return "missing" if cups.available else "unavailable"
+    # Crashed between lp and on_submitted: the job may well be in CUPS under
+    # its title even though no request id was saved.
+    try:
+        found = cups.find_by_title(job_id, deadline)
+    except LookupError:
+        return "unavailable"
+    if found is None:
+        return "missing"
+    job_number, state = found
+    payload["recovery"]["cups_job_id"] = job_number
+    return state if state != "unknown" else "unavailable"
+
+
+def _recover_job(
+    job_dir: Path,
+    payload: dict[str, Any],
+    *,
+    cups: _CupsJobs,
+    deadline: Deadline,
+    now: float,
+    result: RecoveryResult,
+    resubmissions: list[tuple[Path, dict[str, Any], JobWorkspace | None, Path]],
+) -> None:
+    job_id = str(payload.get("job_id") or job_dir.name)
+    previous_state = str(payload.get("state") or "created")
+    workspace = _scratch_workspace(job_id, job_dir)
+    payload["recovery"] = {"at": now, "previous_state": previous_state}
+
+    if previous_state == "PRINT":
+        cups_state = _print_state_in_cups(job_id, payload, cups, deadline)
+        payload["recovery"]["cups_state"] = cups_state
+        if cups_state in ("queued", "completed"):
+            _mark_done(job_dir, payload, workspace, "accepted_by_cups")
+            result.done.append(job_id)
+            return
+        if cups_state == "cancelled":
+            _mark_failed(job_dir, payload, workspace, "Cancelled in CUPS before the restart.")
+            result.failed.append(job_id)
+            return
+        if cups_state == "unavailable":
+            _mark_failed(job_dir, payload, workspace, "Interrupted during PRINT; CUPS could not confirm whether it printed.")
+            result.failed.append(job_id)
+            return
+        # "aborted" or "missing": CUPS did not print it, so it may go again.
+
+    pdf = _find_pdf(payload, job_dir, workspace)
+    age_seconds = now - float(payload.get("created_at") or now)
+    resubmit_window = max(0, config.RECOVERY_RESUBMIT_MAX_AGE_MINUTES) * 60
+    if config.RECOVERY_RESUBMIT_ENABLED and pdf is not None and age_seconds <= resubmit_window:
+        resubmissions.append((job_dir, payload, workspace, pdf))
+        return
+
+    _mark_failed(job_dir, payload, workspace, f"Interrupted during {previous_state}.")
+    result.failed.append(job_id)
+
+
+def recover_interrupted_jobs(*, started_before: float | None = None, budget_seconds: float | None = None) -> RecoveryResult:
+    """Settle jobs left in a non-terminal state.
+
+    Jobs created at or after ``started_before`` belong to the running app and
+    are never touched.
+    """
+    deadline = Deadline(config.RECOVERY_TIME_BUDGET_SECONDS if budget_seconds is None else budget_seconds)
+    cutoff = time.time() if started_before is None else started_before
+    result = RecoveryResult()
+    cups = _CupsJobs()
+    resubmissions: list[tuple[Path, dict[str, Any], JobWorkspace | None, Path]] = []
+
+    job_dirs = _job_dirs_newest_first(config.JOBS_DIR)
+    for index, job_dir in enumerate(job_dirs):
+        if deadline.expired:
+            result.not_reached = len(job_dirs) - index
+            break
+        result.scanned += 1
+        payload = _read_payload(job_dir)
+        if payload is None:
+            continue
+        state = str(payload.get("state") or "").lower()
+        if state in TERMINAL_STATES:
+            continue
+        if float(payload.get("created_at") or 0) >= cutoff:
+            continue
+        try:
+            _recover_job(
+                job_dir,
+                payload,
+                cups=cups,
+                deadline=deadline,
+                now=time.time(),
+                result=result,
+                resubmissions=resubmissions,
+            )
+        except Exception as exc:
+            result.errors.append(f"{job_dir.name}: {exc}")
+
+    for job_dir, payload, workspace, pdf in resubmissions:
+        job_id = str(payload.get("job_id") or job_dir.name)
+        try:
+            if deadline.expired:
+                _mark_failed(job_dir, payload, workspace, "Recovery time budget exhausted before resubmission.")
+                result.failed.append(job_id)
+            elif _resubmit(job_dir, payload, workspace, pdf, deadline):
+                result.resubmitted.append(job_id)
+            else:
+                result.failed.append(job_id)
+        except Exception as exc:
+            result.errors.append(f"{job_id}: {exc}")
+
+    result.elapsed_seconds = deadline.elapsed()
+    return result
+
+
+def format_recovery_summary(result: RecoveryResult) -> str:
+    lines = [
+        "Uvjerenja Terminal recovered interrupted print jobs.",
+        f"Done (accepted by CUPS): {len(result.done)}",
+        f"Resubmitted: {len(result.resubmitted)}",
+        f"Failed (INTERRUPTED): {len(result.failed)}",
+        f"Scanned: {result.scanned} in {result.elapsed_seconds:.1f}s",
+    ]
+    if result.not_reached:
+        lines.append(f"Not reached within budget: {result.not_reached} (next start)")
+    for label, job_ids in (("Done", result.done), ("Resubmitted", result.resubmitted), ("Failed", result.failed)):
+        if job_ids:
+            shown = ", ".join(job_ids[:_SUMMARY_JOB_LIMIT])
+            more = f" (+{len(job_ids) - _SUMMARY_JOB_LIMIT})" if len(job_ids) > _SUMMARY_JOB_LIMIT else ""
+            lines.append(f"{label}: {shown}{more}")
+    if result.errors:
+        lines.append(f"Errors: {len(result.errors)}")
+        lines.extend(result.errors[:3])
+    return "\n".join(lines)
+
+
+def _run_recovery(started_before: float) -> None:
+    try:
+        result = recover_interrupted_jobs(started_before=started_before)
+    except Exception as exc:
+        log_error(f"[Recovery] Startup job recovery failed: {exc}")
+        return
+    log_info(
+        f"[Recovery] scanned={result.scanned} done={len(result.done)} resubmitted={len(result.resubmitted)} "
+        f"failed={len(result.failed)} not_reached={result.not_reached} errors={len(result.errors)} "
+        f"in {result.elapsed_seconds:.1f}s"
+    )
+    for error in result.errors:
+        log_error(f"[Recovery] {error}")
+    if result.recovered or result.errors:
+        notify_telegram_async(format_recovery_summary(result), kind="status")
+
+
+def start_job_recovery() -> threading.Thread | None:
+    if not config.RECOVERY_ENABLED:
+        return None
+    # Captured before the UI can start a job, so recovery never sees one.
+    started_before = time.time()
+    thread = threading.Thread(target=_run_recovery, args=(started_before,), name="job-recovery", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,278 @@
+"""Job history statistics for /stats.
+
+job.json files are loaded into columns (``array`` module, one entry per job,
+sorted by creation time); string fields such as ``razlog`` and ``error_code``
+are stored as small integer codes into a per-column value list. A period is
+found with two binary searches on the time column and aggregated over that
+slice with C-level helpers (``Counter``, ``compress``, ``sorted``), so a query
+over tens of thousands of jobs stays in the low milliseconds.
+
+Loading is incremental: a job whose job.json reached a terminal state is
+parsed once and never read again; only new and still-running jobs are
+(re)read on the next query. Jobs whose directory was removed by cleanup drop
+out of the columns.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import compress
+from pathlib import Path
+
+from project.core import config
+from project.utils.log_index import parse_time_arg
+
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+OUTCOMES = (*TERMINAL_STATES, "running")
+
+
+@dataclass(frozen=True)
+class _JobRow:
+    created_at: float
+    finished_at: float
+    duration: float
+    outcome: int
+    razlog: str
+    razred: str
+    error_code: str
+
+
+def _parse_job(path: Path) -> _JobRow | None:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    try:
+        created_at = float(payload.get("created_at") or 0)
+    except (TypeError, ValueError):
+        return None
+    if created_at <= 0:
+        return None
+    state = str(payload.get("state") or "").lower()
+    outcome = TERMINAL_STATES.index(state) if state in TERMINAL_STATES else len(TERMINAL_STATES)
+    try:
+        finished_at = float(payload.get("finished_at") or "nan")
+    except (TypeError, ValueError):
+        finished_at = math.nan
+    duration = finished_at - created_at if not math.isnan(finished_at) else math.nan
+    if math.isnan(duration):
+        # Jobs written before finished_at existed still have their budget.
+        budget = payload.get("budget") if isinstance(payload.get("budget"), dict) else {}
+        try:
+            duration = float(budget.get("elapsed_seconds")) if state in TERMINAL_STATES else math.nan
+        except (TypeError, ValueError):
+            duration = math.nan
+    form_data = payload.get("form_data") if isinstance(payload.get("form_data"), dict) else {}
+    return _JobRow(
+        created_at,
+        finished_at,
+        duration,
+        outcome,
+        str(form_data.get("razlog") or "-").strip() or "-",
+        str(form_data.get("razred") or "-").strip() or "-",
+        str(payload.get("error_code") or "") if outcome != 0 else "",
+    )
+
+
+class _Dictionary:
+    """String column values stored once; rows keep the index."""
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class JobHistory:
+    def __init__(self, jobs_dir: Path | None = None) -> None:
+        self.jobs_dir = jobs_dir or config.JOBS_DIR
+        self._lock = threading.Lock()
+        self._rows: dict[str, _JobRow] = {}
+        self._open_mtimes: dict[str, int] = {}
+        self._dirty = True
+        self._razlog = _Dictionary()
+        self._razred = _Dictionary()
+        self._error_code = _Dictionary()
+        self._created = array("d")
+        self._duration = array("d")
+        self._outcome = array("B")
+        self._razlog_col = array("H")
+        self._razred_col = array("H")
+        self._error_col = array("H")
+
+    def refresh(self) -> int:
+        """Read new and unfinished jobs; returns the number of job.json files parsed."""
+        with self._lock:
+            return self._refresh_unlocked()
+
+    def _refresh_unlocked(self) -> int:
+        try:
+            names = {entry.name for entry in os.scandir(self.jobs_dir) if entry.is_dir(follow_symlinks=False)}
+        except OSError:
+            names = set()
+        parsed = 0
+        removed = [job_id for job_id in self._rows if job_id not in names]
+        for job_id in removed:
+            del self._rows[job_id]
+            self._open_mtimes.pop(job_id, None)
+        if removed:
+            self._dirty = True
+        for job_id in names:
+            if job_id in self._rows and job_id not in self._open_mtimes:
+                continue  # Terminal jobs do not change any more.
+            path = self.jobs_dir / job_id / "job.json"
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if self._open_mtimes.get(job_id) == mtime:
+                continue
+            row = _parse_job(path)
+            parsed += 1
+            if row is None:
+                continue
+            self._rows[job_id] = row
+            if row.outcome < len(TERMINAL_STATES):
+                self._open_mtimes.pop(job_id, None)
+            else:
+                self._open_mtimes[job_id] = mtime
+            self._dirty = True
+        if self._dirty:
+            self._build_columns()
+        return parsed
+
+    def _build_columns(self) -> None:
+        rows = sorted(self._rows.values(), key=lambda row: row.created_at)
+        self._created = array("d", (row.created_at for row in rows))
+        self._duration = array("d", (row.duration for row in rows))
+        self._outcome = array("B", (row.outcome for row in rows))
+        self._razlog_col = array("H", (self._razlog.code(row.razlog) for row in rows))
+        self._razred_col = array("H", (self._razred.code(row.razred) for row in rows))
+        self._error_col = array("H", (self._error_code.code(row.error_code) for row in rows))
+        self._dirty = False
+
+    def stats(self, since: float | None = None, until: float | None = None) -> dict:
+        with self._lock:
+            self._refresh_unlocked()
+            lo = 0 if since is None else bisect.bisect_left(self._created, since)
+            hi = len(self._created) if until is None else bisect.bisect_right(self._created, until)
+            hi = max(lo, hi)
+            outcome = self._outcome[lo:hi]
+            duration = self._duration[lo:hi]
+            razlog = self._razlog_col[lo:hi]
+            razred = self._razred_col[lo:hi]
+            errors = self._error_col[lo:hi]
+            razlog_values = list(self._razlog.values)
+            razred_values = list(self._razred.values)
+            error_values = list(self._error_code.values)
+            total_jobs = len(self._created)
+
+        by_outcome = Counter(outcome)
+        done_mask = [value == 0 for value in outcome]
+        failed_mask = [value == 1 for value in outcome]
+        done_durations = sorted(value for value in compress(duration, done_mask) if not math.isnan(value))
+        return {
+            "total": hi - lo,
+            "history_size": total_jobs,
+            "outcomes": {name: by_outcome.get(index, 0) for index, name in enumerate(OUTCOMES)},
+            "by_razlog": _named_counts(Counter(compress(razlog, done_mask)), razlog_values),
+            "by_razred": _named_counts(Counter(compress(razred, done_mask)), razred_values),
+            "failures_by_error_code": _named_counts(Counter(compress(errors, failed_mask)), error_values),
+            "p50": _percentile(done_durations, 0.50),
+            "p95": _percentile(done_durations, 0.95),
+        }
+
+
+def _named_counts(counts: Counter, values: list[str]) -> list[tuple[str, int]]:
+    return [(values[code], count) for code, count in counts.most_common()]
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def period_range(period: str, *, now: float | None = None) -> tuple[str, float | None]:
+    """Return (label, since) for ``today``, ``yesterday``, ``week``, ``month``, ``all`` or a /logsearch time.
+
+    Raises ValueError for anything else.
+    """
+    current = time.time() if now is None else now
+    value = (period or "today").strip().lower()
+    midnight = datetime.fromtimestamp(current).replace(hour=0, minute=0, second=0, microsecond=0)
+    if value in ("today", "danas"):
+        return "today", midnight.timestamp()
+    if value in ("yesterday", "juce"):
+        return "since yesterday", (midnight - timedelta(days=1)).timestamp()
+    if value in ("week", "sedmica"):
+        return "this week", (midnight - timedelta(days=midnight.weekday())).timestamp()
+    if value in ("month", "mjesec"):
+        return "this month", midnight.replace(day=1).timestamp()
+    if value in ("all", "sve"):
+        return "all kept jobs", None
+    return f"since {period.strip()}", parse_time_arg(value, now=current)
+
+
+def format_stats(label: str, since: float | None, data: dict, elapsed_ms: float) -> str:
+    outcomes = data["outcomes"]
+    total = data["total"]
+    since_text = f" (from {datetime.fromtimestamp(since).strftime('%d.%m.%Y %H:%M')})" if since is not None else ""
+    lines = [f"Stats: {label}{since_text}"]
+    lines.append(
+        f"Jobs: {total} (done {outcomes['done']}, failed {outcomes['failed']}, "
+        f"cancelled {outcomes['cancelled']}, running {outcomes['running']})"
+    )
+    if total:
+        lines.append(f"Failure rate: {outcomes['failed'] / total * 100:.1f}%")
+    if data["p50"] is not None:
+        lines.append(f"End-to-end (done): p50 {data['p50']:.1f}s, p95 {data['p95']:.1f}s")
+
+    def section(title: str, items: list[tuple[str, int]], *, share_of: int = 0) -> None:
+        if not items:
+            return
+        lines.append("")
+        lines.append(title)
+        for name, count in items[:12]:
+            share = f" ({count / share_of * 100:.1f}%)" if share_of else ""
+            lines.append(f"  {name or '-'}: {count}{share}")
+        if len(items) > 12:
+            lines.append(f"  ... {len(items) - 12} more")
+
+    section("Issued by razlog:", data["by_razlog"])
+    section("Issued by razred:", data["by_razred"])
+    section("Failures by error_code (share of all jobs):", data["failures_by_error_code"], share_of=total)
+    lines.append("")
+    lines.append(f"Query: {elapsed_ms:.0f} ms over {data['history_size']} kept job(s).")
+    return "\n".join(lines)
+
+
+_history_lock = threading.Lock()
+_history: JobHistory | None = None
+
+
+def get_job_history() -> JobHistory:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = JobHistory()
+        return _history
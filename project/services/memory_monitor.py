@@ -0,0 +1,326 @@
+"""Memory monitoring for long kiosk uptimes (/memory).
+
+Every MEMORY_SAMPLE_SECONDS a sample of RSS, Python heap (allocated blocks
+and tracemalloc's traced size), GC generation counts, thread count and Tk
+widget count goes into a ring buffer covering MEMORY_HISTORY_HOURS. The
+widget count is reported by the Tk thread itself (``note_widget_count``),
+because Tk must not be touched from this thread.
+
+With MEMORY_TRACEMALLOC_ENABLED a tracemalloc snapshot is taken every
+MEMORY_SNAPSHOT_MINUTES. The first one, after startup has loaded python-docx
+and built the screens, is the baseline; later snapshots are compared with the
+previous one and with the baseline to name the lines whose allocations grow.
+When RSS is more than MEMORY_GROWTH_BUDGET_MB above the baseline an alert
+with the top growth sites goes to Telegram, at most once per
+MEMORY_ALERT_COOLDOWN_MINUTES.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+
+from project.core import config
+from project.services.storage_cleanup import format_bytes
+from project.services.telegram_notify import notify_telegram_async
+from project.utils import metrics
+from project.utils.logging_utils import log_error, log_info
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_IGNORED_FILES = frozenset(
+    (
+        tracemalloc.__file__,
+        "<frozen importlib._bootstrap>",
+        "<frozen importlib._bootstrap_external>",
+        "<unknown>",
+    )
+)
+
+_RSS = metrics.gauge("kiosk_process_rss_bytes", "Resident set size of the kiosk process.")
+_THREADS = metrics.gauge("kiosk_python_threads", "Live Python threads.")
+_WIDGETS = metrics.gauge("kiosk_tk_widgets", "Tk widgets under the main window.")
+_TRACED = metrics.gauge("kiosk_python_traced_bytes", "Python memory traced by tracemalloc.")
+
+
+@dataclass(frozen=True)
+class MemorySample:
+    at: float
+    rss: int
+    blocks: int
+    traced: int
+    gc_counts: tuple[int, int, int]
+    threads: int
+    widgets: int
+
+
+def read_rss() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as handle:
+            return int(handle.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        # Peak, not current, but better than nothing off Linux.
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+    except Exception:
+        return 0
+
+
+_PATH_PREFIXES = tuple(
+    prefix + os.sep
+    for prefix in (
+        str(config.PROJECT_ROOT.parent),
+        sysconfig.get_paths().get("purelib", ""),
+        sysconfig.get_paths().get("stdlib", ""),
+    )
+    if prefix
+)
+
+# Allocation sites of one snapshot: (filename, lineno) -> (bytes, blocks).
+Sites = dict[tuple[str, int], tuple[int, int]]
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix) :]
+    return filename
+
+
+def take_sites() -> Sites:
+    """Group the current tracemalloc traces by line; an empty dict when tracing is off.
+
+    Only these per-line totals are kept, not the snapshot with every trace.
+    """
+    if not tracemalloc.is_tracing():
+        return {}
+    # Grouping first and dropping ignored files afterwards is several times
+    # faster than Snapshot.filter_traces, which tests every trace in Python.
+    sites: Sites = {}
+    for stat in tracemalloc.take_snapshot().statistics("lineno"):
+        frame = stat.traceback[-1]
+        if frame.filename not in _IGNORED_FILES:
+            sites[(frame.filename, frame.lineno)] = (stat.size, stat.count)
+    return sites
+
+
+def format_growth(current: Sites, previous: Sites, limit: int = 8) -> list[str]:
+    growth = []
+    for site, (size, count) in current.items():
+        old_size, old_count = previous.get(site, (0, 0))
+        if size > old_size:
+            growth.append((size - old_size, count - old_count, size, site))
+    growth.sort(reverse=True)
+    lines = [
+        f"  +{format_bytes(diff)} ({blocks:+d} blocks, now {format_bytes(size)}) {_short_path(filename)}:{lineno}"
+        for diff, blocks, size, (filename, lineno) in growth[:limit]
+    ]
+    return lines or ["  (no growth)"]
+
+
+def _trend_per_hour(samples: list[MemorySample]) -> float | None:
+    """Least-squares RSS slope in bytes per hour."""
+    if len(samples) < 3 or samples[-1].at - samples[0].at < 600:
+        return None
+    mean_t = sum(sample.at for sample in samples) / len(samples)
+    mean_r = sum(sample.rss for sample in samples) / len(samples)
+    num = sum((sample.at - mean_t) * (sample.rss - mean_r) for sample in samples)
+    den = sum((sample.at - mean_t) ** 2 for sample in samples)
+    return num / den * 3600 if den else None
+
+
+class MemoryMonitor:
+    def __init__(self) -> None:
+        self.sample_seconds = max(5, config.MEMORY_SAMPLE_SECONDS)
+        self.snapshot_seconds = max(60, config.MEMORY_SNAPSHOT_MINUTES * 60)
+        history = max(1, int(config.MEMORY_HISTORY_HOURS * 3600 / self.sample_seconds))
+        self._samples: deque[MemorySample] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._widgets = 0
+        self._started_at = time.time()
+        self._baseline: Sites = {}
+        self._previous: Sites = {}
+        self._previous_at = 0.0
+        self._baseline_rss = 0
+        self._baseline_at = 0.0
+        self._last_alert_at = 0.0
+
+    def start(self) -> None:
+        if not config.MEMORY_MONITOR_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        if config.MEMORY_TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, config.MEMORY_TRACEMALLOC_FRAMES))
+        _RSS.set_function(read_rss)
+        _THREADS.set_function(threading.active_count)
+        _WIDGETS.set_function(lambda: self._widgets or None)
+        _TRACED.set_function(lambda: tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def note_widget_count(self, count: int) -> None:
+        """Called from the Tk thread with the current widget count."""
+        self._widgets = int(count)
+
+    def sample(self) -> MemorySample:
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        counts = gc.get_count()
+        item = MemorySample(
+            at=time.time(),
+            rss=read_rss(),
+            blocks=sys.getallocatedblocks(),
+            traced=traced,
+            gc_counts=(counts[0], counts[1], counts[2]),
+            threads=threading.active_count(),
+            widgets=self._widgets,
+        )
+        with self._lock:
+            self._samples.append(item)
+        return item
+
+    def samples(self) -> list[MemorySample]:
+        with self._lock:
+            return list(self._samples)
+
+    def _run(self) -> None:
+        next_snapshot = time.monotonic() + self.snapshot_seconds
+        while not self._stop_event.is_set():
+            try:
+                current = self.sample()
+                if time.monotonic() >= next_snapshot:
+                    next_snapshot = time.monotonic() + self.snapshot_seconds
+                    self._periodic_snapshot(current)
+                self._check_budget(current)
+            except Exception as exc:
+                log_error(f"[Memory] Sampling failed: {exc}")
+            self._stop_event.wait(self.sample_seconds)
+
+    def _periodic_snapshot(self, current: MemorySample) -> None:
+        with self._snapshot_lock:
+            sites = take_sites()
+            if self._baseline_at == 0.0:
+                self._baseline = sites
+                self._baseline_rss = current.rss
+                self._baseline_at = current.at
+                log_info(f"[Memory] Baseline RSS {format_bytes(current.rss)}")
+            elif sites:
+                growth = format_growth(sites, self._previous, limit=3)
+                log_info(f"[Memory] RSS {format_bytes(current.rss)}; top growth since last snapshot:\n" + "\n".join(growth))
+            self._previous = sites
+            self._previous_at = current.at
+
+    def _check_budget(self, current: MemorySample) -> None:
+        if self._baseline_at == 0.0:
+            return
+        budget = max(1, config.MEMORY_GROWTH_BUDGET_MB) * 1024 * 1024
+        growth = current.rss - self._baseline_rss
+        if growth <= budget:
+            return
+        cooldown = max(0, config.MEMORY_ALERT_COOLDOWN_MINUTES) * 60
+        if self._last_alert_at and current.at - self._last_alert_at < cooldown:
+            return
+        self._last_alert_at = current.at
+        lines = [
+            "Memory growth on Uvjerenja Terminal",
+            f"RSS {format_bytes(current.rss)}, +{format_bytes(growth)} since baseline "
+            f"(budget {config.MEMORY_GROWTH_BUDGET_MB} MiB)",
+            f"Threads: {current.threads}, Tk widgets: {current.widgets}",
+        ]
+        with self._snapshot_lock:
+            baseline = self._baseline
+        sites = take_sites() if baseline else {}
+        if sites:
+            lines.append("Top growth since baseline:")
+            lines.extend(format_growth(sites, baseline, limit=5))
+        log_info("[Memory] Growth budget exceeded: " + " | ".join(lines[1:3]))
+        notify_telegram_async("\n".join(lines), kind="error")
+
+    def report(self, *, top: int = 8) -> str:
+        current = self.sample()
+        history = self.samples()
+        uptime = int(current.at - self._started_at)
+        rss_values = [sample.rss for sample in history]
+        lines = [
+            f"Memory (monitor uptime {uptime // 86400}d {(uptime % 86400) // 3600}h {(uptime % 3600) // 60}m):",
+            f"RSS: {format_bytes(current.rss)} (min {format_bytes(min(rss_values))}, max {format_bytes(max(rss_values))} "
+            f"over {len(history)} sample(s))",
+        ]
+        trend = _trend_per_hour(history)
+        if trend is not None:
+            hours = (history[-1].at - history[0].at) / 3600
+            sign = "+" if trend >= 0 else "-"
+            lines.append(f"RSS trend: {sign}{format_bytes(abs(trend))}/h over {hours:.1f}h")
+        if self._baseline_at:
+            growth = current.rss - self._baseline_rss
+            sign = "+" if growth >= 0 else "-"
+            lines.append(
+                f"Since baseline ({time.strftime('%d.%m. %H:%M', time.localtime(self._baseline_at))}): "
+                f"{sign}{format_bytes(abs(growth))} of {config.MEMORY_GROWTH_BUDGET_MB} MiB budget"
+            )
+        heap = f"Python heap: {current.blocks} blocks"
+        if tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            heap += f", traced {format_bytes(traced)} (peak {format_bytes(peak)})"
+        lines.append(heap)
+        collections = "/".join(str(stat.get("collections", 0)) for stat in gc.get_stats())
+        uncollectable = sum(stat.get("uncollectable", 0) for stat in gc.get_stats())
+        lines.append(
+            f"GC: pending {current.gc_counts[0]}/{current.gc_counts[1]}/{current.gc_counts[2]}, "
+            f"collections {collections}, uncollectable {uncollectable}, gc.garbage {len(gc.garbage)}"
+        )
+        lines.append(f"Threads: {current.threads}, Tk widgets: {current.widgets or 'unknown'}")
+
+        if not tracemalloc.is_tracing():
+            lines.append("tracemalloc is off (POTVRDE_MEMORY_TRACEMALLOC_ENABLED).")
+            return "\n".join(lines)
+        sites = take_sites()
+        with self._snapshot_lock:
+            previous, previous_at, baseline = self._previous, self._previous_at, self._baseline
+        if previous and previous is not baseline:
+            minutes = (current.at - previous_at) / 60
+            lines.append("")
+            lines.append(f"Top growth since last snapshot ({minutes:.0f} min ago):")
+            lines.extend(format_growth(sites, previous, limit=top))
+        if self._baseline_at:
+            lines.append("")
+            lines.append("Top growth since baseline:")
+            lines.extend(format_growth(sites, baseline, limit=top))
+        else:
+            lines.append("")
+            lines.append(f"No baseline yet (first snapshot after {self.snapshot_seconds // 60} min). Largest allocation sites:")
+            largest = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:top]
+            for (filename, lineno), (size, count) in largest:
+                lines.append(f"  {format_bytes(size)} ({count} blocks) {_short_path(filename)}:{lineno}")
+        return "\n".join(lines)
+
+
+_monitor_lock = threading.Lock()
+_monitor: MemoryMonitor | None = None
+
+
+def get_memory_monitor() -> MemoryMonitor:
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = MemoryMonitor()
+        return _monitor
@@ -2,6 +2,7 @@ import datetime
 import json
 import socket
 import subprocess
+import threading
 import time
 import uuid
 from dataclasses import dataclass
@@ -10,16 +11,37 @@ from typing import Callable, Dict, Optional
 
 from project.core import config
 from project.core.runtime_settings import get_selected_printer
+from project.services.scratch_storage import JobWorkspace, allocate_job_workspace, promote_job_document, release_job_workspace
 from project.services.storage_cleanup import cleanup_print_job_documents, check_storage_pressure_async, format_bytes
 from project.services.telegram_notify import notify_telegram_async
+from project.utils.cancellation import CancelToken, JobCancelled
 from project.utils.docs.docx_replace_placeholders import replace_dynamic_text
-from project.utils.docs.pdf_converter import convert_docx_to_pdf
+from project.utils.deadline import Deadline
+from project.utils.docs.render_pool import render_docx_to_pdf
+from project.utils import metrics, tracing
 from project.utils.logging_utils import log_error, log_info
 from project.utils.printing.print_with_hplip import print_with_hplip
 from project.utils.printing.printer_status import wait_for_printer_readiness
+from project.utils.resource_sampler import format_resource_summary, get_resource_sampler
 
 StatusCallback = Callable[[str], None]
 
+# The open trace span of the current job's stage (jobs run one per thread).
+_stage_trace = threading.local()
+
+_JOBS = metrics.counter("kiosk_print_jobs_total", "Print jobs by outcome and error code.", ("outcome", "error_code"))
+_JOB_SECONDS = metrics.histogram(
+    "kiosk_print_job_seconds",
+    "End-to-end print job time.",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 300),
+)
+_STAGE_SECONDS = metrics.histogram(
+    "kiosk_print_job_stage_seconds",
+    "Time spent in each print job stage.",
+    ("stage",),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+
 
 @dataclass(frozen=True)
 class PrintResult:
@@ -73,6 +95,42 @@ def _write_job_json(job_dir: Path, payload: Dict) -> None:
     (job_dir / "job.json").write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+def _enter_stage(job_dir: Path, payload: Dict, deadline: Deadline, state: str) -> None:
+    deadline.raise_if_cancelled()
+    deadline.enter(state)
+    _end_stage_trace()
+    _stage_trace.span = tracing.start_span(f"stage.{state}", "job", job_id=payload.get("job_id", ""))
+    payload["state"] = state
+    payload["budget"] = deadline.summary()
+    _write_job_json(job_dir, payload)
+
+
+def _end_stage_trace() -> None:
+    active = getattr(_stage_trace, "span", None)
+    if active is not None:
+        active.end()
+        _stage_trace.span = None
+
+
+def _record_budget(job_id: str, payload: Dict, deadline: Deadline) -> None:
+    deadline.finish()
+    _end_stage_trace()
+    budget = deadline.summary()
+    payload["budget"] = budget
+    payload["finished_at"] = time.time()
+    # What the Pi was doing meanwhile: CPU contention, SD card load, heat.
+    resources = get_resource_sampler().summary(float(payload.get("created_at") or 0), payload["finished_at"])
+    payload["resource_summary"] = resources
+    for name, seconds in budget["stages"].items():
+        _STAGE_SECONDS.observe(seconds, stage=name)
+    _JOB_SECONDS.observe(budget["elapsed_seconds"])
+    stages = ", ".join(f"{name}={seconds:.1f}s" for name, seconds in budget["stages"].items())
+    log_info(
+        f"[JOB] {job_id} used {budget['elapsed_seconds']:.1f}s of {budget['budget_seconds']:.0f}s budget "
+        f"({stages or 'no stages'}); {format_resource_summary(resources)}"
+    )
+
+
 def _notify_job_failure(
     job_id: str,
     payload: Dict,
@@ -148,8 +206,29 @@ def _notify_job_success(job_id: str, payload: Dict) -> None:
     notify_telegram_async("\n".join(lines), kind="status")
 
 
-def _fail(job_dir: Path, payload: Dict, job_id: str, error_code: str, user_message: str, detail: str = "", *, docx_path: str | None = None, pdf_path: str | None = None) -> PrintResult:
+def _fail(
+    job_dir: Path,
+    payload: Dict,
+    job_id: str,
+    error_code: str,
+    user_message: str,
+    detail: str = "",
+    *,
+    docx_path: str | None = None,
+    pdf_path: str | None = None,
+    workspace: JobWorkspace | None = None,
+    deadline: Deadline | None = None,
+) -> PrintResult:
+    if deadline is not None:
+        _record_budget(job_id, payload, deadline)
+    if workspace is not None:
+        # Failed-job documents are kept for inspection, so move them out of
+        # the RAM scratch area before it is released.
+        docx_path = promote_job_document(workspace, docx_path)
+        pdf_path = promote_job_document(workspace, pdf_path)
+        release_job_workspace(workspace)
     payload.update({"state": "failed", "error_code": error_code, "user_message": user_message, "detail": detail})
+    _JOBS.inc(outcome="failed", error_code=error_code)
     if docx_path:
         payload["docx_path"] = docx_path
     if pdf_path:
@@ -160,6 +239,38 @@ def _fail(job_dir: Path, payload: Dict, job_id: str, error_code: str, user_messa
     return PrintResult(False, job_id, docx_path=docx_path, pdf_path=pdf_path, error_code=error_code, user_message=user_message, detail=detail)
 
 
+def _cancelled(
+    job_dir: Path,
+    payload: Dict,
+    job_id: str,
+    reason: str,
+    *,
+    docx_path: Path | None = None,
+    pdf_path: Path | None = None,
+    workspace: JobWorkspace | None = None,
+    deadline: Deadline,
+) -> PrintResult:
+    stage = str(payload.get("state") or "created")
+    _record_budget(job_id, payload, deadline)
+    payload.update(
+        {
+            "state": "cancelled",
+            "error_code": "CANCELLED",
+            "cancel_reason": reason,
+            "cancelled_stage": stage,
+        }
+    )
+    # Nobody is waiting for these documents any more; remove them right away
+    # instead of keeping them for inspection like a failed job.
+    if workspace is not None:
+        payload.update(cleanup_print_job_documents(workspace.path, docx_path, pdf_path))
+        release_job_workspace(workspace)
+    _write_job_json(job_dir, payload)
+    _JOBS.inc(outcome="cancelled", error_code="CANCELLED")
+    log_info(f"[JOB] {job_id} cancelled during {stage}: {reason}")
+    return PrintResult(False, job_id, error_code="CANCELLED", user_message="Štampa je otkazana.", detail=reason)
+
+
 def _validate_form_data(form_data: Dict[str, str]) -> tuple[bool, str]:
     required = ["ime_ucenika", "prezime", "ime", "roditelj", "mjesto", "opstina", "razred", "struka", "razlog", "dan", "mjesec", "godina"]
     missing = [key for key in required if not str(form_data.get(key, "")).strip()]
@@ -219,15 +330,15 @@ def _notify_printer_error(
     notify_telegram_async("\n".join(details), kind="status")
 
 
-def _resolve_ready_printer_for_job() -> tuple[bool, str, str, str, str, int]:
+def _resolve_ready_printer_for_job(deadline: Deadline | None = None) -> tuple[bool, str, str, str, str, int]:
     """Return (ready, resolved_printer, code, message, selected_printer, attempts)."""
     selected_printer = get_selected_printer()
-    ready, code, message, attempts = wait_for_printer_readiness(selected_printer)
+    ready, code, message, attempts = wait_for_printer_readiness(selected_printer, deadline=deadline)
     if ready:
         return True, message, code, "", selected_printer, attempts
 
-    if selected_printer:
-        default_ready, default_code, default_message, default_attempts = wait_for_printer_readiness("")
+    if selected_printer and not (deadline is not None and deadline.expired):
+        default_ready, default_code, default_message, default_attempts = wait_for_printer_readiness("", deadline=deadline)
         if default_ready:
             return (
                 True,
@@ -241,11 +352,13 @@ def _resolve_ready_printer_for_job() -> tuple[bool, str, str, str, str, int]:
     return False, "", code, message, selected_printer, attempts
 
 
+@tracing.traced("run_print_job", "job")
 def run_print_job(
     form_data: Dict,
     *,
     on_status: Optional[StatusCallback] = None,
     do_print: bool = True,
+    cancel_token: Optional[CancelToken] = None,
 ) -> PrintResult:
     def status(code: str) -> None:
         if on_status:
@@ -254,6 +367,7 @@ def run_print_job(
     job_id = str(uuid.uuid4())
     job_dir = _job_dir(job_id)
     form_data = _normalize_form_data(form_data)
+    deadline = Deadline(config.JOB_DEADLINE_SECONDS, cancel_token=cancel_token)
 
     payload = {
         "job_id": job_id,
@@ -265,21 +379,23 @@ def run_print_job(
 
     if not config.is_within_working_hours():
         message = f"{config.working_hours_unavailable_message()} Обратите се секретаријату у радно вријеме."
-        return _fail(job_dir, payload, job_id, "OUTSIDE_WORKING_HOURS", message)
+        return _fail(job_dir, payload, job_id, "OUTSIDE_WORKING_HOURS", message, deadline=deadline)
 
     is_valid, validation_message = _validate_form_data(form_data)
     if not is_valid:
-        return _fail(job_dir, payload, job_id, "FORM_INVALID", validation_message)
+        return _fail(job_dir, payload, job_id, "FORM_INVALID", validation_message, deadline=deadline)
 
     if not config.TEMPLATE_FILE.exists():
-        return _fail(job_dir, payload, job_id, "TEMPLATE_MISSING", f"Template nije pronađen: {config.TEMPLATE_FILE}")
+        return _fail(job_dir, payload, job_id, "TEMPLATE_MISSING", f"Template nije pronađen: {config.TEMPLATE_FILE}", deadline=deadline)
 
     resolved_printer = ""
     if do_print:
-        payload["state"] = "CHECK_PRINTER"
-        _write_job_json(job_dir, payload)
-        status("CHECK_PRINTER")
-        printer_ready, resolved_printer, printer_code, printer_message, selected_printer, printer_attempts = _resolve_ready_printer_for_job()
+        try:
+            _enter_stage(job_dir, payload, deadline, "CHECK_PRINTER")
+            status("CHECK_PRINTER")
+            printer_ready, resolved_printer, printer_code, printer_message, selected_printer, printer_attempts = _resolve_ready_printer_for_job(deadline)
+        except JobCancelled as e:
+            return _cancelled(job_dir, payload, job_id, str(e), deadline=deadline)
         payload["selected_printer"] = selected_printer
         payload["resolved_printer"] = resolved_printer
         payload["printer_check_attempts"] = printer_attempts
@@ -295,14 +411,15 @@ def run_print_job(
                 attempts=printer_attempts,
             )
         if not printer_ready:
-            return _fail(job_dir, payload, job_id, printer_code, printer_message)
+            return _fail(job_dir, payload, job_id, printer_code, printer_message, deadline=deadline)
 
     output_docx: Path | None = None
     pdf_path: Path | None = None
+    workspace = allocate_job_workspace(job_id, job_dir)
+    payload["document_storage"] = workspace.storage
 
     try:
-        payload["state"] = "BUILD"
-        _write_job_json(job_dir, payload)
+        _enter_stage(job_dir, payload, deadline, "BUILD")
         status("BUILD")
         datum_rodjenja = f"{str(form_data['dan']).strip()}.{str(form_data['mjesec']).strip()}.{str(form_data['godina']).strip()}"
         # The printed DOCX/PDF must use uppercase values for all user-entered
@@ -323,31 +440,82 @@ def run_print_job(
             "{{RAZLOG}}": _docx_caps(form_data["razlog"]),
         }
 
-        payload["state"] = "DOCX"
-        _write_job_json(job_dir, payload)
+        _enter_stage(job_dir, payload, deadline, "DOCX")
         status("DOCX")
-        output_docx = job_dir / "output.docx"
+        output_docx = workspace.path / "output.docx"
         replace_dynamic_text(str(config.TEMPLATE_FILE), str(output_docx), placeholders)
         if not output_docx.exists() or output_docx.stat().st_size == 0:
-            return _fail(job_dir, payload, job_id, "DOCX_FAILED", "Generisanje DOCX dokumenta nije uspjelo.")
+            return _fail(job_dir, payload, job_id, "DOCX_FAILED", "Generisanje DOCX dokumenta nije uspjelo.", workspace=workspace, deadline=deadline)
 
-        payload["state"] = "PDF"
+        if deadline.expired:
+            return _fail(
+                job_dir,
+                payload,
+                job_id,
+                "JOB_DEADLINE_EXCEEDED",
+                "Obrada je trajala predugo. Pokušaj ponovo.",
+                docx_path=str(output_docx),
+                workspace=workspace,
+                deadline=deadline,
+            )
         payload["docx_path"] = str(output_docx)
-        _write_job_json(job_dir, payload)
+        _enter_stage(job_dir, payload, deadline, "PDF")
         status("PDF")
-        pdf_path = Path(convert_docx_to_pdf(str(output_docx), output_dir=str(job_dir)))
+        pdf_path = Path(
+            render_docx_to_pdf(
+                str(output_docx),
+                output_dir=str(workspace.path),
+                timeout=deadline.timeout(config.DOCX_CONVERT_TIMEOUT),
+                cancel_token=cancel_token,
+            )
+        )
         if not pdf_path.exists() or pdf_path.stat().st_size == 0:
-            return _fail(job_dir, payload, job_id, "PDF_FAILED", "Pretvaranje dokumenta u PDF nije uspjelo.", docx_path=str(output_docx))
+            return _fail(
+                job_dir,
+                payload,
+                job_id,
+                "PDF_FAILED",
+                "Pretvaranje dokumenta u PDF nije uspjelo.",
+                docx_path=str(output_docx),
+                workspace=workspace,
+                deadline=deadline,
+            )
 
         printed = False
         if do_print:
             payload["resolved_printer"] = resolved_printer
+            if deadline.expired:
+                return _fail(
+                    job_dir,
+                    payload,
+                    job_id,
+                    "JOB_DEADLINE_EXCEEDED",
+                    "Obrada je trajala predugo. Pokušaj ponovo.",
+                    docx_path=str(output_docx),
+                    pdf_path=str(pdf_path),
+                    workspace=workspace,
+                    deadline=deadline,
+                )
 
-            payload["state"] = "PRINT"
             payload["pdf_path"] = str(pdf_path)
-            _write_job_json(job_dir, payload)
+            _enter_stage(job_dir, payload, deadline, "PRINT")
             status("PRINT")
-            print_result = print_with_hplip(str(pdf_path), preferred_printer=resolved_printer)
+
+            def on_submitted(request_id: str) -> None:
+                # Persist the CUPS id right away so startup recovery can tell
+                # whether an interrupted PRINT stage reached the printer.
+                payload["cups_request_id"] = request_id
+                payload["lp_submitted_at"] = time.time()
+                _write_job_json(job_dir, payload)
+                status("SUBMITTED")
+
+            print_result = print_with_hplip(
+                str(pdf_path),
+                preferred_printer=resolved_printer,
+                deadline=deadline,
+                title=job_id,
+                on_submitted=on_submitted,
+            )
             if not print_result.ok:
                 detail = print_result.detail or ""
                 return _fail(
@@ -359,12 +527,15 @@ def run_print_job(
                     detail,
                     docx_path=str(output_docx),
                     pdf_path=str(pdf_path),
+                    workspace=workspace,
+                    deadline=deadline,
                 )
             printed = True
             payload["printer_name"] = print_result.printer_name
             if print_result.detail:
                 payload["lp_output"] = print_result.detail
 
+        _record_budget(job_id, payload, deadline)
         payload.update(
             {
                 "state": "done",
@@ -374,12 +545,16 @@ def run_print_job(
             }
         )
         _write_job_json(job_dir, payload)
-        cleanup_metadata = cleanup_print_job_documents(job_dir, output_docx, pdf_path)
+        cleanup_metadata = cleanup_print_job_documents(workspace.path, output_docx, pdf_path)
+        release_job_workspace(workspace)
         payload.update(cleanup_metadata)
         _write_job_json(job_dir, payload)
+        _JOBS.inc(outcome="done", error_code="")
         _notify_job_success(job_id, payload)
         check_storage_pressure_async(reason="print-success")
         return PrintResult(True, job_id, docx_path=str(output_docx), pdf_path=str(pdf_path))
+    except JobCancelled as e:
+        return _cancelled(job_dir, payload, job_id, str(e), docx_path=output_docx, pdf_path=pdf_path, workspace=workspace, deadline=deadline)
     except FileNotFoundError as e:
         log_error(f"[JOB] {job_id} file missing: {e}")
         return _fail(
@@ -391,6 +566,8 @@ def run_print_job(
             repr(e),
             docx_path=str(output_docx) if output_docx else None,
             pdf_path=str(pdf_path) if pdf_path else None,
+            workspace=workspace,
+            deadline=deadline,
         )
     except subprocess.TimeoutExpired as e:
         stage = str(payload.get("state") or "processing")
@@ -400,7 +577,7 @@ def run_print_job(
         elif stage == "PRINT":
             user_message = "Slanje na štampu je trajalo predugo. Provjerite printer i pokušajte ponovo."
         log_error(f"[JOB] {job_id} timeout during {stage}: {e}")
-        return _fail(job_dir, payload, job_id, "TIMEOUT", user_message, repr(e), docx_path=str(output_docx) if output_docx else None, pdf_path=str(pdf_path) if pdf_path else None)
+        return _fail(job_dir, payload, job_id, "TIMEOUT", user_message, repr(e), docx_path=str(output_docx) if output_docx else None, pdf_path=str(pdf_path) if pdf_path else None, workspace=workspace, deadline=deadline)
     except RuntimeError as e:
         stage = str(payload.get("state") or "processing")
         detail = str(e)
@@ -418,7 +595,7 @@ def run_print_job(
             code = "RUNTIME_ERROR"
             user_message = "Došlo je do greške tokom obrade dokumenta."
         log_error(f"[JOB] {job_id} runtime error during {stage}: {e}")
-        return _fail(job_dir, payload, job_id, code, user_message, detail, docx_path=str(output_docx) if output_docx else None, pdf_path=str(pdf_path) if pdf_path else None)
+        return _fail(job_dir, payload, job_id, code, user_message, detail, docx_path=str(output_docx) if output_docx else None, pdf_path=str(pdf_path) if pdf_path else None, workspace=workspace, deadline=deadline)
     except OSError as e:
         stage = str(payload.get("state") or "processing")
         log_error(f"[JOB] {job_id} os error during {stage}: {e}")
@@ -431,6 +608,8 @@ def run_print_job(
             repr(e),
             docx_path=str(output_docx) if output_docx else None,
             pdf_path=str(pdf_path) if pdf_path else None,
+            workspace=workspace,
+            deadline=deadline,
         )
     except Exception as e:
         stage = str(payload.get("state") or "processing")
@@ -444,4 +623,6 @@ def run_print_job(
             repr(e),
             docx_path=str(output_docx) if output_docx else None,
             pdf_path=str(pdf_path) if pdf_path else None,
+            workspace=workspace,
+            deadline=deadline,
         )
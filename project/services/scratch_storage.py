@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from project.core import config
+from project.utils.logging_utils import log_error, log_info
+
+
+_lock = threading.Lock()
+_active_workspaces: set[str] = set()
+_scratch_unavailable_logged = False
+
+
+@dataclass(frozen=True)
+class JobWorkspace:
+    """Where a job writes its intermediate DOCX/PDF files.
+
+    ``path`` is a scratch directory on tmpfs when ``in_memory`` is true,
+    otherwise it is the persistent job directory itself.
+    """
+
+    job_id: str
+    path: Path
+    persistent_dir: Path
+    in_memory: bool
+
+    @property
+    def storage(self) -> str:
+        return "memory" if self.in_memory else "disk"
+
+
+def _dir_usage_bytes(path: Path) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_symlink():
+                continue
+            if entry.is_dir():
+                total += _dir_usage_bytes(Path(entry.path))
+            elif entry.is_file():
+                total += entry.stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+def scratch_usage_bytes() -> int:
+    return _dir_usage_bytes(config.SCRATCH_DIR)
+
+
+def _scratch_has_room(root: Path) -> bool:
+    reserve = max(0, config.SCRATCH_JOB_RESERVE_MB) * 1024 * 1024
+    cap = max(0, config.SCRATCH_MAX_MB) * 1024 * 1024
+    if cap <= 0:
+        return False
+    if _dir_usage_bytes(root) + reserve > cap:
+        return False
+    try:
+        return shutil.disk_usage(str(root)).free >= reserve
+    except OSError:
+        return False
+
+
+def allocate_job_workspace(job_id: str, persistent_dir: Path) -> JobWorkspace:
+    global _scratch_unavailable_logged
+
+    persistent_dir.mkdir(parents=True, exist_ok=True)
+    if config.SCRATCH_ENABLED:
+        root = config.SCRATCH_DIR
+        with _lock:
+            try:
+                root.mkdir(parents=True, exist_ok=True)
+                if _scratch_has_room(root):
+                    path = root / job_id
+                    path.mkdir(parents=True, exist_ok=True)
+                    _active_workspaces.add(job_id)
+                    return JobWorkspace(job_id, path, persistent_dir, True)
+                log_info(f"[Scratch] {root} is full; job {job_id} writes documents to disk.")
+            except OSError as exc:
+                if not _scratch_unavailable_logged:
+                    _scratch_unavailable_logged = True
+                    log_error(f"[Scratch] Scratch area {root} is unavailable, using disk: {exc}")
+    return JobWorkspace(job_id, persistent_dir, persistent_dir, False)
+
+
+def promote_job_document(workspace: JobWorkspace, path: str | Path | None) -> str | None:
+    """Move a scratch document into the persistent job directory.
+
+    Returns the new path, or the original one when nothing needed moving.
+    """
+    if path is None:
+        return None
+    source = Path(path)
+    if not workspace.in_memory or not source.is_file():
+        return str(source)
+    try:
+        source.resolve().relative_to(workspace.path.resolve())
+    except (OSError, ValueError):
+        return str(source)
+
+    target = workspace.persistent_dir / source.name
+    try:
+        workspace.persistent_dir.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(source), str(target))
+        return str(target)
+    except OSError as exc:
+        log_error(f"[Scratch] Could not retain {source} in {workspace.persistent_dir}: {exc}")
+        return str(source)
+
+
+def release_job_workspace(workspace: JobWorkspace) -> None:
+    if not workspace.in_memory:
+        return
+    with _lock:
+        _active_workspaces.discard(workspace.job_id)
+    shutil.rmtree(workspace.path, ignore_errors=True)
+
+
+def cleanup_stale_scratch(*, now: float | None = None) -> tuple[int, int]:
+    """Remove scratch job directories left behind by a crash.
+
+    Returns (removed_dirs, bytes_freed).
+    """
+    root = config.SCRATCH_DIR
+    if not root.is_dir() or root.is_symlink():
+        return 0, 0
+
+    current = time.time() if now is None else now
+    stale_after = max(1, config.SCRATCH_STALE_MINUTES) * 60
+    removed = 0
+    freed = 0
+    with _lock:
+        active = set(_active_workspaces)
+    for entry in list(os.scandir(root)):
+        try:
+            if entry.name in active or entry.is_symlink() or not entry.is_dir():
+                continue
+            if current - entry.stat().st_mtime < stale_after:
+                continue
+            size = _dir_usage_bytes(Path(entry.path))
+            shutil.rmtree(entry.path)
+            removed += 1
+            freed += size
+        except OSError as exc:
+            log_error(f"[Scratch] Failed to remove stale scratch {entry.path}: {exc}")
+    return removed, freed
@@ -9,7 +9,9 @@ from pathlib import Path
 from typing import Any
 
 from project.core import config
+from project.services.scratch_storage import cleanup_stale_scratch
 from project.services.telegram_notify import notify_telegram_async
+from project.utils import metrics
 from project.utils.logging_utils import log_error, log_info
 
 
@@ -19,6 +21,10 @@ _last_alert_at = 0.0
 _last_alert_state = "ok"
 _periodic_service: PeriodicCleanupService | None = None
 
+_BYTES_FREED = metrics.counter("kiosk_cleanup_bytes_freed_total", "Bytes deleted by storage cleanup.", ("kind",))
+_DISK_FREE = metrics.gauge("kiosk_disk_free_bytes", "Free space on the app data filesystem.")
+_DISK_FREE.set_function(lambda: shutil.disk_usage(str(config.VAR_DIR)).free)
+
 
 @dataclass
 class CleanupResult:
@@ -197,7 +203,8 @@ def _cleanup_job_root(job_root: Path, result: CleanupResult, roots: list[Path],
 
         payload = _read_job_json(job_dir)
         state = str(payload.get("state") or "").lower()
-        is_success = state == "done" or bool(payload.get("printed")) or bool(payload.get("documents_cleaned"))
+        # A cancelled job's documents are as disposable as a printed one's.
+        is_success = state in ("done", "cancelled") or bool(payload.get("printed")) or bool(payload.get("documents_cleaned"))
         is_failed = state == "failed"
         job_age = _job_age_seconds(job_dir, payload, now)
 
@@ -291,8 +298,12 @@ def run_cleanup(*, pressure: bool = False, include_pycache: bool = False, force:
         for job_root in _job_roots():
             _cleanup_job_root(job_root, result, roots, pressure=pressure, now=now)
         _cleanup_logs(result, roots, now=now)
+        scratch_dirs, scratch_bytes = cleanup_stale_scratch(now=now)
+        result.deleted_dirs += scratch_dirs
+        result.bytes_freed += scratch_bytes
         if include_pycache or pressure:
             _cleanup_pycache(result, roots)
+        _BYTES_FREED.inc(result.bytes_freed, kind="pressure" if pressure else "cleanup")
         log_info(
             "[Cleanup] %s deleted %s file(s), %s dir(s), freed %s, errors=%s"
             % (reason, result.deleted_files, result.deleted_dirs, format_bytes(result.bytes_freed), len(result.errors))
@@ -326,6 +337,7 @@ def cleanup_print_job_documents(job_dir: Path, docx_path: Path | None, pdf_path:
     metadata["documents_cleaned"] = bool(metadata["docx_deleted"] and metadata["pdf_deleted"])
     metadata["cleanup_deleted_files"] = result.deleted_files
     metadata["cleanup_bytes_freed"] = result.bytes_freed
+    _BYTES_FREED.inc(result.bytes_freed, kind="job_documents")
     if result.errors:
         metadata["cleanup_errors"] = result.errors
     return metadata
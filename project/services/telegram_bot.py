@@ -9,16 +9,26 @@ import subprocess
 import sys
 import threading
 import time
-import urllib.error
-import urllib.parse
-import urllib.request
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from project.core import config
 from project.core.runtime_settings import clear_selected_printer, get_selected_printer, set_selected_printer
+from project.services.command_scheduler import EXCLUSIVE, SHARED, CommandScheduler
+from project.services.health_history import METRICS as HISTORY_METRICS, get_health_history
+from project.services.health_snapshot import get_health_snapshot
+from project.services.job_stats import format_stats, get_job_history, period_range
+from project.services.memory_monitor import get_memory_monitor
 from project.services.storage_cleanup import collect_storage_report, format_cleanup_summary, format_storage_report, run_cleanup
+from project.services.telegram_notify import get_telegram_outbox
+from project.services.telegram_stream import StreamingMessage, run_streaming, transcript_filename
+from project.services.telegram_transport import get_telegram_transport
+from project.utils import tracing
+from project.utils.circuit_breaker import CircuitOpenError, format_breaker_status
+from project.utils.log_follow import LogFollower
+from project.utils.log_index import get_log_index, parse_time_arg
+from project.utils.log_tail import LEVELS, log_files, render_line, tail_records
 from project.utils.logging_utils import log_error, log_info
 from project.utils.network_status import collect_network_diagnostics, reconnect_network
 from project.utils.printing.printer_status import (
@@ -27,6 +37,9 @@ from project.utils.printing.printer_status import (
     list_configured_printers,
     set_cups_default_printer,
 )
+from project.utils.resource_sampler import get_resource_sampler
+from project.utils.sampling_profiler import ProfilerBusy, profile
+from project.utils.ui_watchdog import get_ui_watchdog
 
 
 PLACEHOLDER_TOKENS = {
@@ -34,20 +47,25 @@ PLACEHOLDER_TOKENS = {
     "PASTE_TELEGRAM_BOT_TOKEN_HERE",
     "YOUR_TELEGRAM_BOT_TOKEN_HERE",
 }
+# Log search hits kept for plain messages when a stream fails part-way.
+_LOG_SEARCH_FALLBACK_CHARS = 3 * 3400
 
 
 class TelegramControlBot:
     def __init__(self, manager: Any | None = None) -> None:
         self.token = config.TELEGRAM_BOT_TOKEN
         self.allowed_user_id = str(config.TELEGRAM_ALLOWED_USER_ID)
-        self.api_url = f"https://api.telegram.org/bot{self.token}"
+        self.transport = get_telegram_transport()
         self.poll_timeout = max(1, config.TELEGRAM_POLL_TIMEOUT)
         self.manager = manager
         self._offset: int | None = None
         self._stop_event = threading.Event()
         self._thread: threading.Thread | None = None
-        self._command_lock = threading.Lock()
-        self._active_command: str | None = None
+        self.commands = CommandScheduler(on_timeout=self._report_command_timeout)
+        self.health = get_health_snapshot()
+        self.health.register_probe("storage", self._collect_storage_diagnostics)
+        self.health.register_probe("git", self._git_status_lines)
+        self._follower: LogFollower | None = None
         self._started_at = time.time()
         self._last_poll_ok_at: float | None = None
         self._poll_failures = 0
@@ -58,6 +76,9 @@ class TelegramControlBot:
             return
         self._thread = threading.Thread(target=self._run, name="telegram-control-bot", daemon=True)
         self._thread.start()
+        self.health.start()
+        # Load the job history once in the background so the first /stats is fast.
+        threading.Thread(target=get_job_history().refresh, name="job-stats-warmup", daemon=True).start()
         if config.TELEGRAM_NOTIFY_ONLINE and config.TELEGRAM_STATUS_NOTIFICATIONS:
             notify_timer = threading.Timer(2.0, self._notify_online)
             notify_timer.daemon = True
@@ -65,6 +86,10 @@ class TelegramControlBot:
 
     def stop(self) -> None:
         self._stop_event.set()
+        self.commands.stop()
+        self.health.stop()
+        if self._follower is not None:
+            self._follower.stop("bot stopped")
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2)
 
@@ -83,9 +108,11 @@ class TelegramControlBot:
                         **({"offset": str(self._offset)} if self._offset is not None else {}),
                     },
                     timeout=self.poll_timeout + 10,
+                    long_poll=True,
                 )
                 if self._poll_failures:
                     log_info(f"[Telegram] Polling recovered after {self._poll_failures} failure(s).")
+                    get_telegram_outbox().resume()
                 self._last_poll_ok_at = time.time()
                 self._poll_failures = 0
                 self._last_poll_error = ""
@@ -95,6 +122,11 @@ class TelegramControlBot:
                     if isinstance(update_id, int):
                         self._offset = update_id + 1
                     self._handle_update(update)
+            except CircuitOpenError as exc:
+                # The breaker already logged the outage; poll again when it
+                # lets a trial call through.
+                self._poll_failures += 1
+                self._stop_event.wait(max(1.0, exc.retry_in))
             except Exception as exc:
                 self._poll_failures += 1
                 self._last_poll_error = str(exc)
@@ -141,57 +173,91 @@ class TelegramControlBot:
         elif command == "/ping":
             self._send_message(chat_id, "pong")
         elif command in ("/status", "/appstatus"):
-            self._send_status(chat_id)
+            self._start_background_command("status", chat_id, self._send_status)
         elif command == "/version":
-            self._send_version(chat_id)
+            self._start_background_command("version", chat_id, self._send_version)
         elif command in ("/space", "/disk", "/storage"):
-            self._send_space_status(chat_id)
+            self._start_background_command("space", chat_id, self._send_space_status)
+        elif command == "/stats":
+            self._start_background_command("stats", chat_id, lambda active_chat_id: self._send_stats(active_chat_id, argument))
+        elif command == "/trace":
+            self._start_background_command("trace", chat_id, lambda active_chat_id: self._send_trace(active_chat_id, argument))
+        elif command == "/profile":
+            self._start_profile(chat_id, argument)
+        elif command == "/stalls":
+            self._start_background_command("stalls", chat_id, self._send_stalls)
+        elif command == "/history":
+            self._start_background_command("history", chat_id, lambda active_chat_id: self._send_history(active_chat_id, argument))
+        elif command == "/memory":
+            self._start_background_command("memory", chat_id, lambda active_chat_id: self._send_message(active_chat_id, get_memory_monitor().report()))
         elif command == "/cleanup":
-            self._start_background_command("cleanup", chat_id, self._cleanup_storage)
+            self._start_background_command("cleanup", chat_id, self._cleanup_storage, timeout=config.TELEGRAM_COMMAND_TIMEOUT)
         elif command in ("/network", "/internet", "/wifi"):
-            self._send_network_status(chat_id)
+            self._start_background_command("network", chat_id, self._send_network_status)
         elif command in ("/reconnectwifi", "/reconnectnetwork"):
-            self._start_background_command("reconnectwifi", chat_id, self._reconnect_wifi)
+            self._start_background_command("reconnectwifi", chat_id, self._reconnect_wifi, mode=EXCLUSIVE, timeout=180)
         elif command in ("/restartcups", "/cuprestart"):
-            self._start_background_command("restartcups", chat_id, self._restart_cups)
+            self._start_background_command("restartcups", chat_id, self._restart_cups, mode=EXCLUSIVE, timeout=180)
+        elif command == "/queue":
+            self._send_queue(chat_id)
         elif command in ("/openapp", "/showapp", "/appopen"):
             self._show_app(chat_id)
         elif command in ("/closeapp", "/hideapp", "/appclose"):
             self._hide_app(chat_id)
         elif command in ("/restartapp", "/apprestart", "/reopen", "/reopenapp"):
-            self._start_background_command("restartapp", chat_id, self._reopen_app)
+            self._start_background_command("restartapp", chat_id, self._reopen_app, mode=EXCLUSIVE, timeout=180)
         elif command == "/unlock":
             self._set_update_input_locked(False)
             self._send_message(chat_id, "Input lock cleared.")
         elif command in ("/logs", "/errors"):
-            self._send_logs(chat_id)
+            self._start_background_command("logs", chat_id, lambda active_chat_id: self._send_logs(active_chat_id, argument))
+        elif command in ("/logsearch", "/grep"):
+            self._start_background_command("logsearch", chat_id, lambda active_chat_id: self._search_logs(active_chat_id, argument))
+        elif command == "/follow":
+            self._follow_logs(chat_id, argument)
+        elif command in ("/unfollow", "/stopfollow"):
+            self._unfollow_logs(chat_id)
         elif command == "/restart":
-            self._start_background_command("restart", chat_id, self._restart_pi)
+            self._start_background_command("restart", chat_id, self._restart_pi, mode=EXCLUSIVE, timeout=120)
         elif command == "/update":
-            self._start_background_command("update", chat_id, self._update_project_then_relaunch)
+            self._start_background_command(
+                "update",
+                chat_id,
+                self._update_project_then_relaunch,
+                mode=EXCLUSIVE,
+                timeout=config.TELEGRAM_COMMAND_TIMEOUT * 2,
+            )
         elif command == "/rollback":
             self._start_background_command(
                 "rollback",
                 chat_id,
                 lambda active_chat_id: self._rollback_project_then_relaunch(active_chat_id, argument),
+                mode=EXCLUSIVE,
+                timeout=config.TELEGRAM_COMMAND_TIMEOUT * 2,
             )
         elif command in ("/printers", "/printer", "/printercheck", "/testprinter"):
-            self._send_printer_status(chat_id)
+            self._start_background_command("printers", chat_id, self._send_printer_status)
         elif command in ("/setprinter", "/defaultprinter"):
-            self._set_printer(chat_id, text.partition(" ")[2].strip())
+            self._start_background_command(
+                "setprinter",
+                chat_id,
+                lambda active_chat_id: self._set_printer(active_chat_id, text.partition(" ")[2].strip()),
+            )
         elif command in ("/usecupsdefault", "/clearprinter"):
-            self._use_cups_default(chat_id)
+            self._start_background_command("usecupsdefault", chat_id, self._use_cups_default)
         elif command in ("/cmd", "/sh", "/shell"):
             self._start_background_command(
                 "cmd",
                 chat_id,
                 lambda active_chat_id: self._run_owner_shell_command(active_chat_id, argument),
+                timeout=config.TELEGRAM_COMMAND_TIMEOUT + 30,
             )
         elif command in ("/eval", "/py"):
             self._start_background_command(
                 "eval",
                 chat_id,
                 lambda active_chat_id: self._run_owner_python_eval(active_chat_id, argument),
+                timeout=config.TELEGRAM_COMMAND_TIMEOUT + 30,
             )
         else:
             self._send_message(chat_id, "Unknown command. Send /help for available commands.")
@@ -213,12 +279,22 @@ class TelegramControlBot:
                     "/status - app, Telegram, disk space, network and printer status",
                     "/version - show current Git branch, commit and dirty state",
                     "/space - available Raspberry Pi disk space",
+                    "/stats [today|week|month|all|7d] - issued certificates, failures and print times",
+                    "/trace [on|off|clear] - send recent trace spans as Chrome/Perfetto JSON",
+                    "/profile [seconds] - sample all threads and send a flamegraph file with a summary",
+                    "/stalls - worst UI freezes with the main thread's stack",
+                    "/memory - RSS, Python heap, GC, threads, Tk widgets and top allocation growth",
+                    "/history <metric> [24h|7d|30d|1y] - sparkline of disk, printer, internet, jobs, failed or uilag",
                     "/cleanup - delete old app-owned generated files/logs safely",
                     "/ping - quick Telegram roundtrip test",
                     "/network - internet/Wi-Fi diagnostics",
                     "/reconnectwifi - reconnect Wi-Fi/network",
                     "/restartcups - restart CUPS printing service",
-                    "/logs - show latest app errors",
+                    "/logs [error|warning|info] [keyboard] - show latest log lines, optionally by level",
+                    "/logsearch <pattern> [since] [until] - search all logs, e.g. /logsearch CUPS 2h",
+                    "/follow [minutes] - stream new app and keyboard log lines live",
+                    "/unfollow - stop /follow",
+                    "/queue - show running and queued bot commands",
                     "/openapp - show the kiosk window if it is hidden",
                     "/closeapp - hide the kiosk window but keep Telegram alive",
                     "/restartapp - restart/reopen the kiosk app",
@@ -239,9 +315,10 @@ class TelegramControlBot:
     def _notify_online(self) -> None:
         """Send a best-effort startup/online message without blocking app launch."""
         try:
-            storage = self._collect_storage_diagnostics()
-            network = collect_network_diagnostics()
-            printer = collect_printer_diagnostics(get_selected_printer())
+            self.health.refresh(wait=config.HEALTH_PROBE_TIMEOUT_SECONDS)
+            storage = self.health.value("storage", {})
+            network = self.health.value("network", {})
+            printer = self.health.value("printer", {})
             hidden = False
             try:
                 hidden = bool(self.manager.is_kiosk_hidden()) if self.manager is not None else False
@@ -296,9 +373,12 @@ class TelegramControlBot:
         return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
     def _send_status(self, chat_id: int | str | None) -> None:
-        printer = collect_printer_diagnostics(get_selected_printer())
-        network = collect_network_diagnostics()
-        storage = self._collect_storage_diagnostics()
+        # Answer from the cached snapshot; this also starts a refresh so the
+        # next /status is current. Only probes that never reported are waited for.
+        self.health.ensure_fresh()
+        printer = self.health.value("printer", {})
+        network = self.health.value("network", {})
+        storage = self.health.value("storage", {})
         uptime_seconds = int(time.time() - self._started_at)
         hidden = False
         try:
@@ -310,11 +390,14 @@ class TelegramControlBot:
             f"Uptime: {uptime_seconds // 3600}h {(uptime_seconds % 3600) // 60}m",
             f"Kiosk window: {'hidden' if hidden else 'visible'}",
             f"Working hours: {config.working_hours_status_text()}",
-            f"Active command: {self._active_command or 'none'}",
+            f"Active commands: {self.commands.summary()}",
+            f"UI: {get_ui_watchdog().status_line()}",
+            f"CPU temp: {get_resource_sampler().throttle_status()}",
             f"Disk free /: {storage.get('root_free')} of {storage.get('root_total')} ({storage.get('root_used_percent')} used)",
             f"Disk free app data: {storage.get('var_free')} of {storage.get('var_total')} ({storage.get('var_used_percent')} used)",
             f"Telegram last OK: {self._format_time(self._last_poll_ok_at)}",
             f"Telegram failures: {self._poll_failures}",
+            f"Circuits: {format_breaker_status()}",
             f"Internet: {'yes' if network.get('internet') else 'no'} - {network.get('internet_message')}",
             f"Wi-Fi SSID: {network.get('ssid') or '(unknown)'}",
             f"IP: {network.get('ip') or '(unknown)'}",
@@ -323,9 +406,10 @@ class TelegramControlBot:
             f"Resolved printer: {printer.get('resolved') or '(not resolved)'}",
             f"Printer ready: {'yes' if printer.get('ready') else 'no'}",
         ]
-        lines.extend(self._git_status_lines())
+        lines.extend(self.health.value("git", ["Git: unknown"]))
         if not printer.get("ready"):
             lines.append(f"Printer reason: {printer.get('ready_message') or printer.get('detect_message') or 'unknown'}")
+        lines.append(f"Data age: {self.health.ages_line()}")
         if self._last_poll_error:
             lines.append(f"Last Telegram error: {self._last_poll_error}")
         self._send_message(chat_id, "\n".join(lines))
@@ -388,6 +472,105 @@ class TelegramControlBot:
             result["var_error"] = var["error"]
         return result
 
+    def _send_stats(self, chat_id: int | str | None, argument: str = "") -> None:
+        try:
+            label, since = period_range(argument or "today")
+        except ValueError:
+            self._send_message(chat_id, "Usage: /stats [today|yesterday|week|month|all|7d|2026-01-31]")
+            return
+        try:
+            started = time.perf_counter()
+            data = get_job_history().stats(since=since)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._send_message(chat_id, format_stats(label, since, data, elapsed_ms))
+        except Exception as exc:
+            log_error(f"[Telegram] stats failed: {exc}")
+            self._send_message(chat_id, f"Could not compute stats: {exc}")
+
+    def _send_trace(self, chat_id: int | str | None, argument: str = "") -> None:
+        action = argument.strip().lower()
+        if action in ("on", "off"):
+            tracing.set_enabled(action == "on")
+            self._send_message(chat_id, f"Tracing {'enabled' if action == 'on' else 'disabled'}.")
+            return
+        if action == "clear":
+            tracing.clear()
+            self._send_message(chat_id, "Trace buffer cleared.")
+            return
+        if action:
+            self._send_message(chat_id, "Usage: /trace [on|off|clear]")
+            return
+        count = tracing.event_count()
+        if not count:
+            state = "enabled" if tracing.is_enabled() else "disabled (/trace on)"
+            self._send_message(chat_id, f"Trace buffer is empty. Tracing is {state}.")
+            return
+        caption = f"{count} span(s). Open in https://ui.perfetto.dev or chrome://tracing."
+        self._send_document(chat_id, transcript_filename("trace").replace(".txt", ".json"), tracing.export_chrome_trace(), caption, content_type="application/json")
+
+    def _start_profile(self, chat_id: int | str | None, argument: str) -> None:
+        try:
+            seconds = int(argument) if argument.strip() else config.PROFILE_DEFAULT_SECONDS
+        except ValueError:
+            self._send_message(chat_id, "Usage: /profile [seconds]")
+            return
+        seconds = max(1, min(seconds, max(1, config.PROFILE_MAX_SECONDS)))
+        self._send_message(chat_id, f"Profiling all threads for {seconds}s...")
+        self._start_background_command(
+            "profile",
+            chat_id,
+            lambda active_chat_id: self._send_profile(active_chat_id, seconds),
+            timeout=seconds + 60,
+        )
+
+    def _send_profile(self, chat_id: int | str | None, seconds: int) -> None:
+        try:
+            result = profile(seconds)
+        except ProfilerBusy as exc:
+            self._send_message(chat_id, str(exc))
+            return
+        self._send_message(chat_id, result.summary())
+        if result.stacks:
+            caption = "Collapsed stacks: flamegraph.pl, https://www.speedscope.app or Perfetto."
+            filename = transcript_filename("profile").replace(".txt", ".folded.txt")
+            self._send_document(chat_id, filename, result.collapsed().encode("utf-8"), caption)
+
+    def _send_history(self, chat_id: int | str | None, argument: str) -> None:
+        parts = argument.split()
+        if not parts:
+            self._send_message(chat_id, f"Usage: /history <metric> [range]\nMetrics: {', '.join(HISTORY_METRICS)}\nRange: 2h, 24h, 7d, 30d, 1y (default 24h)")
+            return
+        try:
+            report = get_health_history().report(parts[0], parts[1] if len(parts) > 1 else "")
+        except ValueError as exc:
+            self._send_message(chat_id, f"{exc}\nUsage: /history <metric> [range], metrics: {', '.join(HISTORY_METRICS)}")
+            return
+        self._send_message(chat_id, report)
+
+    def _send_stalls(self, chat_id: int | str | None) -> None:
+        watchdog = get_ui_watchdog()
+        self._send_message(chat_id, watchdog.format_stalls(frames=6))
+        if watchdog.worst_stalls():
+            filename = transcript_filename("stalls")
+            self._send_document(chat_id, filename, watchdog.format_stalls(frames=200).encode("utf-8"), "Full main thread stacks of the worst UI stalls.")
+
+    def _send_document(self, chat_id: int | str | None, filename: str, data: bytes, caption: str, *, content_type: str = "text/plain") -> None:
+        if chat_id is None:
+            return
+        try:
+            self.transport.upload(
+                "sendDocument",
+                {"chat_id": str(chat_id), "caption": caption[:1000]},
+                file_field="document",
+                filename=filename,
+                data=data,
+                content_type=content_type,
+                timeout=120,
+            )
+        except (OSError, RuntimeError) as exc:
+            log_error(f"[Telegram] Sending {filename} failed: {exc}")
+            self._send_message(chat_id, f"Could not send {filename}: {exc}")
+
     def _send_space_status(self, chat_id: int | str | None) -> None:
         storage = self._collect_storage_diagnostics()
         lines = [
@@ -433,22 +616,122 @@ class TelegramControlBot:
         ]
         self._send_message(chat_id, "\n".join(lines))
 
-    def _send_logs(self, chat_id: int | str | None) -> None:
+    def _send_logs(self, chat_id: int | str | None, argument: str = "") -> None:
+        family = "error"
+        min_level = None
+        for token in argument.lower().split():
+            if token in ("keyboard", "kbd"):
+                family = "keyboard"
+            elif token.rstrip("s") in LEVELS:
+                min_level = LEVELS[token.rstrip("s")]
+            elif token == "warn":
+                min_level = LEVELS["warning"]
+            else:
+                self._send_message(chat_id, "Usage: /logs [error|warning|info] [keyboard]")
+                return
         try:
-            log_files = sorted(config.ERROR_LOG_DIR.glob("*.log"), key=lambda path: path.stat().st_mtime)
-            if not log_files:
+            files = log_files(family)
+            if not files:
                 self._send_message(chat_id, "No log files found.")
                 return
 
-            log_file = log_files[-1]
-            lines = log_file.read_text(encoding="utf-8", errors="replace").splitlines()
             tail_lines = max(10, config.TELEGRAM_LOG_TAIL_LINES)
-            text = "\n".join(lines[-tail_lines:]) or "(log is empty)"
-            self._send_message(chat_id, f"Latest log: {log_file.name}\n\n{text}")
+            lines, used = tail_records(files, lines=tail_lines, min_level=min_level)
+            text = "\n".join(render_line(line) for line in lines) or "(no matching log lines)"
+            source = ", ".join(path.name for path in reversed(used)) or files[0].name
+            level_text = f" ({argument.strip()})" if argument.strip() else ""
+            self._send_message(chat_id, f"Latest log{level_text}: {source}\n\n{text}")
         except Exception as exc:
             log_error(f"[Telegram] reading logs failed: {exc}")
             self._send_message(chat_id, f"Could not read logs: {exc}")
 
+    def _search_logs(self, chat_id: int | str | None, argument: str) -> None:
+        usage = "Usage: /logsearch <pattern> [since] [until]\nTimes: 30m, 2h, 1d, 14:30, 2026-01-31 or 2026-01-31T14:30."
+        try:
+            parts = shlex.split(argument)
+        except ValueError:
+            parts = argument.split()
+        if not parts or len(parts) > 3:
+            self._send_message(chat_id, usage)
+            return
+        try:
+            since = parse_time_arg(parts[1]) if len(parts) > 1 else None
+            until = parse_time_arg(parts[2]) if len(parts) > 2 else None
+        except ValueError as exc:
+            self._send_message(chat_id, f"{exc}\n{usage}")
+            return
+
+        pattern = parts[0]
+        limit = max(1, config.TELEGRAM_LOG_SEARCH_MAX_RESULTS)
+        title = f"Log search: {pattern}"
+        if since is not None:
+            title += f" since {self._format_time(since)}"
+        if until is not None:
+            title += f" until {self._format_time(until)}"
+        stream = self._open_stream(chat_id, title)
+        chunks: list[str] = []
+        kept_chars = 0
+        found = 0
+        try:
+            for hit in get_log_index().search(pattern, since=since, until=until, limit=limit):
+                found += 1
+                line = f"[{hit.file}] {render_line(hit.line)}\n"
+                if stream is not None:
+                    stream.write(line)
+                # Streamed hits are also kept, bounded, in case the stream fails.
+                if stream is None or kept_chars < _LOG_SEARCH_FALLBACK_CHARS:
+                    chunks.append(line)
+                    kept_chars += len(line)
+        except Exception as exc:
+            log_error(f"[Telegram] log search failed: {exc}")
+            if stream is not None:
+                stream.close(f"Search failed: {exc}")
+            else:
+                self._send_message(chat_id, f"Log search failed: {exc}")
+            return
+
+        status = f"{found} match(es)" + (f", stopped at {limit}" if found >= limit else "")
+        if stream is not None:
+            if stream.close(status, filename=transcript_filename("logsearch")):
+                return
+            status = f"Streaming failed after {found} match(es)" + (f"; first {len(chunks)} shown" if len(chunks) < found else "")
+        # Without streaming, send the results in message-sized chunks.
+        text = "".join(chunks) or "(no matches)"
+        for start in range(0, len(text), 3400):
+            self._send_message(chat_id, f"{title}\n\n{text[start:start + 3400]}")
+        self._send_message(chat_id, status)
+
+    def _follow_logs(self, chat_id: int | str | None, argument: str) -> None:
+        default_minutes = max(1, config.TELEGRAM_FOLLOW_DEFAULT_MINUTES)
+        try:
+            minutes = int(argument) if argument.strip() else default_minutes
+        except ValueError:
+            self._send_message(chat_id, "Usage: /follow [minutes]")
+            return
+        minutes = max(1, min(minutes, max(1, config.TELEGRAM_FOLLOW_MAX_MINUTES)))
+        follower = self._follower
+        if follower is not None and follower.active:
+            follower.extend(minutes * 60)
+            self._send_message(chat_id, f"Already following logs; extended to {minutes} more minute(s). Send /unfollow to stop.")
+            return
+
+        follower = LogFollower(
+            {"": config.ERROR_LOG_FILE, "keyboard": config.ERROR_LOG_DIR / "keyboard.log"},
+            on_batch=lambda text: self._send_message(chat_id, text),
+            duration_seconds=minutes * 60,
+            batch_seconds=config.TELEGRAM_FOLLOW_BATCH_SECONDS,
+        )
+        self._follower = follower
+        follower.start()
+        self._send_message(chat_id, f"Following {config.ERROR_LOG_FILE.name} and keyboard.log for {minutes} minute(s). Send /unfollow to stop.")
+
+    def _unfollow_logs(self, chat_id: int | str | None) -> None:
+        follower = self._follower
+        if follower is None or not follower.active:
+            self._send_message(chat_id, "Not following logs.")
+            return
+        follower.stop("/unfollow")
+
     def _reconnect_wifi(self, chat_id: int | str | None) -> None:
         self._send_message(chat_id, "Network reconnect command started. Telegram may be unavailable briefly.")
         ok, output = reconnect_network()
@@ -556,20 +839,25 @@ class TelegramControlBot:
                 "App printer override cleared, but CUPS has no default printer. Use /setprinter <name> first.",
             )
 
-    def _start_background_command(self, name: str, chat_id: int | str | None, target) -> None:
-        if not self._command_lock.acquire(blocking=False):
-            active = self._active_command or "another command"
-            self._send_message(chat_id, f"Busy running {active}. Try again when it finishes.")
-            return
-
-        self._active_command = name
-        thread = threading.Thread(
-            target=self._run_background_command,
-            args=(name, chat_id, target),
-            name=f"telegram-command-{name}",
-            daemon=True,
+    def _start_background_command(
+        self,
+        name: str,
+        chat_id: int | str | None,
+        target,
+        *,
+        mode: str = SHARED,
+        timeout: float | None = None,
+    ) -> None:
+        accepted, message = self.commands.submit(
+            name,
+            lambda: self._run_background_command(name, chat_id, target),
+            mode=mode,
+            timeout=timeout,
         )
-        thread.start()
+        if not accepted:
+            self._send_message(chat_id, f"{message} Send /queue to see what is running.")
+        elif message:
+            self._send_message(chat_id, message)
 
     def _run_background_command(self, name: str, chat_id: int | str | None, target) -> None:
         try:
@@ -579,9 +867,27 @@ class TelegramControlBot:
                 self._set_update_input_locked(False)
             log_error(f"[Telegram] {name} command failed: {exc}")
             self._send_message(chat_id, f"{name.capitalize()} failed: {exc}")
-        finally:
-            self._active_command = None
-            self._command_lock.release()
+
+    def _report_command_timeout(self, name: str, mode: str, timeout: float) -> None:
+        if mode == EXCLUSIVE:
+            detail = "Other commands stay blocked until it finishes."
+        else:
+            detail = "It no longer blocks other commands."
+        self._send_message(self.allowed_user_id, f"{name} is still running after {int(timeout)}s. {detail}")
+
+    def _send_queue(self, chat_id: int | str | None) -> None:
+        snap = self.commands.snapshot()
+        lines = [f"Bot commands (up to {snap['max_workers']} at once):"]
+        if snap["running"]:
+            for item in snap["running"]:
+                overdue = ", overdue" if item["overdue"] else ""
+                lines.append(f"running: {item['name']} [{item['mode']}] {item['seconds']:.0f}s of {item['timeout']:.0f}s{overdue}")
+        else:
+            lines.append("running: none")
+        for item in snap["queued"]:
+            lines.append(f"queued: {item['name']} [{item['mode']}] waiting {item['waiting']:.0f}s")
+        lines.append(f"Completed: {snap['completed']}, timed out: {snap['timed_out']}, rejected: {snap['rejected']}")
+        self._send_message(chat_id, "\n".join(lines))
 
     def _run_owner_shell_command(self, chat_id: int | str | None, command: str) -> None:
         if not config.TELEGRAM_REMOTE_COMMANDS_ENABLED:
@@ -592,13 +898,17 @@ class TelegramControlBot:
             return
 
         started_at = time.time()
+        stream = self._open_stream(chat_id, f"$ {command}\nCWD: {config.APP_ROOT}")
         ok, output = self._run_shell_command(
             command,
             cwd=config.APP_ROOT,
             timeout=config.TELEGRAM_COMMAND_TIMEOUT,
+            stream=stream,
         )
         elapsed = int(time.time() - started_at)
         status = "Shell command finished." if ok else "Shell command failed."
+        if stream is not None and stream.close(f"{status} Elapsed: {elapsed}s", filename=transcript_filename("cmd")):
+            return
         self._send_message(
             chat_id,
             f"{status}\nElapsed: {elapsed}s\nCWD: {config.APP_ROOT}\n$ {command}\n\n{self._tail(output)}",
@@ -613,9 +923,12 @@ class TelegramControlBot:
             return
 
         started_at = time.time()
-        ok, output = self._run_python_eval(source, timeout=config.TELEGRAM_COMMAND_TIMEOUT)
+        stream = self._open_stream(chat_id, f">>> {self._tail(source, limit=250)}")
+        ok, output = self._run_python_eval(source, timeout=config.TELEGRAM_COMMAND_TIMEOUT, stream=stream)
         elapsed = int(time.time() - started_at)
         status = "Python eval finished." if ok else "Python eval failed."
+        if stream is not None and stream.close(f"{status} Elapsed: {elapsed}s", filename=transcript_filename("eval")):
+            return
         self._send_message(
             chat_id,
             f"{status}\nElapsed: {elapsed}s\nCWD: {config.APP_ROOT}\n>>> {self._tail(source, limit=700)}\n\n{self._tail(output)}",
@@ -647,14 +960,21 @@ class TelegramControlBot:
             "If this fails, inputs will be unlocked automatically.",
         )
 
-        ok, output = self._run_update()
+        stream = self._open_stream(chat_id, "Update output")
+        ok, output = self._run_update(stream=stream)
         elapsed = int(time.time() - started_at)
+        streamed = stream is not None and stream.close(
+            f"{'Update command finished.' if ok else 'Update command failed.'} Elapsed: {elapsed}s",
+            filename=transcript_filename("update"),
+        )
+        # The output is already in the chat when it was streamed.
+        details = "" if streamed else "\n\n" + self._tail(output)
         if not ok:
             self._set_update_input_locked(False)
             self._send_message(
                 chat_id,
                 "Update failed. Inputs are unlocked and the old app is still running.\n"
-                f"Elapsed: {elapsed}s\n\n" + self._tail(output),
+                f"Elapsed: {elapsed}s" + details,
             )
             return
 
@@ -662,8 +982,7 @@ class TelegramControlBot:
             chat_id,
             "Update command finished successfully.\n"
             f"Elapsed: {elapsed}s\n"
-            f"Relaunch enabled: {'yes' if config.TELEGRAM_RELAUNCH_AFTER_UPDATE else 'no'}\n\n"
-            + self._tail(output),
+            f"Relaunch enabled: {'yes' if config.TELEGRAM_RELAUNCH_AFTER_UPDATE else 'no'}" + details,
         )
 
         if not config.TELEGRAM_RELAUNCH_AFTER_UPDATE:
@@ -829,19 +1148,24 @@ class TelegramControlBot:
 
         return True, "\n\n".join(outputs), new_commit
 
-    def _run_update(self) -> tuple[bool, str]:
+    def _run_update(self, stream: StreamingMessage | None = None) -> tuple[bool, str]:
         if config.TELEGRAM_UPDATE_COMMAND.strip():
             command = config.TELEGRAM_UPDATE_COMMAND.strip()
+            if stream is not None:
+                stream.write(f"$ {command}\n")
             ok, output = self._run_shell_command(
                 command,
                 cwd=config.APP_ROOT,
                 timeout=config.TELEGRAM_COMMAND_TIMEOUT,
+                stream=stream,
             )
             result = f"$ {command}\nCWD: {config.APP_ROOT}\n{output}"
             if ok:
                 source_status = self._update_source_status_text()
                 if source_status:
                     result = f"{result.rstrip()}\n\n{source_status}"
+                    if stream is not None:
+                        stream.write(f"\n{source_status}\n")
             return ok, result
 
         repo_root = self._git_repository_root()
@@ -860,7 +1184,9 @@ class TelegramControlBot:
             commands.append([sys.executable, "-m", "pip", "install", "-r", str(requirements_file)])
 
         for command in commands:
-            ok, output = self._run_process(command, cwd=repo_root, timeout=config.TELEGRAM_COMMAND_TIMEOUT)
+            if stream is not None:
+                stream.write(f"$ {self._format_command(command)}\n")
+            ok, output = self._run_process(command, cwd=repo_root, timeout=config.TELEGRAM_COMMAND_TIMEOUT, stream=stream)
             outputs.append(f"$ {self._format_command(command)}\n{output}".strip())
             if not ok:
                 return False, "\n\n".join(outputs)
@@ -1066,12 +1392,26 @@ class TelegramControlBot:
         text = str(commit or "").strip()
         return text[:7] if text else "unknown"
 
-    def _run_shell_command(self, command: str, cwd: Path, timeout: int) -> tuple[bool, str]:
+    def _run_shell_command(
+        self,
+        command: str,
+        cwd: Path,
+        timeout: int,
+        *,
+        stream: StreamingMessage | None = None,
+    ) -> tuple[bool, str]:
         if not command.strip():
             return False, "Command is empty."
-        return self._run_process(command, cwd=cwd, timeout=timeout, shell=True)
+        return self._run_process(command, cwd=cwd, timeout=timeout, shell=True, stream=stream)
+
+    def _open_stream(self, chat_id: int | str | None, title: str) -> StreamingMessage | None:
+        """Start a live-output message, or None when streaming is off or unavailable."""
+        if chat_id is None or not config.TELEGRAM_STREAM_OUTPUT:
+            return None
+        stream = StreamingMessage(chat_id, title).start()
+        return None if stream.failed else stream
 
-    def _run_python_eval(self, source: str, timeout: int) -> tuple[bool, str]:
+    def _run_python_eval(self, source: str, timeout: int, *, stream: StreamingMessage | None = None) -> tuple[bool, str]:
         runner = r"""
 import ast
 import pprint
@@ -1098,6 +1438,15 @@ else:
         traceback.print_exc()
         raise SystemExit(1)
 """
+        if stream is not None:
+            ok, output, _ = run_streaming(
+                [sys.executable, "-c", runner],
+                cwd=config.APP_ROOT,
+                timeout=timeout,
+                on_output=stream.write,
+                input_text=source,
+            )
+            return ok, output
         try:
             completed = subprocess.run(
                 [sys.executable, "-c", runner],
@@ -1125,7 +1474,11 @@ else:
         timeout: int,
         *,
         shell: bool = False,
+        stream: StreamingMessage | None = None,
     ) -> tuple[bool, str]:
+        if stream is not None:
+            ok, output, _ = run_streaming(command, cwd=cwd, timeout=timeout, on_output=stream.write, shell=shell)
+            return ok, output
         try:
             completed = subprocess.run(
                 command,
@@ -1146,14 +1499,8 @@ else:
         except FileNotFoundError as exc:
             return False, f"Command not found: {exc}"
 
-    def _api_call(self, method: str, params: dict[str, str], timeout: int) -> dict[str, Any]:
-        data = urllib.parse.urlencode(params).encode("utf-8")
-        request = urllib.request.Request(f"{self.api_url}/{method}", data=data, method="POST")
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-        if not payload.get("ok"):
-            raise RuntimeError(payload.get("description") or f"Telegram API call failed: {method}")
-        return payload
+    def _api_call(self, method: str, params: dict[str, str], timeout: int, *, long_poll: bool = False) -> dict[str, Any]:
+        return self.transport.call(method, params, timeout=timeout, long_poll=long_poll)
 
     def _send_message(self, chat_id: int | str | None, text: str) -> None:
         if chat_id is None:
@@ -1172,7 +1519,7 @@ else:
                     timeout=15,
                 )
                 return
-            except (urllib.error.URLError, RuntimeError, TimeoutError) as exc:
+            except (OSError, RuntimeError) as exc:
                 if attempt >= attempts:
                     log_error(f"[Telegram] Failed to send message after {attempts} attempt(s): {exc}")
                     return
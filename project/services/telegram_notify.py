@@ -1,17 +1,12 @@
 from __future__ import annotations
 
-import json
-import logging
 import threading
-import time
-import urllib.parse
-import urllib.request
 from typing import Literal
 
 from project.core import config
-
-
-logger = logging.getLogger("uvjerenja_terminal")
+from project.services.telegram_outbox import TelegramOutbox
+from project.services.telegram_transport import get_telegram_transport
+from project.utils.network_status import check_internet
 
 
 PLACEHOLDER_TOKENS = {
@@ -45,48 +40,49 @@ def _send_message(text: str, *, kind: NotificationKind = "status") -> None:
     if not _can_notify(kind):
         return
 
-    token = config.TELEGRAM_BOT_TOKEN.strip()
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = urllib.parse.urlencode(
+    get_telegram_transport().call(
+        "sendMessage",
         {
             "chat_id": str(config.TELEGRAM_ALLOWED_USER_ID),
             "text": text[:3500],
             "disable_web_page_preview": "true",
-        }
-    ).encode("utf-8")
-    request = urllib.request.Request(url, data=payload, method="POST")
-    with urllib.request.urlopen(request, timeout=10) as response:
-        result = json.loads(response.read().decode("utf-8"))
-    if not result.get("ok"):
-        raise RuntimeError(result.get("description") or "Telegram notification failed.")
+        },
+        timeout=10,
+    )
+
 
+_outbox_lock = threading.Lock()
+_outbox: TelegramOutbox | None = None
 
-def _send_message_with_retries(text: str, *, kind: NotificationKind = "status") -> None:
-    attempts = max(1, config.TELEGRAM_SEND_RETRY_ATTEMPTS)
-    delay = max(0, config.TELEGRAM_SEND_RETRY_DELAY_SECONDS)
-    last_exc: Exception | None = None
 
-    for attempt in range(1, attempts + 1):
-        try:
-            _send_message(text, kind=kind)
-            return
-        except Exception as exc:
-            last_exc = exc
-            if attempt < attempts and delay > 0:
-                time.sleep(delay * attempt)
+def get_telegram_outbox() -> TelegramOutbox:
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = TelegramOutbox(
+                lambda text, kind: _send_message(text, kind=kind),  # type: ignore[arg-type]
+                store_path=config.TELEGRAM_OUTBOX_FILE if config.TELEGRAM_OUTBOX_PERSIST else None,
+                is_online=lambda: check_internet()[0],
+            )
+        return _outbox
 
-    if last_exc is not None:
-        raise last_exc
+
+def start_telegram_outbox() -> None:
+    """Deliver messages a previous run left in the outbox store."""
+    if _base_can_notify():
+        get_telegram_outbox().start()
+
+
+def stop_telegram_outbox() -> None:
+    global _outbox
+    with _outbox_lock:
+        outbox = _outbox
+        _outbox = None
+    if outbox is not None:
+        outbox.stop()
 
 
 def notify_telegram_async(text: str, *, kind: NotificationKind = "status") -> None:
     if not _can_notify(kind):
         return
-
-    def worker() -> None:
-        try:
-            _send_message_with_retries(text, kind=kind)
-        except Exception as exc:
-            logger.error("[Telegram] Notification failed: %s", exc)
-
-    threading.Thread(target=worker, name=f"telegram-notify-{kind}", daemon=True).start()
+    get_telegram_outbox().enqueue(text, kind)
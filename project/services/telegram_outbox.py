@@ -0,0 +1,536 @@
+"""Single outbound queue for Telegram notifications.
+
+One worker thread sends everything. Errors outrank status messages, messages
+of the same kind that arrive within TELEGRAM_COALESCE_SECONDS are merged into
+one send, and a 429 answer pauses the whole queue for ``retry_after``. The
+queue is bounded: when it is full a status message is evicted to make room
+for an error, otherwise the new message is dropped and counted.
+
+With a store path the queue is mirrored into a small SQLite table, so
+messages survive Wi-Fi outages and app restarts. Callers never touch the
+disk: ``enqueue`` only updates memory and the worker thread writes the rows.
+While the network is down the worker probes connectivity instead of burning
+retries, then flushes in (priority, arrival) order. Messages older than
+TELEGRAM_OUTBOX_MAX_AGE_MINUTES are collapsed into one summary.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from project.core import config
+from project.services.telegram_transport import TelegramApiError
+from project.utils.logging_utils import log_error, log_info
+
+
+PRIORITY = {"error": 0, "status": 1}
+MESSAGE_LIMIT = 3500
+_MERGE_SEPARATOR = "\n\n— — —\n\n"
+_DROP_LOG_INTERVAL_SECONDS = 60.0
+# A failing store write is retried after 2, 4, 8... seconds (at most 60);
+# after this many failures in a row the queue stays in memory only.
+_STORE_MAX_FAILURES = 5
+_STORE_RETRY_MAX_SECONDS = 60.0
+
+
+@dataclass(order=True)
+class _Message:
+    priority: int
+    seq: int
+    kind: str = field(compare=False)
+    text: str = field(compare=False)
+    created_at: float = field(compare=False)
+    not_before: float = field(compare=False)
+    created_wall: float = field(default_factory=time.time, compare=False)
+    parts: int = field(default=1, compare=False)
+    attempts: int = field(default=0, compare=False)
+    row_id: int | None = field(default=None, compare=False)
+    version: int = field(default=0, compare=False)
+    saved_version: int = field(default=-1, compare=False)
+
+
+class _OutboxStore:
+    """SQLite mirror of the queue; used only from the worker thread."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " priority INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " parts INTEGER NOT NULL DEFAULT 1,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def load(self) -> list[tuple[int, str, int, str, int, float]]:
+        return list(self._db.execute("SELECT id, kind, priority, text, parts, created_at FROM outbox ORDER BY priority, id"))
+
+    def save(self, inserts: list[_Message], updates: list[tuple[int, str, int]], deletes: list[int]) -> list[int]:
+        row_ids: list[int] = []
+        with self._db:
+            for message in inserts:
+                cursor = self._db.execute(
+                    "INSERT INTO outbox (kind, priority, text, parts, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (message.kind, message.priority, message.text, message.parts, message.created_wall),
+                )
+                row_ids.append(int(cursor.lastrowid))
+            for row_id, text, parts in updates:
+                self._db.execute("UPDATE outbox SET text = ?, parts = ? WHERE id = ?", (text, parts, row_id))
+            if deletes:
+                self._db.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in deletes])
+        return row_ids
+
+    def close(self) -> None:
+        try:
+            self._db.close()
+        except sqlite3.Error:
+            pass
+
+
+class TelegramOutbox:
+    def __init__(
+        self,
+        send: Callable[[str, str], None],
+        *,
+        store_path: Path | None = None,
+        is_online: Callable[[], bool] | None = None,
+        max_messages: int | None = None,
+        coalesce_seconds: float | None = None,
+        retry_attempts: int | None = None,
+        retry_delay_seconds: float | None = None,
+        offline_retry_seconds: float | None = None,
+        max_age_seconds: float | None = None,
+    ) -> None:
+        self._send = send
+        self._store_path = store_path
+        self._is_online = is_online
+        self.max_messages = max(1, max_messages if max_messages is not None else config.TELEGRAM_OUTBOX_MAX_MESSAGES)
+        self.coalesce_seconds = max(0.0, float(coalesce_seconds if coalesce_seconds is not None else config.TELEGRAM_COALESCE_SECONDS))
+        self.retry_attempts = max(1, retry_attempts if retry_attempts is not None else config.TELEGRAM_SEND_RETRY_ATTEMPTS)
+        self.retry_delay_seconds = max(0.0, float(retry_delay_seconds if retry_delay_seconds is not None else config.TELEGRAM_SEND_RETRY_DELAY_SECONDS))
+        self.offline_retry_seconds = max(
+            1.0,
+            float(offline_retry_seconds if offline_retry_seconds is not None else config.TELEGRAM_OUTBOX_OFFLINE_RETRY_SECONDS),
+        )
+        self.max_age_seconds = max(
+            60.0,
+            float(max_age_seconds if max_age_seconds is not None else config.TELEGRAM_OUTBOX_MAX_AGE_MINUTES * 60),
+        )
+        self._heap: list[_Message] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._paused_until = 0.0
+        self._offline_since: float | None = None
+        self._dirty = False
+        self._deleted_rows: list[int] = []
+        self._store: _OutboxStore | None = None
+        self._store_failures = 0
+        self._persist_retry_at = 0.0
+        self._last_drop_log_at = 0.0
+        self._drops_since_log = 0
+        self.counters: dict[str, int] = {
+            "enqueued": 0,
+            "merged": 0,
+            "sent": 0,
+            "rate_limited": 0,
+            "collapsed": 0,
+            "dropped_full": 0,
+            "dropped_failed": 0,
+        }
+
+    # -- producer side -----------------------------------------------------
+
+    def start(self) -> None:
+        """Start the worker now, so messages persisted by a previous run go out."""
+        with self._cond:
+            if not self._stopping:
+                self._ensure_worker_unlocked()
+
+    def enqueue(self, text: str, kind: str = "status") -> bool:
+        """Queue a message without blocking; False when it had to be dropped."""
+        text = str(text or "").strip()
+        if not text:
+            return False
+        priority = PRIORITY.get(kind, PRIORITY["status"])
+        now = time.monotonic()
+        with self._cond:
+            if self._stopping:
+                return False
+            self.counters["enqueued"] += 1
+            if self._merge_unlocked(kind, text, now):
+                self.counters["merged"] += 1
+                self._dirty = True
+                self._cond.notify()
+                return True
+            if len(self._heap) >= self.max_messages and not self._evict_for_unlocked(priority):
+                self._count_drop_unlocked("dropped_full")
+                return False
+            message = _Message(priority, next(self._seq), kind, text, now, now + self.coalesce_seconds)
+            heapq.heappush(self._heap, message)
+            self._dirty = True
+            self._ensure_worker_unlocked()
+            self._cond.notify()
+            return True
+
+    def resume(self) -> None:
+        """Hint that the network is back (e.g. polling recovered); retry now."""
+        with self._cond:
+            if self._offline_since is not None:
+                self._paused_until = 0.0
+                self._cond.notify()
+
+    def _merge_unlocked(self, kind: str, text: str, now: float) -> bool:
+        if self.coalesce_seconds <= 0:
+            return False
+        for message in self._heap:
+            if (
+                message.kind == kind
+                and message.attempts == 0
+                and now - message.created_at <= self.coalesce_seconds
+                and len(message.text) + len(_MERGE_SEPARATOR) + len(text) <= MESSAGE_LIMIT
+            ):
+                message.text = f"{message.text}{_MERGE_SEPARATOR}{text}"
+                message.parts += 1
+                message.version += 1
+                return True
+        return False
+
+    def _evict_for_unlocked(self, priority: int) -> bool:
+        """Make room for a message by dropping the newest less important one."""
+        victims = [message for message in self._heap if message.priority > priority]
+        if not victims:
+            return False
+        self._remove_unlocked(max(victims))
+        self._count_drop_unlocked("dropped_full")
+        return True
+
+    def _remove_unlocked(self, message: _Message) -> None:
+        self._heap.remove(message)
+        heapq.heapify(self._heap)
+        if message.row_id is not None:
+            self._deleted_rows.append(message.row_id)
+            self._dirty = True
+
+    def _count_drop_unlocked(self, counter: str) -> None:
+        self.counters[counter] += 1
+        self._drops_since_log += 1
+
+    def _ensure_worker_unlocked(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+        self._thread.start()
+
+    # -- persistence (worker thread only) ---------------------------------
+
+    def _open_store(self) -> None:
+        if self._store_path is None:
+            return
+        try:
+            self._store = _OutboxStore(self._store_path)
+            rows = self._store.load()
+        except (OSError, sqlite3.Error) as exc:
+            self._store = None
+            log_error(f"[Telegram] Outbox store {self._store_path} unavailable, keeping messages in memory: {exc}")
+            return
+        if not rows:
+            return
+        now = time.monotonic()
+        with self._cond:
+            for row_id, kind, priority, text, parts, created_wall in rows:
+                message = _Message(int(priority), next(self._seq), str(kind), str(text), now, now, float(created_wall), int(parts))
+                message.row_id = int(row_id)
+                message.saved_version = message.version
+                heapq.heappush(self._heap, message)
+        log_info(f"[Telegram] Outbox restored {len(rows)} unsent message(s) from {self._store_path}")
+
+    def _persist_waiting_unlocked(self) -> bool:
+        """True while a failed store write is backing off; sending goes on meanwhile."""
+        return self._dirty and self._persist_retry_at > time.monotonic()
+
+    def _persist(self, *, force: bool = False) -> None:
+        with self._cond:
+            if not self._dirty or (self._persist_waiting_unlocked() and not force):
+                return
+            self._dirty = False
+            if self._store is None:
+                self._deleted_rows.clear()
+                return
+            inserts = [message for message in self._heap if message.row_id is None]
+            changed = [message for message in self._heap if message.row_id is not None and message.saved_version != message.version]
+            updates = [(int(message.row_id or 0), message.text, message.parts) for message in changed]
+            changed_versions = [message.version for message in changed]
+            deletes, self._deleted_rows = self._deleted_rows, []
+            insert_versions = [message.version for message in inserts]
+        try:
+            row_ids = self._store.save(inserts, updates, deletes)
+        except sqlite3.Error as exc:
+            with self._cond:
+                self._store_failures += 1
+                if self._store_failures >= _STORE_MAX_FAILURES:
+                    store, self._store = self._store, None
+                    self._deleted_rows.clear()
+                    self._persist_retry_at = 0.0
+                else:
+                    store = None
+                    self._deleted_rows.extend(deletes)
+                    self._dirty = True
+                    delay = min(_STORE_RETRY_MAX_SECONDS, 2.0**self._store_failures)
+                    self._persist_retry_at = time.monotonic() + delay
+            if store is not None:
+                log_error(
+                    f"[Telegram] Outbox store write failed {_STORE_MAX_FAILURES} times, keeping messages in memory only: {exc}"
+                )
+                try:
+                    store.close()
+                except sqlite3.Error:
+                    pass
+            else:
+                log_error(f"[Telegram] Outbox store write failed, retrying in {delay:.0f}s: {exc}")
+            return
+        with self._cond:
+            self._store_failures = 0
+            self._persist_retry_at = 0.0
+            for message, row_id, version in zip(inserts, row_ids, insert_versions):
+                message.row_id = row_id
+                message.saved_version = version
+                if message.version != version or message not in self._heap:
+                    # Merged into or removed while the write was running.
+                    self._dirty = True
+                    if message not in self._heap:
+                        self._deleted_rows.append(row_id)
+            for message, version in zip(changed, changed_versions):
+                message.saved_version = version
+                if message.version != version:
+                    self._dirty = True
+
+    def _forget(self, message: _Message) -> None:
+        if message.row_id is None:
+            return
+        with self._cond:
+            self._deleted_rows.append(message.row_id)
+            self._dirty = True
+
+    # -- worker side -------------------------------------------------------
+
+    def _collapse_stale_unlocked(self) -> None:
+        cutoff = time.time() - self.max_age_seconds
+        stale = [message for message in self._heap if message.created_wall < cutoff]
+        if len(stale) < 2:
+            return
+        stale.sort(key=lambda message: message.created_wall)
+        for message in stale:
+            self._remove_unlocked(message)
+        errors = sum(message.parts for message in stale if message.kind == "error")
+        total = sum(message.parts for message in stale)
+        first = datetime.fromtimestamp(stale[0].created_wall).strftime("%d.%m.%Y %H:%M")
+        last = datetime.fromtimestamp(stale[-1].created_wall).strftime("%d.%m.%Y %H:%M")
+        lines = [
+            f"Uvjerenja Terminal: {total} older notification(s) from {first} to {last} were not delivered in time.",
+            f"Errors: {errors}, status: {total - errors}. First lines:",
+        ]
+        for message in stale:
+            first_line = message.text.strip().splitlines()[0] if message.text.strip() else ""
+            when = datetime.fromtimestamp(message.created_wall).strftime("%H:%M")
+            lines.append(f"- {when} {first_line[:120]}")
+        text = "\n".join(lines)
+        if len(text) > MESSAGE_LIMIT:
+            text = text[: MESSAGE_LIMIT - 20].rstrip() + "\n... (truncated)"
+        now = time.monotonic()
+        summary = _Message(
+            min(message.priority for message in stale),
+            next(self._seq),
+            "error" if errors else "status",
+            text,
+            now,
+            now,
+            stale[-1].created_wall,
+        )
+        heapq.heappush(self._heap, summary)
+        self.counters["collapsed"] += len(stale)
+        self._dirty = True
+
+    def _stop_reached_unlocked(self) -> bool:
+        """While stopping, send only what can go out now; the store keeps the rest."""
+        return (
+            not self._heap
+            or self._offline_since is not None
+            or self._paused_until > time.monotonic()
+        )
+
+    def _next_ready(self) -> _Message | None:
+        """Return the next message to send, or None to persist / stop."""
+        with self._cond:
+            while True:
+                backing_off = self._persist_waiting_unlocked()
+                if self._dirty and not backing_off:
+                    return None
+                if self._stopping and self._stop_reached_unlocked():
+                    return None
+                now = time.monotonic()
+                wake_at = self._paused_until
+                # Wake up for the store retry even if nothing is ready to send.
+                retry_wait = self._persist_retry_at - now if backing_off else None
+                if self._heap:
+                    if not self._stopping:
+                        wake_at = max(wake_at, self._heap[0].not_before)
+                    if wake_at <= now:
+                        self._collapse_stale_unlocked()
+                        if self._dirty and not self._persist_waiting_unlocked():
+                            return None
+                        return heapq.heappop(self._heap)
+                    wait = wake_at - now
+                    self._cond.wait(wait if retry_wait is None else min(wait, retry_wait))
+                else:
+                    self._cond.wait(retry_wait)
+
+    def _run(self) -> None:
+        self._open_store()
+        try:
+            while True:
+                self._persist()
+                with self._cond:
+                    settled = not self._dirty or self._persist_waiting_unlocked()
+                    if self._stopping and settled and self._stop_reached_unlocked():
+                        return
+                if self._offline_since is not None and not self._wait_until_online():
+                    continue
+                message = self._next_ready()
+                if message is None:
+                    continue
+                self._deliver(message)
+                self._maybe_log_drops()
+        finally:
+            self._persist(force=True)
+            if self._store is not None:
+                self._store.close()
+
+    def _wait_until_online(self) -> bool:
+        """While offline, probe connectivity at the retry interval."""
+        with self._cond:
+            delay = self._paused_until - time.monotonic()
+            if delay > 0 and not self._stopping:
+                self._cond.wait(delay)
+                return False
+            if self._stopping:
+                return True
+        if self._is_online is not None:
+            try:
+                online = self._is_online()
+            except Exception:
+                online = False
+            if not online:
+                with self._cond:
+                    self._paused_until = time.monotonic() + self.offline_retry_seconds
+                return False
+        return True
+
+    def _deliver(self, message: _Message) -> None:
+        try:
+            self._send(message.text, message.kind)
+        except TelegramApiError as exc:
+            if exc.retry_after:
+                # Flood control: hold the whole queue, not just this message.
+                self.counters["rate_limited"] += 1
+                self._requeue(message, delay=0.0, pause_for=float(exc.retry_after), count_attempt=False)
+                return
+            self._retry_or_drop(message, exc)
+            return
+        except (ConnectionError, TimeoutError) as exc:
+            # The network is down: keep the message and wait for connectivity
+            # instead of spending its retries.
+            self._go_offline(message, exc)
+            return
+        except Exception as exc:
+            self._retry_or_drop(message, exc)
+            return
+        with self._cond:
+            self.counters["sent"] += 1
+            came_back = self._offline_since
+            self._offline_since = None
+        if came_back is not None:
+            log_info(f"[Telegram] Outbox back online after {time.monotonic() - came_back:.0f}s; flushing queued messages.")
+        self._forget(message)
+
+    def _go_offline(self, message: _Message, exc: Exception) -> None:
+        with self._cond:
+            first = self._offline_since is None
+            if first:
+                self._offline_since = time.monotonic()
+        if first:
+            log_info(f"[Telegram] Outbox offline, holding messages until the network returns: {exc}")
+        self._requeue(message, delay=0.0, pause_for=self.offline_retry_seconds, count_attempt=False)
+
+    def _retry_or_drop(self, message: _Message, exc: Exception) -> None:
+        if message.attempts + 1 >= self.retry_attempts:
+            with self._cond:
+                self._count_drop_unlocked("dropped_failed")
+            self._forget(message)
+            log_error(f"[Telegram] Notification dropped after {message.attempts + 1} attempt(s): {exc}")
+            return
+        self._requeue(message, delay=self.retry_delay_seconds * (message.attempts + 1))
+
+    def _requeue(self, message: _Message, *, delay: float, pause_for: float = 0.0, count_attempt: bool = True) -> None:
+        now = time.monotonic()
+        with self._cond:
+            if count_attempt:
+                message.attempts += 1
+            message.not_before = now + delay
+            if pause_for > 0:
+                self._paused_until = max(self._paused_until, now + pause_for)
+            heapq.heappush(self._heap, message)
+            self._cond.notify()
+
+    def _maybe_log_drops(self) -> None:
+        now = time.monotonic()
+        with self._cond:
+            if not self._drops_since_log or now - self._last_drop_log_at < _DROP_LOG_INTERVAL_SECONDS:
+                return
+            dropped = self._drops_since_log
+            self._drops_since_log = 0
+            self._last_drop_log_at = now
+            counters = dict(self.counters)
+            queued = len(self._heap)
+        log_info(
+            f"[Telegram] Outbox dropped {dropped} message(s): full={counters['dropped_full']} "
+            f"failed={counters['dropped_failed']} sent={counters['sent']} merged={counters['merged']} "
+            f"rate_limited={counters['rate_limited']} queued={queued}"
+        )
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                **self.counters,
+                "queued": len(self._heap),
+                "persistent": self._store is not None,
+                "offline_seconds": 0.0 if self._offline_since is None else now - self._offline_since,
+                "paused_seconds": max(0.0, self._paused_until - now),
+            }
+
+    def stop(self, *, timeout: float = 2.0) -> None:
+        """Stop accepting messages; unsent ones stay in the store for next start."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=timeout)
@@ -0,0 +1,322 @@
+"""Live output of long bot commands (/cmd, /eval, /update) in Telegram.
+
+``run_streaming`` reads a child's stdout incrementally and hands every chunk
+to a callback. ``StreamingMessage`` shows that output in one Telegram message
+that is edited in place, at most once per TELEGRAM_STREAM_EDIT_INTERVAL_SECONDS
+(editMessageText counts against the same per-chat rate limit as sending).
+When the message is full it is finished and a new one continues the output,
+up to _MAX_LIVE_PARTS messages; after that the last message only says the
+output was truncated and the transcript carries the rest. The complete transcript is kept in a spooled temporary file and uploaded as a
+document when the command finishes, if it did not fit in a single message.
+
+If Telegram fails mid-stream, the command keeps running; ``close`` returns
+False so the caller can fall back to a plain summary message.
+"""
+
+from __future__ import annotations
+
+import codecs
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from project.core import config
+from project.services.telegram_transport import TelegramApiError, TelegramTransport, get_telegram_transport
+from project.utils.cancellation import kill_process_group
+from project.utils.logging_utils import log_error
+
+
+# Telegram rejects messages above 4096 characters; leave room for the header.
+_HEADER_LIMIT = 300
+_TRANSCRIPT_MAX_BYTES = 20 * 1024 * 1024
+# More live messages than this only flood the chat; the transcript has it all.
+_MAX_LIVE_PARTS = 5
+_TRUNCATED_NOTE = "… output truncated, full transcript attached"
+
+
+class StreamingMessage:
+    def __init__(
+        self,
+        chat_id: int | str,
+        title: str,
+        *,
+        transport: TelegramTransport | None = None,
+        edit_interval: float | None = None,
+        message_chars: int | None = None,
+    ) -> None:
+        self.chat_id = str(chat_id)
+        self.title = title if len(title) <= _HEADER_LIMIT else title[: _HEADER_LIMIT - 3] + "..."
+        self.transport = transport or get_telegram_transport()
+        self.edit_interval = max(1.0, float(edit_interval if edit_interval is not None else config.TELEGRAM_STREAM_EDIT_INTERVAL_SECONDS))
+        self.message_chars = max(500, min(3700, message_chars if message_chars is not None else config.TELEGRAM_STREAM_MESSAGE_CHARS))
+        self._lock = threading.Lock()
+        # Serialises _flush between the flush thread and close().
+        self._flush_lock = threading.Lock()
+        self._buffer = ""
+        self._full_parts: list[str] = []
+        self._part_count = 1
+        self._truncated = False
+        self._dirty = False
+        self._part = 1
+        self._message_id: int | None = None
+        self._shown = ""
+        self._next_call_at = 0.0
+        self._rolled_over = False
+        self._failed = False
+        self._closed = threading.Event()
+        self._wake = threading.Event()
+        self._transcript = tempfile.SpooledTemporaryFile(max_size=512 * 1024, mode="w+b")
+        self._transcript_bytes = 0
+        self._thread: threading.Thread | None = None
+
+    @property
+    def failed(self) -> bool:
+        return self._failed
+
+    def start(self) -> "StreamingMessage":
+        """Send the first message; on failure nothing keeps running and ``failed`` is set."""
+        self._message_id = self._send_new(self._render("", "running..."))
+        if self._failed or self._message_id is None:
+            self._failed = True
+            self._closed.set()
+            self._transcript.close()
+            return self
+        self._thread = threading.Thread(target=self._flush_loop, name="telegram-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        data = text.encode("utf-8", errors="replace")
+        with self._lock:
+            if self._transcript_bytes < _TRANSCRIPT_MAX_BYTES:
+                self._transcript.write(data)
+                self._transcript_bytes += len(data)
+            if self._truncated:
+                return
+            self._buffer += text
+            while len(self._buffer) > self.message_chars:
+                # Prefer to break the message at a line boundary.
+                cut = self._buffer.rfind("\n", 0, self.message_chars)
+                if cut < self.message_chars // 2:
+                    cut = self.message_chars
+                if self._part_count >= _MAX_LIVE_PARTS:
+                    self._buffer = self._buffer[:cut]
+                    self._truncated = True
+                    break
+                self._full_parts.append(self._buffer[:cut])
+                self._buffer = self._buffer[cut:].lstrip("\n")
+                self._part_count += 1
+            self._dirty = True
+        self._wake.set()
+
+    def close(self, status: str, *, filename: str = "output.txt") -> bool:
+        """Show the final status, upload the transcript if needed; True if all of it reached Telegram."""
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.edit_interval + 30)
+        # If the join timed out, this waits for the thread's flush to finish.
+        self._flush(status=status, final=True)
+        try:
+            if not self._failed and (self._rolled_over or self._truncated) and self._transcript_bytes:
+                self._upload_transcript(status, filename)
+        finally:
+            self._transcript.close()
+        return not self._failed
+
+    # -- internals ---------------------------------------------------------
+
+    def _render(self, body: str, status: str = "") -> str:
+        header = self.title if self._part == 1 else f"{self.title} (part {self._part})"
+        text = f"{header}\n\n{body.strip() or '(no output yet)'}"
+        if status:
+            text += f"\n\n{status}"
+        return text
+
+    def _flush_loop(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.edit_interval)
+            self._wake.clear()
+            if self._closed.is_set():
+                return
+            self._flush()
+
+    def _flush(self, *, status: str = "", final: bool = False) -> None:
+        with self._flush_lock:
+            # After close() starts, only its own final flush may edit.
+            if self._failed or (self._closed.is_set() and not final):
+                return
+            self._flush_unlocked(status)
+
+    def _flush_unlocked(self, status: str) -> None:
+        with self._lock:
+            full_parts, self._full_parts = self._full_parts, []
+            body = self._buffer
+            dirty = self._dirty
+            self._dirty = False
+            truncated = self._truncated
+        if truncated:
+            status = f"{_TRUNCATED_NOTE}\n{status}" if status else _TRUNCATED_NOTE
+        for part in full_parts:
+            self._edit(self._render(part))
+            if self._failed:
+                return
+            self._part += 1
+            self._rolled_over = True
+            self._message_id = self._send_new(self._render("", "continued..."))
+            if self._failed:
+                return
+        if dirty or full_parts or status:
+            self._edit(self._render(body, status))
+
+    def _throttle(self) -> None:
+        delay = self._next_call_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_call_at = time.monotonic() + self.edit_interval
+
+    def _call(self, method: str, params: dict[str, str]) -> dict | None:
+        for _ in range(3):
+            self._throttle()
+            try:
+                return self.transport.call(method, params, timeout=15)
+            except TelegramApiError as exc:
+                if exc.retry_after:
+                    self._next_call_at = time.monotonic() + float(exc.retry_after)
+                    continue
+                if "message is not modified" in str(exc).lower():
+                    return None
+                log_error(f"[Telegram] Streaming {method} failed: {exc}")
+                break
+            except (OSError, RuntimeError) as exc:
+                log_error(f"[Telegram] Streaming {method} failed: {exc}")
+                break
+        self._failed = True
+        return None
+
+    def _send_new(self, text: str) -> int | None:
+        payload = self._call("sendMessage", {"chat_id": self.chat_id, "text": text, "disable_web_page_preview": "true"})
+        result = (payload or {}).get("result") or {}
+        self._shown = text
+        return result.get("message_id") if isinstance(result, dict) else None
+
+    def _edit(self, text: str) -> None:
+        if self._message_id is None or text == self._shown:
+            return
+        self._call("editMessageText", {"chat_id": self.chat_id, "message_id": str(self._message_id), "text": text})
+        self._shown = text
+
+    def _upload_transcript(self, status: str, filename: str) -> None:
+        with self._lock:
+            self._transcript.seek(0)
+            data = self._transcript.read()
+        self._throttle()
+        try:
+            self.transport.upload(
+                "sendDocument",
+                {"chat_id": self.chat_id, "caption": f"{self.title[:200]}\n{status}"[:1000]},
+                file_field="document",
+                filename=filename,
+                data=data,
+                timeout=120,
+            )
+        except (OSError, RuntimeError) as exc:
+            log_error(f"[Telegram] Transcript upload failed: {exc}")
+            self._failed = True
+
+
+def transcript_filename(prefix: str) -> str:
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+
+
+def run_streaming(
+    command: list[str] | str,
+    *,
+    cwd: Path,
+    timeout: float,
+    on_output: Callable[[str], None],
+    shell: bool = False,
+    input_text: str | None = None,
+    tail_chars: int = 4000,
+) -> tuple[bool, str, bool]:
+    """Run a command, passing its combined stdout/stderr to ``on_output`` as it arrives.
+
+    Returns (ok, tail of the output, timed_out). The child runs in its own
+    session so a timeout kills the whole process tree.
+    """
+    try:
+        proc = subprocess.Popen(
+            command,
+            cwd=str(cwd),
+            shell=shell,
+            stdin=subprocess.PIPE if input_text is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+    except FileNotFoundError as exc:
+        message = f"Command not found: {exc}"
+        on_output(message)
+        return False, message, False
+
+    tail: deque[str] = deque()
+    tail_size = [0]
+
+    def reader() -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        assert proc.stdout is not None
+        fd = proc.stdout.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 4096)
+            except OSError:
+                chunk = b""
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                tail.append(text)
+                tail_size[0] += len(text)
+                while tail_size[0] > tail_chars and len(tail) > 1:
+                    tail_size[0] -= len(tail.popleft())
+                try:
+                    on_output(text)
+                except Exception:
+                    pass
+            if not chunk:
+                return
+
+    reader_thread = threading.Thread(target=reader, name="stream-reader", daemon=True)
+    reader_thread.start()
+    if input_text is not None and proc.stdin is not None:
+        try:
+            proc.stdin.write(input_text.encode("utf-8"))
+            proc.stdin.close()
+        except OSError:
+            pass
+
+    timed_out = False
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        kill_process_group(proc)
+        proc.wait()
+    reader_thread.join(timeout=5)
+    if proc.stdout is not None:
+        proc.stdout.close()
+    output = "".join(tail)
+    if timed_out:
+        note = f"\nCommand timed out after {int(timeout)} seconds."
+        on_output(note)
+        output += note
+    elif not output.strip():
+        output = f"Exit code: {proc.returncode}"
+    return proc.returncode == 0 and not timed_out, output, timed_out
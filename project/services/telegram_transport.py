@@ -0,0 +1,371 @@
+"""Shared keep-alive HTTP client for the Telegram Bot API.
+
+Every Bot API request used to open a fresh connection (DNS, TCP and TLS
+handshake). Here a small pool of persistent connections is shared by the
+control bot and the notifications, and long polling gets a dedicated
+connection so a 25 s getUpdates never blocks an outgoing message.
+
+Connect and read timeouts are separate: a dead network fails fast on connect
+while long polls may wait for the server. A request that fails on a reused
+connection because the server silently closed it is retried once on a fresh
+connection.
+
+All calls go through the "telegram" circuit breaker: during an outage they
+fail fast with CircuitOpenError (a ConnectionError) instead of each waiting
+for the connect timeout.
+
+This module must not log through log_error(): that forwards errors to
+Telegram and would recurse into the transport.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import uuid
+from typing import Any
+
+from project.core import config
+from project.utils import metrics, tracing
+from project.utils.circuit_breaker import CircuitOpenError, get_breaker
+
+
+_REQUEST_SECONDS = metrics.histogram("kiosk_telegram_request_seconds", "Bot API request latency by method.", ("method",))
+_REQUEST_FAILURES = metrics.counter("kiosk_telegram_request_failures_total", "Failed Bot API requests by method and reason.", ("method", "reason"))
+
+
+class TelegramApiError(RuntimeError):
+    """The Bot API answered, but with ``ok: false``."""
+
+    def __init__(self, description: str, *, error_code: int | None = None, retry_after: float | None = None) -> None:
+        super().__init__(description)
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+class TelegramTransportError(ConnectionError):
+    """The request did not produce a Bot API answer (network, TLS, bad HTTP)."""
+
+
+# Errors that mean a kept-alive connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class _PooledConnection:
+    def __init__(self, conn: http.client.HTTPConnection) -> None:
+        self.conn = conn
+        self.last_used = time.monotonic()
+        self.requests = 0
+
+
+class TelegramTransport:
+    def __init__(
+        self,
+        token: str | None = None,
+        *,
+        base_url: str | None = None,
+        pool_size: int | None = None,
+        connect_timeout: float | None = None,
+        keepalive_idle_seconds: float | None = None,
+    ) -> None:
+        self.token = (config.TELEGRAM_BOT_TOKEN if token is None else token).strip()
+        url = urllib.parse.urlsplit(base_url or config.TELEGRAM_API_BASE_URL)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"Unsupported Telegram API base URL: {base_url or config.TELEGRAM_API_BASE_URL}")
+        self._scheme = url.scheme
+        self._host = url.hostname
+        self._port = url.port
+        self._path_prefix = url.path.rstrip("/")
+        self.pool_size = max(1, pool_size if pool_size is not None else config.TELEGRAM_POOL_SIZE)
+        self.connect_timeout = max(1.0, float(connect_timeout if connect_timeout is not None else config.TELEGRAM_CONNECT_TIMEOUT))
+        self.keepalive_idle_seconds = max(
+            1.0,
+            float(keepalive_idle_seconds if keepalive_idle_seconds is not None else config.TELEGRAM_KEEPALIVE_IDLE_SECONDS),
+        )
+        self._ssl_context = ssl.create_default_context() if self._scheme == "https" else None
+        self._lock = threading.Lock()
+        self._idle: list[_PooledConnection] = []
+        self._poll_lock = threading.Lock()
+        self._poll_connection: _PooledConnection | None = None
+        self._closed = False
+        self.connections_opened = 0
+
+    # -- public API --------------------------------------------------------
+
+    def call(self, method: str, params: dict[str, str] | None = None, *, timeout: float, long_poll: bool = False) -> dict[str, Any]:
+        """POST a Bot API method and return the decoded ``ok`` payload.
+
+        ``timeout`` bounds the wait for the response once connected; the
+        connect itself is bounded by ``connect_timeout``.
+        """
+        body = urllib.parse.urlencode(params or {}).encode("utf-8")
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        return self.request(method, body, headers, timeout=timeout, long_poll=long_poll)
+
+    def upload(
+        self,
+        method: str,
+        params: dict[str, str],
+        *,
+        file_field: str,
+        filename: str,
+        data: bytes,
+        content_type: str = "text/plain",
+        timeout: float,
+    ) -> dict[str, Any]:
+        """POST a Bot API method with one file as multipart/form-data (sendDocument)."""
+        boundary = f"potvrde-{uuid.uuid4().hex}"
+        parts: list[bytes] = []
+        for name, value in params.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            )
+        safe_name = filename.replace('"', "_")
+        parts.append(
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{file_field}"; filename="{safe_name}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n"
+            ).encode("utf-8")
+            + data
+            + b"\r\n"
+        )
+        parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        return self.request(method, b"".join(parts), headers, timeout=timeout)
+
+    def request(
+        self,
+        method: str,
+        body: bytes,
+        headers: dict[str, str],
+        *,
+        timeout: float,
+        long_poll: bool = False,
+    ) -> dict[str, Any]:
+        if self._closed:
+            raise TelegramTransportError("Telegram transport is closed.")
+        breaker = get_breaker("telegram")
+        try:
+            breaker.raise_if_open()
+        except CircuitOpenError:
+            _REQUEST_FAILURES.inc(method=method, reason="circuit_open")
+            raise
+        path = f"{self._path_prefix}/bot{self.token}/{method}"
+        started = time.monotonic()
+        trace = tracing.start_span(f"telegram.{method}", "telegram")
+        try:
+            if long_poll:
+                with self._poll_lock:
+                    pooled = self._poll_connection
+                    self._poll_connection = None
+                    pooled, status, raw = self._send(pooled, path, body, headers, timeout)
+                    self._poll_connection = pooled
+            else:
+                pooled, status, raw = self._send(self._acquire(), path, body, headers, timeout)
+                if pooled is not None:
+                    self._release(pooled)
+            payload = self._decode(method, status, raw)
+        except TelegramApiError as exc:
+            # Telegram answered; only its own 5xx errors count against it.
+            if (exc.error_code or 0) >= 500:
+                breaker.record_failure(str(exc))
+            else:
+                breaker.record_success()
+            _REQUEST_FAILURES.inc(method=method, reason="api")
+            raise
+        except TelegramTransportError as exc:
+            breaker.record_failure(str(exc))
+            _REQUEST_FAILURES.inc(method=method, reason="transport")
+            raise
+        except Exception:
+            # No verdict on Telegram (e.g. a bug in decoding), but a claimed
+            # half-open trial must be handed back or the breaker never closes.
+            breaker.release()
+            raise
+        finally:
+            trace.end()
+        breaker.record_success()
+        _REQUEST_SECONDS.observe(time.monotonic() - started, method=method)
+        return payload
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close_quietly(pooled)
+        # The poll connection may be mid-request; closing its socket makes the
+        # blocked getUpdates return immediately.
+        pooled = self._poll_connection
+        if pooled is not None:
+            self._close_quietly(pooled)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            "idle_connections": idle,
+            "poll_connected": self._poll_connection is not None,
+            "connections_opened": self.connections_opened,
+        }
+
+    # -- connection handling ----------------------------------------------
+
+    def _new_connection(self) -> _PooledConnection:
+        if self._scheme == "https":
+            conn: http.client.HTTPConnection = http.client.HTTPSConnection(
+                self._host,
+                self._port,
+                timeout=self.connect_timeout,
+                context=self._ssl_context,
+            )
+        else:
+            conn = http.client.HTTPConnection(self._host, self._port, timeout=self.connect_timeout)
+        return _PooledConnection(conn)
+
+    def _acquire(self) -> _PooledConnection | None:
+        now = time.monotonic()
+        expired: list[_PooledConnection] = []
+        pooled = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if now - candidate.last_used > self.keepalive_idle_seconds:
+                    expired.append(candidate)
+                    continue
+                pooled = candidate
+                break
+        for stale in expired:
+            self._close_quietly(stale)
+        return pooled
+
+    def _release(self, pooled: _PooledConnection) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append(pooled)
+                return
+        self._close_quietly(pooled)
+
+    def _close_quietly(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _connect(self, pooled: _PooledConnection) -> None:
+        if pooled.conn.sock is not None:
+            return
+        try:
+            pooled.conn.connect()
+        except (OSError, ssl.SSLError) as exc:
+            raise TelegramTransportError(f"Could not connect to {self._host}: {exc}") from exc
+        self.connections_opened += 1
+
+    def _send(
+        self,
+        pooled: _PooledConnection | None,
+        path: str,
+        body: bytes,
+        headers: dict[str, str],
+        timeout: float,
+    ) -> tuple[_PooledConnection | None, int, bytes]:
+        """Run one request; returns the connection if it can be kept alive."""
+        reused = pooled is not None and pooled.conn.sock is not None
+        if pooled is None:
+            pooled = self._new_connection()
+        try:
+            self._connect(pooled)
+            return self._exchange(pooled, path, body, headers, timeout)
+        except _STALE_CONNECTION_ERRORS as exc:
+            self._close_quietly(pooled)
+            if not reused:
+                raise TelegramTransportError(f"Telegram connection dropped: {exc}") from exc
+        except TelegramTransportError:
+            self._close_quietly(pooled)
+            raise
+        except (OSError, http.client.HTTPException) as exc:
+            self._close_quietly(pooled)
+            raise TelegramTransportError(f"Telegram request failed: {exc}") from exc
+
+        # The idle connection had been closed by the server; try once more on
+        # a fresh one.
+        pooled = self._new_connection()
+        try:
+            self._connect(pooled)
+            return self._exchange(pooled, path, body, headers, timeout)
+        except TelegramTransportError:
+            self._close_quietly(pooled)
+            raise
+        except (OSError, http.client.HTTPException) as exc:
+            self._close_quietly(pooled)
+            raise TelegramTransportError(f"Telegram request failed: {exc}") from exc
+
+    def _exchange(
+        self,
+        pooled: _PooledConnection,
+        path: str,
+        body: bytes,
+        headers: dict[str, str],
+        timeout: float,
+    ) -> tuple[_PooledConnection | None, int, bytes]:
+        sock = pooled.conn.sock
+        if sock is not None:
+            sock.settimeout(max(1.0, float(timeout)))
+        try:
+            pooled.conn.request("POST", path, body=body, headers={**headers, "Connection": "keep-alive"})
+            response = pooled.conn.getresponse()
+            raw = response.read()
+        except socket.timeout as exc:
+            raise TelegramTransportError(f"Telegram request timed out after {timeout}s") from exc
+        pooled.requests += 1
+        pooled.last_used = time.monotonic()
+        if response.will_close:
+            self._close_quietly(pooled)
+            return None, response.status, raw
+        return pooled, response.status, raw
+
+    # -- response decoding -------------------------------------------------
+
+    def _decode(self, method: str, status: int, raw: bytes) -> dict[str, Any]:
+        try:
+            payload = json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError) as exc:
+            raise TelegramTransportError(f"Telegram returned HTTP {status} without JSON for {method}") from exc
+        if not isinstance(payload, dict):
+            raise TelegramTransportError(f"Telegram returned an unexpected payload for {method}")
+        if not payload.get("ok"):
+            parameters = payload.get("parameters") or {}
+            retry_after = parameters.get("retry_after") if isinstance(parameters, dict) else None
+            raise TelegramApiError(
+                str(payload.get("description") or f"Telegram API call failed: {method}"),
+                error_code=payload.get("error_code") if isinstance(payload.get("error_code"), int) else status,
+                retry_after=float(retry_after) if isinstance(retry_after, (int, float)) else None,
+            )
+        return payload
+
+
+_transport_lock = threading.Lock()
+_shared_transport: TelegramTransport | None = None
+
+
+def get_telegram_transport() -> TelegramTransport:
+    global _shared_transport
+    with _transport_lock:
+        if _shared_transport is None:
+            _shared_transport = TelegramTransport()
+        return _shared_transport
+
+
+def close_telegram_transport() -> None:
+    global _shared_transport
+    with _transport_lock:
+        transport = _shared_transport
+        _shared_transport = None
+    if transport is not None:
+        transport.close()
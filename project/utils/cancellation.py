@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once its CancelToken has been cancelled."""
+
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        try:
+            proc.kill()
+        except Exception:
+            pass
+
+
+class CancelToken:
+    """Cooperative cancellation for a worker thread and its child processes.
+
+    The worker checks the token between stages and sleeps through ``wait``;
+    child processes started with ``run_cancellable`` are registered here so
+    ``cancel`` can kill their whole process group from any thread.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes: set[subprocess.Popen] = set()
+        self._committed = False
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def committed(self) -> bool:
+        return self._committed
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the job; False if it was already cancelled or is past the point of no return."""
+        with self._lock:
+            if self._event.is_set() or self._committed:
+                return False
+            self.reason = reason
+            self._event.set()
+            processes = list(self._processes)
+        for proc in processes:
+            kill_process_group(proc)
+        return True
+
+    def commit(self) -> bool:
+        """Mark the point of no return (lp accepted the job); later cancels are refused.
+
+        Returns False if a cancel got in first.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._committed = True
+            return True
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled(self.reason or "cancelled")
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``; return True early when cancelled."""
+        return self._event.wait(max(0.0, seconds))
+
+    def register(self, proc: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.add(proc)
+            cancelled = self._event.is_set()
+        if cancelled:
+            kill_process_group(proc)
+
+    def unregister(self, proc: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.discard(proc)
+
+
+def run_cancellable(
+    cmd: list[str],
+    *,
+    timeout: float | None,
+    cancel_token: CancelToken | None = None,
+) -> subprocess.CompletedProcess[str]:
+    """subprocess.run() replacement that can be torn down from another thread.
+
+    The child gets its own session, so a timeout or cancel kills the whole
+    process tree (soffice forks helpers) instead of only the direct child.
+    """
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    )
+    if cancel_token is not None:
+        cancel_token.register(proc)
+    try:
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_group(proc)
+            proc.communicate()
+            raise
+    finally:
+        if cancel_token is not None:
+            cancel_token.unregister(proc)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout or "", stderr or "")
@@ -0,0 +1,250 @@
+"""Circuit breakers for external dependencies (Telegram, CUPS, network printers).
+
+A breaker is closed while calls succeed. After BREAKER_FAILURE_THRESHOLD
+consecutive failures it opens and every call fails fast with CircuitOpenError
+instead of waiting for its own timeout. After BREAKER_RESET_SECONDS one trial
+call is let through (half-open): success closes the breaker, failure opens it
+again.
+
+Breakers are shared by name through ``get_breaker``. Every state change is
+kept in the breaker's recent events and passed to registered listeners; the
+default listener writes it to the log.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from project.core import config
+from project.utils.logging_utils import log_info
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_in: float) -> None:
+        super().__init__(f"{name} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+@dataclass(frozen=True)
+class BreakerEvent:
+    name: str
+    at: float
+    from_state: str
+    to_state: str
+    reason: str
+
+
+BreakerListener = Callable[[BreakerEvent], None]
+
+_listeners: list[BreakerListener] = []
+_listeners_lock = threading.Lock()
+
+
+def add_listener(listener: BreakerListener) -> None:
+    with _listeners_lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def remove_listener(listener: BreakerListener) -> None:
+    with _listeners_lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def _emit(event: BreakerEvent) -> None:
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception:
+            pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int | None = None,
+        reset_timeout: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold if failure_threshold is not None else config.BREAKER_FAILURE_THRESHOLD)
+        self.reset_timeout = max(1.0, float(reset_timeout if reset_timeout is not None else config.BREAKER_RESET_SECONDS))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._last_failure = ""
+        self._changed_at = time.time()
+        self.events: deque[BreakerEvent] = deque(maxlen=20)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state_unlocked()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def _current_state_unlocked(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Return True if a call may go out now; claims the half-open trial."""
+        event = None
+        with self._lock:
+            state = self._current_state_unlocked()
+            if state == CLOSED:
+                return True
+            if state == OPEN or self._trial_in_flight:
+                return False
+            if self._state == OPEN:
+                event = self._transition_unlocked(HALF_OPEN, "reset timeout elapsed")
+            self._trial_in_flight = True
+        if event is not None:
+            _emit(event)
+        return True
+
+    def raise_if_open(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def record_success(self) -> None:
+        event = None
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != CLOSED:
+                event = self._transition_unlocked(CLOSED, "call succeeded")
+        if event is not None:
+            _emit(event)
+
+    def record_failure(self, reason: str = "") -> None:
+        event = None
+        with self._lock:
+            self._failures += 1
+            self._last_failure = str(reason)[:300]
+            was_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or was_trial:
+                self._opened_at = self._clock()
+                event = self._transition_unlocked(OPEN, f"trial call failed: {self._last_failure}")
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                event = self._transition_unlocked(OPEN, f"{self._failures} consecutive failures: {self._last_failure}")
+        if event is not None:
+            _emit(event)
+
+    def release(self) -> None:
+        """Give back a claimed half-open trial without a verdict."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def call(self, func: Callable[..., T], *args: Any, failure_types: tuple[type[BaseException], ...] = (Exception,), **kwargs: Any) -> T:
+        """Run ``func`` through the breaker; exceptions of ``failure_types`` count as failures."""
+        self.raise_if_open()
+        try:
+            result = func(*args, **kwargs)
+        except failure_types as exc:
+            self.record_failure(str(exc))
+            raise
+        except BaseException:
+            # Not the dependency's fault (e.g. cancellation).
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def _transition_unlocked(self, to_state: str, reason: str) -> BreakerEvent:
+        event = BreakerEvent(self.name, time.time(), self._state, to_state, reason)
+        self._state = to_state
+        self._changed_at = event.at
+        self.events.append(event)
+        return event
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            state = self._current_state_unlocked()
+            retry_in = max(0.0, self.reset_timeout - (self._clock() - self._opened_at)) if self._state == OPEN else 0.0
+            return {
+                "name": self.name,
+                "state": state,
+                "failures": self._failures,
+                "last_failure": self._last_failure,
+                "changed_at": self._changed_at,
+                "retry_in": retry_in,
+            }
+
+
+_registry: dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _registry.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **kwargs)
+            _registry[name] = breaker
+        return breaker
+
+
+def all_breakers() -> list[CircuitBreaker]:
+    with _registry_lock:
+        return sorted(_registry.values(), key=lambda breaker: breaker.name)
+
+
+def open_breakers(prefix: str = "") -> list[CircuitBreaker]:
+    return [breaker for breaker in all_breakers() if breaker.name.startswith(prefix) and breaker.state != CLOSED]
+
+
+def format_breaker_status() -> str:
+    """One line per breaker that is not closed, for /status."""
+    lines = []
+    for breaker in all_breakers():
+        snap = breaker.snapshot()
+        if snap["state"] == CLOSED:
+            continue
+        line = f"{snap['name']}: {snap['state']}"
+        if snap["retry_in"]:
+            line += f", retry in {snap['retry_in']:.0f}s"
+        if snap["last_failure"]:
+            line += f" ({snap['last_failure'][:120]})"
+        lines.append(line)
+    return "\n".join(lines) if lines else "all closed"
+
+
+def _log_transition(event: BreakerEvent) -> None:
+    log_info(f"[Breaker] Circuit '{event.name}' {event.from_state} -> {event.to_state}: {event.reason}")
+
+
+add_listener(_log_transition)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable
+
+from project.utils.cancellation import CancelToken
+
+
+class Deadline:
+    """Overall time budget for one print job.
+
+    Every pipeline stage asks for ``timeout(cap)`` instead of using its own
+    fixed timeout, so a slow printer check leaves less time for conversion and
+    ``lp`` rather than adding to the total. ``enter(stage)`` attributes the time
+    since the previous call to the previous stage, which is what ends up in
+    job.json for tuning the per-stage defaults.
+
+    An optional CancelToken travels with the deadline, so every stage that
+    already receives the budget can also be interrupted by the UI.
+    """
+
+    def __init__(
+        self,
+        budget_seconds: float,
+        *,
+        cancel_token: CancelToken | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.budget_seconds = max(0.0, float(budget_seconds))
+        self.cancel_token = cancel_token
+        self._clock = clock
+        self._started_at = clock()
+        self._expires_at = self._started_at + self.budget_seconds
+        self._lock = threading.Lock()
+        self._stage: str | None = None
+        self._stage_started_at = self._started_at
+        self._stages: dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return max(0.0, self._clock() - self._started_at)
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: float | None = None) -> float:
+        """Return the time a blocking call may use: the remaining budget, capped."""
+        remaining = self.remaining()
+        if cap is None:
+            return remaining
+        return max(0.0, min(float(cap), remaining))
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep within the remaining budget, waking immediately on cancel."""
+        delay = self.timeout(seconds)
+        if self.cancel_token is not None:
+            self.cancel_token.wait(delay)
+            self.cancel_token.raise_if_cancelled()
+        elif delay > 0:
+            time.sleep(delay)
+
+    def enter(self, stage: str) -> None:
+        now = self._clock()
+        with self._lock:
+            self._close_stage_unlocked(now)
+            self._stage = stage
+            self._stage_started_at = now
+
+    def finish(self) -> None:
+        now = self._clock()
+        with self._lock:
+            self._close_stage_unlocked(now)
+            self._stage = None
+
+    def _close_stage_unlocked(self, now: float) -> None:
+        if self._stage is None:
+            return
+        spent = max(0.0, now - self._stage_started_at)
+        self._stages[self._stage] = self._stages.get(self._stage, 0.0) + spent
+        self._stage_started_at = now
+
+    def summary(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            stages = dict(self._stages)
+            if self._stage is not None:
+                stages[self._stage] = stages.get(self._stage, 0.0) + max(0.0, now - self._stage_started_at)
+        return {
+            "budget_seconds": round(self.budget_seconds, 3),
+            "elapsed_seconds": round(max(0.0, now - self._started_at), 3),
+            "remaining_seconds": round(max(0.0, self._expires_at - now), 3),
+            "exceeded": now >= self._expires_at,
+            "stages": {name: round(seconds, 3) for name, seconds in stages.items()},
+        }
@@ -1,12 +1,40 @@
 # utils/docs/pdf_converter.py
 import os
 import shutil
-import subprocess
+from pathlib import Path
 
 from project.core.config import DOCX_CONVERT_TIMEOUT
+from project.utils import tracing
+from project.utils.cancellation import run_cancellable
 
 
-def convert_docx_to_pdf(docx_path, output_dir=None):
+class ConversionCrashedError(RuntimeError):
+    """The converter process was killed by a signal instead of exiting normally."""
+
+
+def _with_memory_limit(cmd, memory_limit_mb):
+    """Prefix ``cmd`` so soffice starts with RLIMIT_DATA already set.
+
+    The limit is applied by prlimit (util-linux) or the shell's ulimit before
+    exec, so no Python runs between fork and exec in this threaded process,
+    and there is no window in which soffice runs without the limit.
+    """
+    if not memory_limit_mb or memory_limit_mb <= 0 or os.name != "posix":
+        return cmd
+    limit = int(memory_limit_mb) * 1024 * 1024
+    # RLIMIT_DATA covers heap and private mappings on modern kernels without
+    # tripping over the large virtual reservations soffice makes at startup.
+    if shutil.which("prlimit"):
+        return ["prlimit", f"--data={limit}", "--", *cmd]
+    return ["sh", "-c", f'ulimit -d {limit // 1024}; exec "$@"', cmd[0], *cmd]
+
+
+def profile_installation_arg(profile_dir):
+    return "-env:UserInstallation=" + Path(profile_dir).resolve().as_uri()
+
+
+@tracing.traced("convert_docx_to_pdf", "pdf")
+def convert_docx_to_pdf(docx_path, output_dir=None, *, profile_dir=None, timeout=None, memory_limit_mb=0, cancel_token=None):
     if not os.path.exists(docx_path):
         raise FileNotFoundError(f"{docx_path} not found")
 
@@ -19,8 +47,13 @@ def convert_docx_to_pdf(docx_path, output_dir=None):
     if not lo_bin:
         raise RuntimeError("LibreOffice is not installed (missing 'libreoffice'/'soffice')")
 
-    cmd = [
-        lo_bin,
+    cmd = [lo_bin]
+    if profile_dir:
+        # LibreOffice refuses to run two instances on one user profile, so
+        # every concurrent converter needs its own UserInstallation.
+        os.makedirs(profile_dir, exist_ok=True)
+        cmd.append(profile_installation_arg(profile_dir))
+    cmd += [
         "--headless",
         "--nologo",
         "--nofirststartwizard",
@@ -29,14 +62,17 @@ def convert_docx_to_pdf(docx_path, output_dir=None):
         docx_path,
     ]
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        timeout=DOCX_CONVERT_TIMEOUT,
+    # soffice forks oosplash/soffice.bin; run_cancellable kills the whole
+    # process group on timeout or cancel so no busy child is left behind.
+    result = run_cancellable(
+        _with_memory_limit(cmd, memory_limit_mb),
+        timeout=DOCX_CONVERT_TIMEOUT if timeout is None else timeout,
+        cancel_token=cancel_token,
     )
+    if result.returncode < 0:
+        raise ConversionCrashedError(f"Conversion process crashed (signal {-result.returncode}): {result.stderr}")
     if result.returncode != 0:
         raise RuntimeError(f"Conversion failed: {result.stderr}")
 
     pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
-    return pdf_path
\ No newline at end of file
+    return pdf_path
@@ -0,0 +1,377 @@
+# utils/docs/render_pool.py
+"""Pool of isolated LibreOffice workers for DOCX -> PDF conversion.
+
+LibreOffice will not run two instances against one user profile, so a single
+shared profile serialises every conversion. Each worker here owns its own
+profile directory (tmpfs by default) and converts one document at a time.
+Requests wait in a bounded queue; a crashed or hung converter gets a fresh
+profile before the worker takes the next request.
+
+Benchmark on the device with:
+
+    python -m project.utils.docs.render_pool --benchmark --jobs 12 --workers 1,2,4
+"""
+
+from __future__ import annotations
+
+import argparse
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from project.core import config
+from project.utils import tracing
+from project.utils.cancellation import CancelToken, JobCancelled
+from project.utils.docs.pdf_converter import ConversionCrashedError, convert_docx_to_pdf
+from project.utils.logging_utils import log_error, log_info
+
+
+class RenderPoolBusy(RuntimeError):
+    """Raised when the render queue stays full for longer than the caller allows."""
+
+
+@dataclass
+class _RenderRequest:
+    docx_path: str
+    output_dir: str | None
+    timeout: float | None
+    future: Future
+    cancel_token: CancelToken | None = None
+
+
+_STOP = object()
+_CANCEL_POLL_SECONDS = 0.2
+
+
+def _resolve_profile_root(preferred: Path) -> Path:
+    for candidate in (preferred, config.VAR_DIR / "lo-profiles"):
+        try:
+            candidate.mkdir(parents=True, exist_ok=True)
+            return candidate
+        except Exception:
+            continue
+    return Path(tempfile.mkdtemp(prefix="lo-profiles-"))
+
+
+class RenderWorker:
+    def __init__(self, pool: RenderPool, index: int, profile_dir: Path) -> None:
+        self.index = index
+        self.profile_dir = profile_dir
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.busy = False
+        self._pool = pool
+        self._thread = threading.Thread(target=self._run, name=f"render-worker-{index}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def join(self, timeout: float | None = None) -> None:
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            request = self._pool._queue.get()
+            try:
+                if request is _STOP:
+                    return
+                if not request.future.set_running_or_notify_cancel():
+                    continue
+                self.busy = True
+                try:
+                    request.future.set_result(self._convert(request))
+                except JobCancelled as exc:
+                    request.future.set_exception(exc)
+                except BaseException as exc:
+                    self.failed += 1
+                    request.future.set_exception(exc)
+                finally:
+                    self.busy = False
+            finally:
+                self._pool._queue.task_done()
+
+    def _convert(self, request: _RenderRequest) -> str:
+        attempts = 1 + max(0, config.RENDER_WORKER_MAX_RESTARTS)
+        for attempt in range(1, attempts + 1):
+            try:
+                pdf_path = convert_docx_to_pdf(
+                    request.docx_path,
+                    request.output_dir,
+                    profile_dir=str(self.profile_dir),
+                    timeout=request.timeout,
+                    memory_limit_mb=self._pool.memory_limit_mb,
+                    cancel_token=request.cancel_token,
+                )
+                self.completed += 1
+                return pdf_path
+            except JobCancelled:
+                # Killed on purpose: the profile lock is stale, but this is
+                # not a fault worth an alert.
+                self.reset_profile()
+                raise
+            except subprocess.TimeoutExpired as exc:
+                # A killed soffice leaves its profile lock behind; reset it, but
+                # do not retry because the caller's time is already spent.
+                self.restart(f"timeout after {exc.timeout}s")
+                raise
+            except ConversionCrashedError as exc:
+                self.restart(str(exc))
+                if attempt >= attempts:
+                    raise
+        raise RuntimeError("Conversion failed: render worker exhausted its restarts.")
+
+    def restart(self, reason: str) -> None:
+        self.restarts += 1
+        log_error(f"[RENDER] Worker {self.index} restarting with a fresh profile: {reason[:300]}")
+        self.reset_profile()
+
+    def reset_profile(self) -> None:
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class RenderPool:
+    def __init__(
+        self,
+        workers: int | None = None,
+        *,
+        queue_size: int | None = None,
+        profile_root: Path | None = None,
+        memory_limit_mb: int | None = None,
+    ) -> None:
+        self.worker_count = max(1, workers if workers is not None else config.RENDER_POOL_WORKERS)
+        self.queue_size = max(1, queue_size if queue_size is not None else config.RENDER_POOL_QUEUE_SIZE)
+        self.memory_limit_mb = max(0, memory_limit_mb if memory_limit_mb is not None else config.RENDER_WORKER_MEMORY_MB)
+        self.profile_root = _resolve_profile_root(profile_root or config.RENDER_PROFILE_DIR)
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._workers: list[RenderWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> None:
+        with self._lock:
+            if self._workers or self._closed:
+                return
+            for index in range(self.worker_count):
+                worker = RenderWorker(self, index, self.profile_root / f"worker-{index}")
+                worker.start()
+                self._workers.append(worker)
+        log_info(f"[RENDER] Pool started with {self.worker_count} worker(s), profiles in {self.profile_root}")
+
+    def submit(
+        self,
+        docx_path: str,
+        output_dir: str | None = None,
+        *,
+        timeout: float | None = None,
+        block_timeout: float | None = None,
+        cancel_token: CancelToken | None = None,
+    ) -> Future:
+        """Queue a conversion and return a Future resolving to the PDF path.
+
+        block_timeout=None waits for queue space (batch producers); a number
+        bounds that wait and raises RenderPoolBusy when the queue stays full.
+        """
+        if self._closed:
+            raise RenderPoolBusy("Render pool is shut down.")
+        self.start()
+        future: Future = Future()
+        request = _RenderRequest(
+            str(docx_path),
+            None if output_dir is None else str(output_dir),
+            timeout,
+            future,
+            cancel_token,
+        )
+        try:
+            self._queue.put(request, timeout=block_timeout)
+        except queue.Full:
+            raise RenderPoolBusy(f"Render queue is full ({self.queue_size} waiting conversions).") from None
+        return future
+
+    def convert(
+        self,
+        docx_path: str,
+        output_dir: str | None = None,
+        *,
+        timeout: float | None = None,
+        cancel_token: CancelToken | None = None,
+    ) -> str:
+        convert_timeout = config.DOCX_CONVERT_TIMEOUT if timeout is None else timeout
+        future = self.submit(
+            docx_path,
+            output_dir,
+            timeout=convert_timeout,
+            block_timeout=convert_timeout,
+            cancel_token=cancel_token,
+        )
+        if cancel_token is None:
+            return future.result()
+        while True:
+            try:
+                return future.result(timeout=_CANCEL_POLL_SECONDS)
+            except FutureTimeoutError:
+                if cancel_token.cancelled:
+                    # A queued request is dropped here; a running one is torn
+                    # down by the token killing its soffice process group.
+                    future.cancel()
+                    cancel_token.raise_if_cancelled()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.worker_count,
+            "queued": self._queue.qsize(),
+            "busy": sum(1 for worker in self._workers if worker.busy),
+            "completed": sum(worker.completed for worker in self._workers),
+            "failed": sum(worker.failed for worker in self._workers),
+            "restarts": sum(worker.restarts for worker in self._workers),
+            "profile_root": str(self.profile_root),
+        }
+
+    def shutdown(self, *, wait: bool = True, timeout: float = 5.0) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _ in workers:
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                break
+        if wait:
+            for worker in workers:
+                worker.join(timeout=timeout)
+
+
+_pool_lock = threading.Lock()
+_shared_pool: RenderPool | None = None
+
+
+def get_render_pool() -> RenderPool:
+    global _shared_pool
+    with _pool_lock:
+        if _shared_pool is None:
+            _shared_pool = RenderPool()
+        return _shared_pool
+
+
+@tracing.traced("render_docx_to_pdf", "pdf")
+def render_docx_to_pdf(
+    docx_path: str,
+    output_dir: str | None = None,
+    *,
+    timeout: float | None = None,
+    cancel_token: CancelToken | None = None,
+) -> str:
+    return get_render_pool().convert(docx_path, output_dir, timeout=timeout, cancel_token=cancel_token)
+
+
+def shutdown_render_pool() -> None:
+    global _shared_pool
+    with _pool_lock:
+        pool = _shared_pool
+        _shared_pool = None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _benchmark_placeholders(index: int) -> dict[str, str]:
+    data = {key: value or f"ТЕСТ {index}" for key, value in config.DEBUG_DATA.items()}
+    placeholders = {f"{{{{{key}}}}}": value.upper() for key, value in data.items()}
+    placeholders.update(
+        {
+            "{{DANASNJI_DATUM}}": config.danasnji_datum(),
+            "{{IME_PREZIME}}": f"ТЕСТ УЧЕНИК {index}",
+            "{{IME_UCENIKA}}": "ТЕСТ",
+            "{{PREZIME}}": f"УЧЕНИК {index}",
+            "{{DATUM_RODJENJA}}": f"{data['DAN']}.{data['MJESEC']}.{data['GODINA']}",
+        }
+    )
+    return placeholders
+
+
+def benchmark(worker_counts: list[int], jobs: int) -> list[dict[str, Any]]:
+    from project.utils.docs.docx_replace_placeholders import replace_dynamic_text
+
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="render-bench-") as tmp:
+        tmp_root = Path(tmp)
+        docs: list[Path] = []
+        for index in range(jobs):
+            docx_path = tmp_root / "docs" / f"cert-{index:04d}.docx"
+            docx_path.parent.mkdir(parents=True, exist_ok=True)
+            replace_dynamic_text(str(config.TEMPLATE_FILE), str(docx_path), _benchmark_placeholders(index))
+            docs.append(docx_path)
+
+        profile_base = _resolve_profile_root(config.RENDER_PROFILE_DIR) / "benchmark"
+        for workers in worker_counts:
+            pool = RenderPool(workers, queue_size=max(workers, jobs), profile_root=profile_base / f"w{workers}")
+            out_dir = tmp_root / f"out-w{workers}"
+            try:
+                # Warm every profile first so the numbers reflect steady state,
+                # not LibreOffice's one-off profile creation.
+                warmups = [pool.submit(str(docs[0]), str(out_dir / f"warmup-{i}")) for i in range(workers)]
+                for future in warmups:
+                    future.result()
+
+                started = time.monotonic()
+                futures = [pool.submit(str(path), str(out_dir)) for path in docs]
+                failed = 0
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception:
+                        failed += 1
+                elapsed = max(1e-6, time.monotonic() - started)
+                stats = pool.stats()
+            finally:
+                pool.shutdown()
+            results.append(
+                {
+                    "workers": workers,
+                    "jobs": jobs,
+                    "failed": failed,
+                    "seconds": elapsed,
+                    "per_minute": (jobs - failed) * 60.0 / elapsed,
+                    "restarts": stats["restarts"],
+                }
+            )
+        shutil.rmtree(profile_base, ignore_errors=True)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="LibreOffice render pool tools.")
+    parser.add_argument("--benchmark", action="store_true", help="measure certificates per minute")
+    parser.add_argument("--jobs", type=int, default=12, help="certificates per benchmark round")
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    args = parser.parse_args(argv)
+    if not args.benchmark:
+        parser.print_help()
+        return 2
+
+    try:
+        worker_counts = [max(1, int(part)) for part in args.workers.split(",") if part.strip()]
+    except ValueError:
+        sys.stderr.write(f"[ERROR] Invalid --workers value: {args.workers}\n")
+        return 2
+
+    for row in benchmark(worker_counts, max(1, args.jobs)):
+        print(
+            f"workers={row['workers']}: {row['per_minute']:.1f} certificates/min "
+            f"({row['jobs']} jobs in {row['seconds']:.1f}s, failed={row['failed']}, restarts={row['restarts']})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+"""Group error messages that differ only in variable parts (ids, paths, numbers).
+
+``fingerprint`` replaces UUIDs, paths, hex values and numbers with
+placeholders and hashes the result, so "lp failed for job 1a2b…, attempt 2"
+and "…job 9f8e…, attempt 3" get the same fingerprint. ``ErrorDeduplicator``
+keeps the most recently seen fingerprints (LRU, bounded) with counts and
+first/last-seen times: the first occurrence of an error is sent, repeats are
+suppressed while the error keeps recurring within ``window_seconds``, and
+``digest`` summarises what was suppressed since the previous digest.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+_NORMALIZERS = [
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<uuid>"),
+    (re.compile(r"(?:~|\.{1,2})?(?:/[\w.@+\-]+)+/?"), "<path>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<hex>"),
+    # Hashes and ids: hex words with at least one digit and one letter.
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{6,}\b"), "<hex>"),
+    (re.compile(r"\d+(?:[.,:]\d+)*"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_error(text: str) -> str:
+    value = str(text or "")
+    for pattern, replacement in _NORMALIZERS:
+        value = pattern.sub(replacement, value)
+    return value.strip()
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.blake2b(normalize_error(text).encode("utf-8", errors="replace"), digest_size=8).hexdigest()
+
+
+@dataclass
+class ErrorEntry:
+    fingerprint: str
+    sample: str
+    count: int
+    first_seen: float
+    last_seen: float
+    last_sent: float
+    suppressed: int = 0
+
+
+class ErrorDeduplicator:
+    def __init__(self, *, max_entries: int = 256, window_seconds: float = 60.0) -> None:
+        self.max_entries = max(8, max_entries)
+        self.window_seconds = max(0.0, window_seconds)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, ErrorEntry]" = OrderedDict()
+        self._last_digest_at = time.time()
+
+    def should_send(self, text: str, *, now: float | None = None) -> bool:
+        """Record one occurrence; True if it should be sent now."""
+        current = time.time() if now is None else now
+        key = fingerprint(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = ErrorEntry(key, text, 1, current, current, current)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                return True
+            self._entries.move_to_end(key)
+            entry.count += 1
+            quiet_for = current - entry.last_seen
+            entry.last_seen = current
+            if quiet_for >= self.window_seconds:
+                # The error had stopped for a while; treat it as news again.
+                entry.sample = text
+                entry.last_sent = current
+                return True
+            entry.suppressed += 1
+            return False
+
+    def digest(self, *, now: float | None = None, max_items: int = 15) -> str | None:
+        """Summary of suppressed repeats since the previous digest (None if nothing was suppressed)."""
+        current = time.time() if now is None else now
+        with self._lock:
+            suppressed = [entry for entry in self._entries.values() if entry.suppressed]
+            since = self._last_digest_at
+            self._last_digest_at = current
+            items = [(entry.suppressed, entry.count, entry.sample) for entry in suppressed]
+            for entry in suppressed:
+                entry.suppressed = 0
+        if not items:
+            return None
+        items.sort(key=lambda item: item[0], reverse=True)
+        minutes = max(1, int(round((current - since) / 60)))
+        lines = [f"Repeated errors in the last {minutes} min (not sent again):"]
+        for repeats, total, sample in items[:max_items]:
+            first_line = sample.strip().splitlines()[0] if sample.strip() else ""
+            if len(first_line) > 160:
+                first_line = first_line[:157] + "..."
+            lines.append(f"{repeats}x (total {total}) {first_line}")
+        if len(items) > max_items:
+            lines.append(f"... and {len(items) - max_items} more")
+        return "\n".join(lines)
+
+    def snapshot(self) -> list[ErrorEntry]:
+        with self._lock:
+            return list(self._entries.values())
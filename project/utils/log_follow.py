@@ -0,0 +1,178 @@
+"""Follow log files live (``tail -F``) and hand new lines over in batches.
+
+Files are polled: every POLL_SECONDS the open handle is read to EOF, which
+costs one read() per file when nothing changed. Rotation is detected when the
+path now points to a different inode or the file got shorter than what was
+already read; the rest of the old handle is drained first, then the new file
+is followed from its start. Lines are collected and passed to ``on_batch``
+at most once per ``batch_seconds``; a batch that would be too long for one
+Telegram message keeps its newest lines and says how many were skipped.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from project.utils.log_tail import render_line
+
+
+POLL_SECONDS = 0.5
+
+
+class _FollowedFile:
+    def __init__(self, path: Path, label: str) -> None:
+        self.path = path
+        self.label = label
+        self.handle = None
+        self.inode: int | None = None
+        self.partial = b""
+        self._open(at_end=True)
+
+    def _open(self, *, at_end: bool) -> None:
+        try:
+            handle = open(self.path, "rb")
+        except OSError:
+            self.handle = None
+            self.inode = None
+            return
+        if at_end:
+            handle.seek(0, os.SEEK_END)
+        self.handle = handle
+        self.inode = os.fstat(handle.fileno()).st_ino
+        self.partial = b""
+
+    def close(self) -> None:
+        if self.handle is not None:
+            try:
+                self.handle.close()
+            except OSError:
+                pass
+            self.handle = None
+
+    def read_lines(self) -> list[str]:
+        lines: list[str] = []
+        if self.handle is None:
+            # The file did not exist yet (e.g. no keyboard event logged so far).
+            self._open(at_end=False)
+            if self.handle is None:
+                return lines
+        lines.extend(self._drain())
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return lines
+        if stat.st_ino != self.inode or stat.st_size < self.handle.tell():
+            # Rotated or truncated: what was left in the old file is read above.
+            if self.partial:
+                lines.append(self._decode(self.partial))
+            self.close()
+            self._open(at_end=False)
+            if self.handle is not None:
+                lines.extend(self._drain())
+        return lines
+
+    def _drain(self) -> list[str]:
+        try:
+            data = self.handle.read()
+        except OSError:
+            return []
+        if not data:
+            return []
+        data = self.partial + data
+        pieces = data.split(b"\n")
+        self.partial = pieces.pop()
+        return [self._decode(piece) for piece in pieces]
+
+    def _decode(self, raw: bytes) -> str:
+        text = render_line(raw.decode("utf-8", errors="replace").rstrip("\r"))
+        return f"[{self.label}] {text}" if self.label else text
+
+
+class LogFollower:
+    def __init__(
+        self,
+        files: dict[str, Path],
+        *,
+        on_batch: Callable[[str], None],
+        duration_seconds: float,
+        batch_seconds: float = 5.0,
+        max_batch_chars: int = 3300,
+    ) -> None:
+        """``files`` maps a label ("" for none) to the path to follow."""
+        self.on_batch = on_batch
+        self.batch_seconds = max(1.0, batch_seconds)
+        self.max_batch_chars = max(500, max_batch_chars)
+        self.started_at = time.time()
+        self.expires_at = self.started_at + max(1.0, duration_seconds)
+        self.lines_sent = 0
+        self.lines_skipped = 0
+        self._files = [_FollowedFile(path, label) for label, path in files.items()]
+        self._stop_event = threading.Event()
+        self._stop_reason = ""
+        self._thread: threading.Thread | None = None
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-follow", daemon=True)
+        self._thread.start()
+
+    def stop(self, reason: str = "stopped") -> None:
+        if not self._stop_event.is_set():
+            self._stop_reason = reason
+            self._stop_event.set()
+
+    def extend(self, duration_seconds: float) -> None:
+        self.expires_at = time.time() + max(1.0, duration_seconds)
+
+    def _run(self) -> None:
+        pending: list[str] = []
+        next_batch_at = time.monotonic() + self.batch_seconds
+        try:
+            while not self._stop_event.is_set():
+                for followed in self._files:
+                    pending.extend(followed.read_lines())
+                if time.time() >= self.expires_at:
+                    self._stop_reason = self._stop_reason or "time is up"
+                    break
+                if pending and time.monotonic() >= next_batch_at:
+                    self._send(pending)
+                    pending = []
+                    next_batch_at = time.monotonic() + self.batch_seconds
+                self._stop_event.wait(POLL_SECONDS)
+            for followed in self._files:
+                pending.extend(followed.read_lines())
+            if pending:
+                self._send(pending)
+            self.on_batch(f"Log follow ended ({self._stop_reason or 'stopped'}). Lines sent: {self.lines_sent}, skipped: {self.lines_skipped}.")
+        finally:
+            for followed in self._files:
+                followed.close()
+
+    def _send(self, lines: list[str]) -> None:
+        kept: list[str] = []
+        size = 0
+        for line in reversed(lines):
+            if size + len(line) + 1 > self.max_batch_chars:
+                break
+            kept.append(line)
+            size += len(line) + 1
+        if not kept and lines:
+            kept.append(lines[-1][-self.max_batch_chars :])
+        kept.reverse()
+        skipped = len(lines) - len(kept)
+        self.lines_sent += len(kept)
+        self.lines_skipped += skipped
+        text = "\n".join(kept)
+        if skipped:
+            text = f"... {skipped} older line(s) skipped ...\n{text}"
+        try:
+            self.on_batch(text)
+        except Exception:
+            pass
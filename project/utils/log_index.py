@@ -0,0 +1,337 @@
+"""Time-range index over the log files for /logsearch.
+
+Every launch writes a new ``error_<date>.log`` and RotatingFileHandler renames
+full files to ``.1``, ``.2``, …, so the history is spread over many files. For
+each file the index keeps the first and last timestamp and a checkpoint
+(timestamp, byte offset) roughly every CHECKPOINT_BYTES. A search only opens
+files whose range overlaps the requested one and, inside them, scans (through
+mmap) only the region between the surrounding checkpoints.
+
+Entries are keyed by inode, so a rotated file keeps its entry under the new
+name; a file that grew is indexed incrementally from where the last pass
+stopped. Timestamp parsing is pluggable: ``LogIndex`` tries each parser in
+``parsers`` on a line and uses the first that returns a value.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+
+from project.core import config
+
+
+CHECKPOINT_BYTES = 64 * 1024
+INDEX_VERSION = 2
+
+TimestampParser = Callable[[bytes], "float | None"]
+
+_TEXT_TS_RE = re.compile(rb"^(\d{2})\.(\d{2})\.(\d{4}) (\d{2}):(\d{2}):(\d{2}) ")
+
+
+def parse_text_timestamp(line: bytes) -> float | None:
+    """``dd.mm.YYYY HH:MM:SS`` at the start of the line (logging_utils format)."""
+    match = _TEXT_TS_RE.match(line)
+    if not match:
+        return None
+    day, month, year, hour, minute, second = (int(part) for part in match.groups())
+    try:
+        return time.mktime((year, month, day, hour, minute, second, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+
+
+_JSON_TS_RE = re.compile(rb'^\{"ts": ([0-9]+(?:\.[0-9]+)?)')
+
+
+def parse_json_timestamp(line: bytes) -> float | None:
+    """``{"ts": <epoch>, ...}`` JSON lines (logging_utils.JsonLineFormatter)."""
+    match = _JSON_TS_RE.match(line)
+    return float(match.group(1)) if match else None
+
+
+DEFAULT_PARSERS: list[TimestampParser] = [parse_json_timestamp, parse_text_timestamp]
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    file: str
+    timestamp: float | None
+    line: str
+
+
+class LogIndex:
+    def __init__(
+        self,
+        directory: Path | None = None,
+        *,
+        index_file: Path | None = None,
+        pattern: str = "*.log*",
+        parsers: list[TimestampParser] | None = None,
+        checkpoint_bytes: int = CHECKPOINT_BYTES,
+    ) -> None:
+        self.directory = directory or config.ERROR_LOG_DIR
+        self.index_file = index_file or (config.VAR_DIR / "log_index.json")
+        self.pattern = pattern
+        self.parsers = list(parsers) if parsers is not None else DEFAULT_PARSERS
+        self.checkpoint_bytes = max(4096, checkpoint_bytes)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = self._load()
+
+    # -- index maintenance -------------------------------------------------
+
+    def parse_timestamp(self, line: bytes) -> float | None:
+        for parser in self.parsers:
+            try:
+                value = parser(line)
+            except Exception:
+                value = None
+            if value is not None:
+                return value
+        return None
+
+    def refresh(self) -> dict[str, dict]:
+        """Bring the index up to date with the files on disk; returns entries by file name."""
+        with self._lock:
+            by_inode = {entry["inode"]: entry for entry in self._entries.values()}
+            fresh: dict[str, dict] = {}
+            changed = False
+            for path in self.directory.glob(self.pattern):
+                if not path.is_file() or path.is_symlink():
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                key = f"{stat.st_dev}:{stat.st_ino}"
+                entry = by_inode.get(key)
+                if entry is not None and entry["size"] == stat.st_size:
+                    if entry["name"] != path.name:
+                        entry["name"] = path.name
+                        changed = True
+                elif entry is not None and entry["size"] < stat.st_size:
+                    entry["name"] = path.name
+                    self._extend_entry(path, entry, stat.st_size)
+                    changed = True
+                else:
+                    entry = self._new_entry(path, key, stat.st_size)
+                    changed = True
+                fresh[path.name] = entry
+            if changed or len(fresh) != len(self._entries):
+                self._entries = fresh
+                self._save()
+            return dict(self._entries)
+
+    def _new_entry(self, path: Path, key: str, size: int) -> dict:
+        entry = {"inode": key, "name": path.name, "size": 0, "first_ts": None, "last_ts": None, "checkpoints": []}
+        self._extend_entry(path, entry, size)
+        return entry
+
+    def _extend_entry(self, path: Path, entry: dict, size: int) -> None:
+        """Add checkpoints for bytes [entry['size'], size) and update the time range."""
+        start = entry["size"]
+        try:
+            with open(path, "rb") as handle:
+                if size == 0:
+                    return
+                with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    size = min(size, len(mm))
+                    checkpoints = entry["checkpoints"]
+                    position = start
+                    if position > 0 and mm[position - 1 : position] != b"\n":
+                        # The previous pass stopped inside a line that was still being written.
+                        position = mm.find(b"\n", position, size) + 1 or size
+                    while position < size:
+                        found = self._first_timestamp(mm, position, size)
+                        if found is None:
+                            break
+                        ts, line_offset = found
+                        if not checkpoints or line_offset - checkpoints[-1][1] >= self.checkpoint_bytes:
+                            checkpoints.append([ts, line_offset])
+                        if entry["first_ts"] is None:
+                            entry["first_ts"] = ts
+                        # Jump ahead one checkpoint interval to the next line start.
+                        newline = mm.find(b"\n", line_offset + self.checkpoint_bytes, size)
+                        if newline < 0:
+                            break
+                        position = newline + 1
+                    last = self._last_timestamp(mm, start, size)
+                    if last is not None:
+                        entry["last_ts"] = last
+        except (OSError, ValueError):
+            pass
+        entry["size"] = size
+
+    def _first_timestamp(self, mm: mmap.mmap, offset: int, end: int, max_lines: int = 200) -> tuple[float, int] | None:
+        for _ in range(max_lines):
+            if offset >= end:
+                return None
+            line_end = mm.find(b"\n", offset, end)
+            if line_end < 0:
+                line_end = end
+            ts = self.parse_timestamp(mm[offset : min(line_end, offset + 512)])
+            if ts is not None:
+                return ts, offset
+            offset = line_end + 1
+        return None
+
+    def _last_timestamp(self, mm: mmap.mmap, start: int, end: int) -> float | None:
+        position = end
+        for _ in range(1000):
+            if position <= start:
+                break
+            line_start = mm.rfind(b"\n", start, max(start, position - 1)) + 1
+            if line_start <= 0:
+                line_start = start
+            ts = self.parse_timestamp(mm[line_start : min(position, line_start + 512)])
+            if ts is not None:
+                return ts
+            if line_start == start:
+                return None
+            position = line_start - 1
+        return None
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            data = json.loads(self.index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return {}
+        files = data.get("files")
+        return files if isinstance(files, dict) else {}
+
+    def _save(self) -> None:
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = Path(str(self.index_file) + ".tmp")
+            tmp_path.write_text(json.dumps({"version": INDEX_VERSION, "files": self._entries}), encoding="utf-8")
+            tmp_path.replace(self.index_file)
+        except OSError:
+            pass
+
+    # -- search ------------------------------------------------------------
+
+    def search(
+        self,
+        pattern: str,
+        *,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int = 200,
+    ) -> Iterator[SearchHit]:
+        """Yield matching lines, oldest file first, within [since, until]."""
+        try:
+            regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE)
+        except re.error:
+            regex = re.compile(re.escape(pattern.encode("utf-8")), re.IGNORECASE)
+        entries = self.refresh()
+        candidates = [
+            entry
+            for entry in entries.values()
+            if not (since is not None and entry["last_ts"] is not None and entry["last_ts"] < since)
+            and not (until is not None and entry["first_ts"] is not None and entry["first_ts"] > until)
+        ]
+        candidates.sort(key=lambda entry: entry["first_ts"] or 0.0)
+        found = 0
+        for entry in candidates:
+            for hit in self._search_file(entry, regex, since, until):
+                yield hit
+                found += 1
+                if found >= limit:
+                    return
+
+    def _search_file(self, entry: dict, regex: re.Pattern[bytes], since: float | None, until: float | None) -> Iterator[SearchHit]:
+        path = self.directory / entry["name"]
+        start, end = 0, entry["size"]
+        for ts, offset in entry["checkpoints"]:
+            if since is not None and ts <= since:
+                start = offset
+            if until is not None and ts > until:
+                end = offset
+                break
+        try:
+            with open(path, "rb") as handle:
+                if os.fstat(handle.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    end = min(end, len(mm))
+                    current_ts: float | None = None
+                    position = start
+                    while position < end:
+                        line_end = mm.find(b"\n", position, end)
+                        if line_end < 0:
+                            line_end = end
+                        line = mm[position:line_end]
+                        ts = self.parse_timestamp(line[:512])
+                        if ts is not None:
+                            current_ts = ts
+                        position = line_end + 1
+                        # Continuation lines (tracebacks) inherit the record's time.
+                        if since is not None and (current_ts is None or current_ts < since):
+                            continue
+                        if until is not None and current_ts is not None and current_ts > until:
+                            break
+                        if regex.search(line):
+                            yield SearchHit(entry["name"], current_ts, line.decode("utf-8", errors="replace").rstrip("\r"))
+        except (OSError, ValueError):
+            return
+
+
+_RELATIVE_RE = re.compile(r"^(\d+)([smhdw])$")
+_RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_ABSOLUTE_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d",
+    "%d.%m.%Y",
+    "%d.%m.%Y-%H:%M",
+)
+
+
+def parse_time_arg(text: str, *, now: float | None = None) -> float | None:
+    """Parse a /logsearch time: ``30m``/``2h``/``1d`` ago, ``HH:MM`` today, or a date.
+
+    Raises ValueError for anything else.
+    """
+    value = (text or "").strip().lower()
+    if not value:
+        return None
+    current = time.time() if now is None else now
+    if value == "now":
+        return current
+    match = _RELATIVE_RE.match(value)
+    if match:
+        return current - int(match.group(1)) * _RELATIVE_UNITS[match.group(2)]
+    if re.match(r"^\d{1,2}:\d{2}$", value):
+        hour, minute = (int(part) for part in value.split(":"))
+        day = datetime.fromtimestamp(current).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if day.timestamp() > current:
+            day -= timedelta(days=1)
+        return day.timestamp()
+    for fmt in _ABSOLUTE_FORMATS:
+        try:
+            return datetime.strptime(value.upper(), fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time: {text}")
+
+
+_index_lock = threading.Lock()
+_index: LogIndex | None = None
+
+
+def get_log_index() -> LogIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LogIndex()
+        return _index
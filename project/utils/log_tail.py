@@ -0,0 +1,160 @@
+"""Read the last lines of the app logs without loading whole files.
+
+Files are read backward from the end in fixed-size blocks, so memory use
+depends on the number of requested lines, not on the file size. When the
+newest file does not have enough lines, reading continues into the older ones:
+rotated backups (``.1``, ``.2``, …) and logs of earlier app starts.
+
+Multi-line records (tracebacks) are kept together: a level filter applies to
+the record header and the continuation lines follow it. Current logs are JSON
+lines (one record per line, see logging_utils); older runs wrote plain text,
+and both are understood.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from project.core import config
+
+
+BLOCK_SIZE = 8192
+MAX_LINE_BYTES = 64 * 1024
+
+LEVELS = {
+    "debug": 10,
+    "info": 20,
+    "warning": 30,
+    "error": 40,
+    "critical": 50,
+}
+
+# "%d.%m.%Y %H:%M:%S LEVEL: message", as written by logging_utils and the keyboard logger.
+_RECORD_RE = re.compile(r"^\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2} (DEBUG|INFO|WARNING|ERROR|CRITICAL):")
+# JSON lines from logging_utils.JsonLineFormatter (key order is fixed).
+_JSON_RECORD_RE = re.compile(r'^\{"ts": [0-9.]+, "time": "[^"]*", "level": "(DEBUG|INFO|WARNING|ERROR|CRITICAL)"')
+
+LOG_FAMILIES = {
+    "error": "error_*.log*",
+    "keyboard": "keyboard.log*",
+}
+
+
+def parse_level(line: str) -> int | None:
+    """Return the numeric level of a record header line, or None for continuation lines."""
+    match = _RECORD_RE.match(line) or _JSON_RECORD_RE.match(line)
+    return LEVELS[match.group(1).lower()] if match else None
+
+
+def render_line(line: str) -> str:
+    """Show a JSON record the way the text logs look; other lines are returned unchanged."""
+    if not line.startswith('{"ts"'):
+        return line
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return line
+    text = f"{data.get('time', '')} {data.get('level', '')}: {data.get('message', '')}"
+    if data.get("exc"):
+        text += "\n" + str(data["exc"])
+    return text
+
+
+def iter_lines_backward(path: Path, *, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """Yield the lines of ``path`` from last to first, reading fixed-size blocks."""
+    with open(path, "rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        position = handle.tell()
+        # Bytes of the line currently being assembled (its start is in an earlier block).
+        fragment = b""
+        truncated = False
+        first_block = True
+        has_data = position > 0
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            handle.seek(position)
+            block = handle.read(size)
+            if first_block and block.endswith(b"\n"):
+                block = block[:-1]
+            first_block = False
+            pieces = block.split(b"\n")
+            # Keep the head of over-long lines: it holds the timestamp and level.
+            fragment = pieces[-1] + fragment
+            if len(fragment) > MAX_LINE_BYTES:
+                fragment = fragment[:MAX_LINE_BYTES]
+                truncated = True
+            for piece in reversed(pieces[:-1]):
+                yield _decode(fragment, truncated)
+                fragment, truncated = piece, False
+        if has_data:
+            yield _decode(fragment, truncated)
+
+
+def _decode(raw: bytes, truncated: bool) -> str:
+    text = raw.decode("utf-8", errors="replace").rstrip("\r")
+    return text + " …" if truncated else text
+
+
+def log_files(family: str = "error", directory: Path | None = None) -> list[Path]:
+    """Files of one log family, newest first (current file, then rotations and older runs)."""
+    pattern = LOG_FAMILIES.get(family)
+    if pattern is None:
+        raise ValueError(f"Unknown log family: {family}")
+    base = directory or config.ERROR_LOG_DIR
+    files = []
+    for path in base.glob(pattern):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    return [path for _, path in sorted(files, key=lambda item: item[0], reverse=True)]
+
+
+def tail_records(
+    paths: Iterable[Path],
+    *,
+    lines: int,
+    min_level: int | None = None,
+) -> tuple[list[str], list[Path]]:
+    """Return up to ``lines`` newest lines (oldest first) and the files they came from."""
+    wanted = max(1, lines)
+    kept: deque[str] = deque()
+    used: list[Path] = []
+    for path in paths:
+        if len(kept) >= wanted:
+            break
+        # Continuation lines seen since the last header, newest first.
+        pending: deque[str] = deque(maxlen=wanted)
+        contributed = False
+        try:
+            for line in iter_lines_backward(path):
+                level = parse_level(line)
+                if level is None:
+                    pending.appendleft(line)
+                    continue
+                if min_level is None or level >= min_level:
+                    for record_line in reversed([line, *pending]):
+                        kept.appendleft(record_line)
+                    contributed = True
+                pending.clear()
+                if len(kept) >= wanted:
+                    break
+            else:
+                # Lines before the first header (file started mid-record).
+                if min_level is None and pending:
+                    for record_line in reversed(pending):
+                        kept.appendleft(record_line)
+                    contributed = True
+        except OSError:
+            continue
+        if contributed:
+            used.append(path)
+    while len(kept) > wanted:
+        kept.popleft()
+    return list(kept), used
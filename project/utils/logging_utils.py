@@ -1,70 +1,277 @@
+"""App logging: callers only enqueue, one background thread does the I/O.
+
+``log_error``/``log_info`` and the keyboard logger put records on a bounded
+queue through a QueueHandler. A QueueListener thread writes them as JSON lines
+to the rotating log files, echoes them to the console and forwards errors to
+Telegram. Callers (often the Tk main thread) never touch the disk: when the
+queue is full the record is dropped and counted, and the count is written to
+the log once there is room again.
+
+File output is buffered and flushed on an ERROR record, every
+LOG_FLUSH_SECONDS, and at shutdown (``shutdown_logging``, also run at exit).
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import json
 import logging
+import queue
+import sys
+import threading
 import time
-from logging.handlers import RotatingFileHandler
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
 
 from project.core import config
+from project.utils.error_fingerprint import ErrorDeduplicator
 
 
 logger = logging.getLogger("uvjerenja_terminal")
 logger.setLevel(logging.INFO)
 
-_last_telegram_error_at = 0.0
-_last_telegram_error_message = ""
+_setup_lock = threading.Lock()
+_app_lock = threading.Lock()
+_routes: dict[str, list[logging.Handler]] = {}
+_queue: queue.Queue = queue.Queue(maxsize=max(100, config.LOG_QUEUE_SIZE))
+_listener: "_LogListener | None" = None
+_dropped = 0
+_dropped_lock = threading.Lock()
+_exc_formatter = logging.Formatter()
 
 
-def _ensure_handlers() -> None:
-    if logger.handlers:
-        return
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per line; ``ts`` comes first so the log index can read it cheaply."""
 
-    # File log (persisted). Journald will also capture stdout/stderr via systemd.
-    try:
-        handler = RotatingFileHandler(
-            str(config.ERROR_LOG_FILE),
-            maxBytes=2_000_000,
-            backupCount=5,
-            encoding="utf-8",
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "time": self.formatTime(record, "%d.%m.%Y %H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _RouteQueueHandler(QueueHandler):
+    def __init__(self, route: str) -> None:
+        super().__init__(_queue)
+        self.route = route
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now: args may change and frames
+        # must not be kept alive while the record waits in the queue.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.log_route = self.route
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _dropped_lock:
+                _dropped += 1
+
+
+class _Dispatcher(logging.Handler):
+    """Listener-side handler: passes each record to the sinks of its route."""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        for sink in _routes.get(getattr(record, "log_route", "app"), ()):
+            if record.levelno >= sink.level:
+                try:
+                    sink.handle(record)
+                except Exception:
+                    pass
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.handle(record)
+
+
+_dispatcher = _Dispatcher()
+
+
+class _LogListener(QueueListener):
+    def __init__(self, flush_seconds: float) -> None:
+        super().__init__(_queue, _dispatcher)
+        self.flush_seconds = max(0.2, flush_seconds)
+        self._last_flush = time.monotonic()
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        while True:
+            if time.monotonic() - self._last_flush >= self.flush_seconds:
+                self.flush()
+            try:
+                return self.queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                self.flush()
+
+    def enqueue_sentinel(self) -> None:
+        try:
+            self.queue.put(self._sentinel, timeout=5)
+        except queue.Full:
+            pass
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        _report_dropped()
+        for sinks in list(_routes.values()):
+            for sink in sinks:
+                try:
+                    sink.flush()
+                except Exception:
+                    pass
+
+
+class _TelegramErrorHandler(logging.Handler):
+    """Forwards ``log_error`` messages to Telegram, once per error fingerprint.
+
+    Repeats of an error that keeps recurring (ids, paths and numbers ignored)
+    are counted instead of sent; ``flush`` (called by the listener every few
+    seconds) sends a digest of those counts every TELEGRAM_ERROR_DIGEST_MINUTES.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.dedup = ErrorDeduplicator(
+            max_entries=config.TELEGRAM_ERROR_FINGERPRINTS,
+            window_seconds=config.TELEGRAM_ERROR_COOLDOWN_SECONDS,
         )
-        fmt = logging.Formatter("%(asctime)s %(levelname)s: %(message)s", "%d.%m.%Y %H:%M:%S")
-        handler.setFormatter(fmt)
-        logger.addHandler(handler)
-    except Exception:
-        # If file logging fails, we still want console logging.
-        pass
+        self._next_digest_at = time.monotonic() + self._digest_seconds()
 
-    console = logging.StreamHandler()
-    console.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
-    logger.addHandler(console)
+    @staticmethod
+    def _digest_seconds() -> float:
+        return max(1, config.TELEGRAM_ERROR_DIGEST_MINUTES) * 60.0
 
+    def emit(self, record: logging.LogRecord) -> None:
+        if not getattr(record, "telegram", False):
+            return
+        text = str(record.getMessage() or "").strip()
+        if not text or text.startswith("[Telegram]"):
+            return
 
-def log_error(message: str) -> None:
-    global _last_telegram_error_at, _last_telegram_error_message
+        if self.dedup.should_send(text):
+            self._notify("Uvjerenja Terminal error:\n" + text[:3200])
 
-    _ensure_handlers()
-    logger.error(message)
-    if config.DEBUG_MODE:
-        print(message)
+    def flush(self) -> None:
+        if time.monotonic() < self._next_digest_at:
+            return
+        self._next_digest_at = time.monotonic() + self._digest_seconds()
+        digest = self.dedup.digest()
+        if digest:
+            self._notify("Uvjerenja Terminal error digest:\n" + digest)
 
-    text = str(message or "").strip()
-    if not text or text.startswith("[Telegram]"):
-        return
+    @staticmethod
+    def _notify(text: str) -> None:
+        try:
+            from project.services.telegram_notify import notify_telegram_async
+
+            notify_telegram_async(text, kind="error")
+        except Exception:
+            pass
 
-    now = time.monotonic()
-    cooldown = max(0, config.TELEGRAM_ERROR_COOLDOWN_SECONDS)
-    if text == _last_telegram_error_message and now - _last_telegram_error_at < cooldown:
+
+def _report_dropped() -> None:
+    global _dropped
+    with _dropped_lock:
+        count, _dropped = _dropped, 0
+    if not count:
         return
+    record = logger.makeRecord(logger.name, logging.WARNING, __file__, 0, f"Log queue full: {count} record(s) dropped", None, None)
+    record.log_route = "app"
+    _dispatcher.handle(record)
+
+
+def json_file_handler(path: Path, *, max_bytes: int, backup_count: int) -> logging.Handler:
+    """Rotating JSON-lines file behind a buffer; raises OSError if the file cannot be opened."""
+    target = RotatingFileHandler(str(path), maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    target.setFormatter(JsonLineFormatter())
+    return MemoryHandler(max(1, config.LOG_BUFFER_RECORDS), flushLevel=logging.ERROR, target=target, flushOnClose=True)
+
+
+def route_logger(target_logger: logging.Logger, route: str, sinks: list[logging.Handler]) -> None:
+    """Send ``target_logger`` through the shared queue; the listener writes its records to ``sinks``."""
+    global _listener
+    with _setup_lock:
+        _routes[route] = list(sinks)
+        target_logger.addHandler(_RouteQueueHandler(route))
+        if _listener is None:
+            _listener = _LogListener(config.LOG_FLUSH_SECONDS)
+            _listener.start()
+            atexit.register(shutdown_logging)
 
-    _last_telegram_error_message = text
-    _last_telegram_error_at = now
-    try:
-        from project.services.telegram_notify import notify_telegram_async
 
-        notify_telegram_async("Uvjerenja Terminal error:\n" + text[:3200], kind="error")
+def shutdown_logging() -> None:
+    """Write everything still queued or buffered and close the log files."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    try:
+        listener.stop()
     except Exception:
         pass
+    listener.flush()
+    for sinks in list(_routes.values()):
+        for sink in sinks:
+            # MemoryHandler.close() flushes but leaves its target open.
+            target = getattr(sink, "target", None)
+            for handler in (sink, target):
+                if handler is None:
+                    continue
+                try:
+                    handler.close()
+                except Exception:
+                    pass
+
+
+def _ensure_handlers() -> None:
+    if logger.handlers:
+        return
+    with _app_lock:
+        if logger.handlers:
+            return
+
+        sinks: list[logging.Handler] = []
+        # File log (persisted). Journald will also capture stdout/stderr via systemd.
+        try:
+            sinks.append(json_file_handler(config.ERROR_LOG_FILE, max_bytes=2_000_000, backup_count=5))
+        except Exception:
+            # If file logging fails, we still want console logging.
+            pass
+
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        sinks.append(console)
+        if config.DEBUG_MODE:
+            debug_print = logging.StreamHandler(sys.stdout)
+            debug_print.setFormatter(logging.Formatter("%(message)s"))
+            sinks.append(debug_print)
+        sinks.append(_TelegramErrorHandler())
+        route_logger(logger, "app", sinks)
+
+
+def log_error(message: str) -> None:
+    _ensure_handlers()
+    logger.error(message, extra={"telegram": True})
 
 
 def log_info(message: str) -> None:
     _ensure_handlers()
     logger.info(message)
-    if config.DEBUG_MODE:
-        print(message)
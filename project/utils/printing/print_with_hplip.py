@@ -1,15 +1,52 @@
 from __future__ import annotations
 
 import os
+import re
 import shutil
 import subprocess
 import time
 from dataclasses import dataclass
+from typing import Callable
 
 from project.core import config
 from project.core.runtime_settings import get_selected_printer
+from project.utils.cancellation import JobCancelled, run_cancellable
+from project.utils.deadline import Deadline
 from project.utils.logging_utils import log_error
-from project.utils.printing.printer_status import wait_for_printer_readiness
+from project.utils.printing.printer_status import cups_breaker, wait_for_printer_readiness
+
+
+_REQUEST_ID_RE = re.compile(r"request id is (\S+)")
+# The check after lp is informational and gets its own budget, so a job the
+# deadline squeezed still finishes as printed.
+_POST_PRINT_CHECK_SECONDS = 5.0
+
+
+def parse_lp_request_id(output: str) -> str:
+    """Return the CUPS request id ("Queue-123") from lp's stdout, or ""."""
+    match = _REQUEST_ID_RE.search(output or "")
+    return match.group(1) if match else ""
+
+
+def _cancel_cups_request(request_id: str) -> bool:
+    """Withdraw a job lp already queued; True if CUPS accepted the cancel."""
+    if not request_id or shutil.which("cancel") is None:
+        return False
+    try:
+        proc = subprocess.run(
+            ["cancel", request_id],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=10,
+        )
+    except (subprocess.TimeoutExpired, OSError) as exc:
+        log_error(f"cancel {request_id} failed: {exc}")
+        return False
+    if proc.returncode != 0:
+        log_error(f"cancel {request_id} failed: {(proc.stderr or proc.stdout).strip()}")
+        return False
+    return True
 
 
 def _classify_lp_error(detail: str) -> tuple[str, str]:
@@ -35,13 +72,27 @@ class PrintCommandResult:
     error_code: str = ""
     user_message: str = ""
     detail: str = ""
+    request_id: str = ""
 
 
-def print_with_hplip(file_path: str, preferred_printer: str | None = None) -> PrintCommandResult:
+def print_with_hplip(
+    file_path: str,
+    preferred_printer: str | None = None,
+    *,
+    deadline: Deadline | None = None,
+    title: str | None = None,
+    on_submitted: Callable[[str], None] | None = None,
+) -> PrintCommandResult:
     """Send a file to a CUPS printer using lp.
 
     Despite the historical name, this works for any configured CUPS queue.
     Default behavior: use configured printer if set, otherwise use the CUPS default printer.
+    With a deadline, lp and the pre-print readiness check only get the remaining
+    job budget. ``on_submitted`` receives the CUPS request id as soon as lp
+    accepts the file. After that the job counts as printed: the deadline's
+    cancel token is committed, so a later cancel cannot leave a "cancelled"
+    job whose certificate still prints, and the post-print readiness check
+    runs on its own short budget and only adds to ``detail``.
     """
     try:
         if not file_path:
@@ -54,7 +105,7 @@ def print_with_hplip(file_path: str, preferred_printer: str | None = None) -> Pr
             return PrintCommandResult(False, error_code="CUPS_MISSING", user_message="Komanda 'lp' nije dostupna. Provjeri CUPS instalaciju.")
 
         selected_printer = get_selected_printer() if preferred_printer is None else preferred_printer.strip()
-        ready, code, message, readiness_attempts = wait_for_printer_readiness(selected_printer)
+        ready, code, message, readiness_attempts = wait_for_printer_readiness(selected_printer, deadline=deadline)
         if not ready:
             log_error(f"Print failed - printer unavailable: {code} {message}")
             return PrintCommandResult(False, error_code=code, user_message=message)
@@ -63,33 +114,56 @@ def print_with_hplip(file_path: str, preferred_printer: str | None = None) -> Pr
         attempts = max(1, config.PRINT_RETRY_ATTEMPTS)
         last_error: PrintCommandResult | None = None
         for attempt in range(1, attempts + 1):
-            proc = subprocess.run(
-                ["lp", "-d", printer_name, "-o", "fit-to-page", file_path],
-                check=False,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=config.PRINT_TIMEOUT,
-            )
+            lp_command = ["lp", "-d", printer_name, "-o", "fit-to-page"]
+            if title:
+                lp_command += ["-t", title]
+            lp_command.append(file_path)
+            if deadline is None:
+                proc = subprocess.run(
+                    lp_command,
+                    check=False,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    timeout=config.PRINT_TIMEOUT,
+                )
+            else:
+                deadline.raise_if_cancelled()
+                if deadline.expired:
+                    break
+                proc = run_cancellable(
+                    lp_command,
+                    timeout=deadline.timeout(config.PRINT_TIMEOUT),
+                    cancel_token=deadline.cancel_token,
+                )
             if proc.returncode == 0:
+                cups_breaker().record_success()
+                request_id = parse_lp_request_id(proc.stdout)
+                cancel_token = deadline.cancel_token if deadline is not None else None
+                # From here the certificate is in CUPS: a cancel either withdraws
+                # the CUPS job too or is refused, never only the job.json side.
+                if cancel_token is not None and not cancel_token.commit():
+                    if _cancel_cups_request(request_id):
+                        raise JobCancelled(f"{cancel_token.reason}; CUPS request {request_id} cancelled")
+                    log_error(f"Cancel came after lp accepted {request_id or 'the job'} and CUPS could not withdraw it; finishing as printed")
+                if on_submitted is not None and request_id:
+                    on_submitted(request_id)
                 time.sleep(1.5)
+                # CUPS has the job, so the result is success whatever this says;
+                # failing here would only make the student print a second copy.
                 still_ready, ready_code, ready_message, _ = wait_for_printer_readiness(
                     printer_name,
                     attempts=1,
                     delay_seconds=0,
+                    deadline=Deadline(_POST_PRINT_CHECK_SECONDS),
                 )
-                if not still_ready:
-                    return PrintCommandResult(
-                        False,
-                        printer_name=printer_name,
-                        error_code=ready_code,
-                        user_message=ready_message,
-                        detail=(proc.stdout or "").strip(),
-                    )
                 detail = (proc.stdout or "").strip()
+                if not still_ready:
+                    log_error(f"Printer not ready after lp accepted {request_id or 'the job'}: {ready_code} {ready_message}")
+                    detail = (detail + f"\nPost-print check: {ready_code} {ready_message}").strip()
                 if readiness_attempts > 1:
                     detail = (detail + f"\nPrinter readiness attempts: {readiness_attempts}").strip()
-                return PrintCommandResult(True, printer_name=printer_name, detail=detail)
+                return PrintCommandResult(True, printer_name=printer_name, detail=detail, request_id=request_id)
 
             detail = (proc.stderr or proc.stdout or "").strip()
             error_code, user_message = _classify_lp_error(detail)
@@ -102,11 +176,30 @@ def print_with_hplip(file_path: str, preferred_printer: str | None = None) -> Pr
                 user_message=user_message,
                 detail=f"{detail}\nPrint attempt {attempt}/{attempts}".strip(),
             )
+            if error_code == "CUPS_OFFLINE":
+                # The scheduler is down; further lp attempts would fail the same way.
+                cups_breaker().record_failure(detail)
+                break
             if attempt < attempts and config.PRINT_RETRY_DELAY_SECONDS > 0:
-                time.sleep(config.PRINT_RETRY_DELAY_SECONDS)
+                if deadline is None:
+                    time.sleep(config.PRINT_RETRY_DELAY_SECONDS)
+                else:
+                    deadline.sleep(config.PRINT_RETRY_DELAY_SECONDS)
+        if last_error is None and deadline is not None and deadline.expired:
+            return PrintCommandResult(
+                False,
+                printer_name=printer_name,
+                error_code="PRINT_TIMEOUT",
+                user_message="Slanje na štampu je isteklo. Pokušaj ponovo.",
+                detail="Job deadline exhausted before lp could run.",
+            )
         return last_error or PrintCommandResult(False, printer_name=printer_name, error_code="PRINT_FAILED", user_message="Štampanje nije uspjelo.")
 
+    except JobCancelled:
+        raise
     except subprocess.TimeoutExpired:
+        if deadline is None or not deadline.expired:
+            cups_breaker().record_failure("lp timed out")
         return PrintCommandResult(False, error_code="PRINT_TIMEOUT", user_message="Slanje na štampu je isteklo. Pokušaj ponovo.")
     except Exception as e:
         log_error(f"Unexpected error while printing: {e}")
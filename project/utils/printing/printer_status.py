@@ -8,17 +8,86 @@ import urllib.parse
 from typing import Tuple
 
 from project.core import config
+from project.utils.cancellation import JobCancelled, run_cancellable
+from project.utils.circuit_breaker import CircuitOpenError, get_breaker, open_breakers
+from project.utils.deadline import Deadline
+from project.utils import metrics, tracing
 from project.utils.logging_utils import log_error
 
+_READINESS_ATTEMPTS = metrics.histogram(
+    "kiosk_printer_readiness_attempts",
+    "Printer readiness checks needed per wait, by result.",
+    ("result",),
+    buckets=(1, 2, 3, 5, 10),
+)
 
-def _run(*args: str) -> subprocess.CompletedProcess[str]:
-    return subprocess.run(
-        list(args),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        timeout=config.SUBPROCESS_TIMEOUT,
-    )
+# lpstat/lp stderr markers meaning the CUPS scheduler itself is unavailable.
+CUPS_DOWN_MARKERS = (
+    "scheduler is not running",
+    "unable to connect to server",
+)
+
+CUPS_UNAVAILABLE_MESSAGE = "CUPS is not responding. Printer checks are paused for a moment."
+
+
+def cups_breaker():
+    return get_breaker("cups")
+
+
+def is_cups_down_output(text: str) -> bool:
+    low = (text or "").lower()
+    return any(marker in low for marker in CUPS_DOWN_MARKERS)
+
+
+def _network_breaker(host: str, port: int):
+    return get_breaker(f"printer-net:{host}:{port}")
+
+
+def _run_unguarded(args: list[str], deadline: Deadline | None) -> subprocess.CompletedProcess[str]:
+    with tracing.span(args[0].rsplit("/", 1)[-1] if args else "subprocess", "subprocess", argv=" ".join(args)[:200]):
+        if deadline is None:
+            return subprocess.run(
+                args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=config.SUBPROCESS_TIMEOUT,
+            )
+        deadline.raise_if_cancelled()
+        if deadline.expired:
+            raise subprocess.TimeoutExpired(args, 0)
+        return run_cancellable(
+            args,
+            timeout=deadline.timeout(config.SUBPROCESS_TIMEOUT),
+            cancel_token=deadline.cancel_token,
+        )
+
+
+def _run(*args: str, deadline: Deadline | None = None) -> subprocess.CompletedProcess[str]:
+    """Run a CUPS command through the "cups" breaker.
+
+    Timeouts and "scheduler is not running" answers count as failures; while
+    the breaker is open this raises CircuitOpenError without running anything.
+    """
+    breaker = cups_breaker()
+    breaker.raise_if_open()
+    try:
+        proc = _run_unguarded(list(args), deadline)
+    except subprocess.TimeoutExpired as exc:
+        if deadline is not None and deadline.expired:
+            # Our own budget ran out, not necessarily CUPS' fault.
+            breaker.release()
+        else:
+            breaker.record_failure(f"{args[0]} timed out")
+        raise exc
+    except BaseException:
+        breaker.release()
+        raise
+    if proc.returncode != 0 and is_cups_down_output(proc.stderr or proc.stdout or ""):
+        breaker.record_failure((proc.stderr or proc.stdout or "").strip())
+    else:
+        breaker.record_success()
+    return proc
 
 
 def _parse_printers_from_lpstat(stdout: str) -> list[str]:
@@ -51,6 +120,8 @@ def list_configured_printers() -> tuple[list[str], str, str, str]:
             return [], default_name, "PRN_LIST_FAILED", detail or "Could not read the printer list."
 
         return _parse_printers_from_lpstat(list_proc.stdout or ""), default_name, "OK", ""
+    except CircuitOpenError:
+        return [], "", "CUPS_OFFLINE", CUPS_UNAVAILABLE_MESSAGE
     except subprocess.TimeoutExpired:
         return [], "", "PRN_CHECK_TIMEOUT", "Printer check timed out."
     except Exception as e:
@@ -90,6 +161,8 @@ def set_cups_default_printer(printer_name: str) -> tuple[bool, str, str]:
             detail = (proc.stderr or proc.stdout or "").strip()
             return False, "PRN_DEFAULT_FAILED", detail or f"Could not set '{clean_name}' as CUPS default."
         return True, "OK", clean_name
+    except CircuitOpenError:
+        return False, "CUPS_OFFLINE", CUPS_UNAVAILABLE_MESSAGE
     except subprocess.TimeoutExpired:
         return False, "PRN_CHECK_TIMEOUT", "Setting the default printer timed out."
     except Exception as e:
@@ -172,32 +245,47 @@ def _network_target_from_uri(uri: str) -> tuple[str, int] | None:
     return host, parsed.port or default_ports[scheme]
 
 
-def _check_network_device_available(uri: str, printer_name: str) -> tuple[bool, str, str]:
+def _check_network_device_available(uri: str, printer_name: str, *, deadline: Deadline | None = None) -> tuple[bool, str, str]:
     target = _network_target_from_uri(uri)
     if target is None:
         return True, "OK", ""
 
     host, port = target
-    timeout = max(1, min(10, config.NETWORK_CHECK_TIMEOUT))
+    timeout: float = max(1, min(10, config.NETWORK_CHECK_TIMEOUT))
+    if deadline is not None:
+        if deadline.expired:
+            return False, "PRN_CHECK_TIMEOUT", "Printer check ran out of time."
+        timeout = deadline.timeout(timeout)
+    breaker = _network_breaker(host, port)
+    if not breaker.allow():
+        return (
+            False,
+            "PRN_NETWORK_UNREACHABLE",
+            f"Printer '{printer_name}' at {host}:{port} is still unreachable (retry in {breaker.retry_in():.0f}s).",
+        )
     try:
         with socket.create_connection((host, port), timeout=timeout):
+            breaker.record_success()
             return True, "OK", ""
     except socket.gaierror as exc:
+        breaker.record_failure(f"DNS: {exc}")
         return False, "PRN_NETWORK_DNS_FAILED", f"Printer '{printer_name}' hostname could not be resolved: {host} ({exc})."
     except TimeoutError:
+        breaker.record_failure("connect timed out")
         return False, "PRN_NETWORK_TIMEOUT", f"Printer '{printer_name}' did not respond at {host}:{port}."
     except OSError as exc:
+        breaker.record_failure(str(exc))
         return False, "PRN_NETWORK_UNREACHABLE", f"Printer '{printer_name}' is not reachable at {host}:{port}: {exc}"
 
 
-def _get_device_uri(printer_name: str) -> tuple[str, str, str]:
+def _get_device_uri(printer_name: str, *, deadline: Deadline | None = None) -> tuple[str, str, str]:
     if shutil.which("lpstat") is None:
         return "", "CUPS_MISSING", "CUPS printer tools are not installed or not available."
 
     try:
-        proc = _run("lpstat", "-v", printer_name)
+        proc = _run("lpstat", "-v", printer_name, deadline=deadline)
         if proc.returncode != 0:
-            proc = _run("lpstat", "-v")
+            proc = _run("lpstat", "-v", deadline=deadline)
         if proc.returncode != 0:
             detail = (proc.stderr or proc.stdout or "").strip()
             return "", "PRN_DEVICE_CHECK_FAILED", detail or "Could not read the printer device URI."
@@ -217,8 +305,8 @@ def _get_device_uri(printer_name: str) -> tuple[str, str, str]:
         return "", "PRN_CHECK_TIMEOUT", "Printer device check timed out."
 
 
-def _check_physical_device_available(printer_name: str) -> tuple[bool, str, str]:
-    uri, code, message = _get_device_uri(printer_name)
+def _check_physical_device_available(printer_name: str, *, deadline: Deadline | None = None) -> tuple[bool, str, str]:
+    uri, code, message = _get_device_uri(printer_name, deadline=deadline)
     if code != "OK":
         return False, code, message
 
@@ -230,7 +318,7 @@ def _check_physical_device_available(printer_name: str) -> tuple[bool, str, str]
         )
 
     if not _is_direct_usb_device(uri):
-        return _check_network_device_available(uri, printer_name)
+        return _check_network_device_available(uri, printer_name, deadline=deadline)
 
     if shutil.which("lpinfo") is None:
         return (
@@ -240,7 +328,7 @@ def _check_physical_device_available(printer_name: str) -> tuple[bool, str, str]
         )
 
     try:
-        proc = _run("lpinfo", "-v")
+        proc = _run("lpinfo", "-v", deadline=deadline)
         if proc.returncode != 0:
             detail = (proc.stderr or proc.stdout or "").strip()
             return False, "PRN_DEVICE_CHECK_FAILED", detail or "Could not verify connected printer devices."
@@ -258,7 +346,7 @@ def _check_physical_device_available(printer_name: str) -> tuple[bool, str, str]
         return False, "PRN_CHECK_TIMEOUT", "Printer USB device check timed out."
 
 
-def detect_available_printer(preferred_name: str = "") -> Tuple[str, str, str]:
+def detect_available_printer(preferred_name: str = "", *, deadline: Deadline | None = None) -> Tuple[str, str, str]:
     """Resolve a usable printer queue.
 
     Returns (printer_name, code, user_message). code == OK when resolved.
@@ -274,11 +362,11 @@ def detect_available_printer(preferred_name: str = "") -> Tuple[str, str, str]:
 
     preferred = (preferred_name or "").strip()
     if preferred:
-        proc = _run("lpstat", "-p", preferred)
+        proc = _run("lpstat", "-p", preferred, deadline=deadline)
         if proc.returncode == 0:
             return preferred, "OK", ""
 
-    default_proc = _run("lpstat", "-d")
+    default_proc = _run("lpstat", "-d", deadline=deadline)
     if default_proc.returncode == 0:
         out = (default_proc.stdout or "").strip()
         if ":" in out:
@@ -286,13 +374,13 @@ def detect_available_printer(preferred_name: str = "") -> Tuple[str, str, str]:
             if default_name:
                 return default_name, "OK", ""
 
-    list_proc = _run("lpstat", "-p")
+    list_proc = _run("lpstat", "-p", deadline=deadline)
     if list_proc.returncode == 0:
         printers = _parse_printers_from_lpstat(list_proc.stdout or "")
         if len(printers) == 1:
             return printers[0], "OK", ""
         if len(printers) > 1:
-            device_proc = _run("lpstat", "-v")
+            device_proc = _run("lpstat", "-v", deadline=deadline)
             if device_proc.returncode == 0:
                 devices = _parse_device_map(device_proc.stdout or "")
                 usb_printers = [name for name in printers if (devices.get(name, "").lower().startswith("usb://"))]
@@ -305,13 +393,14 @@ def detect_available_printer(preferred_name: str = "") -> Tuple[str, str, str]:
     return "", "PRN_NOT_FOUND", "Printer was not found. Check USB, power, and CUPS setup."
 
 
-def get_printer_readiness(printer_name: str) -> Tuple[bool, str, str]:
+@tracing.traced("get_printer_readiness", "printer")
+def get_printer_readiness(printer_name: str, *, deadline: Deadline | None = None) -> Tuple[bool, str, str]:
     try:
-        resolved_name, code, message = detect_available_printer(printer_name)
+        resolved_name, code, message = detect_available_printer(printer_name, deadline=deadline)
         if code != "OK":
             return False, code, message
 
-        proc = _run("lpstat", "-p", resolved_name, "-l")
+        proc = _run("lpstat", "-p", resolved_name, "-l", deadline=deadline)
         if proc.returncode != 0:
             return False, "PRN_NOT_FOUND", "Printer was not found. Check that it is powered on."
 
@@ -336,7 +425,7 @@ def get_printer_readiness(printer_name: str) -> Tuple[bool, str, str]:
         ):
             return False, "PRN_OFFLINE", f"Printer '{resolved_name}' is reported offline or unreachable by CUPS."
 
-        proc2 = _run("lpstat", "-a")
+        proc2 = _run("lpstat", "-a", deadline=deadline)
         if proc2.returncode == 0:
             lines = (proc2.stdout or "").splitlines()
             for line in lines:
@@ -344,11 +433,15 @@ def get_printer_readiness(printer_name: str) -> Tuple[bool, str, str]:
                 if line_l.startswith(resolved_name.lower() + " ") and "not accepting requests" in line_l:
                     return False, "PRN_NOT_ACCEPTING", f"Printer '{resolved_name}' is not accepting requests."
 
-        physical_ready, physical_code, physical_message = _check_physical_device_available(resolved_name)
+        physical_ready, physical_code, physical_message = _check_physical_device_available(resolved_name, deadline=deadline)
         if not physical_ready:
             return False, physical_code, physical_message
 
         return True, "OK", resolved_name
+    except JobCancelled:
+        raise
+    except CircuitOpenError:
+        return False, "CUPS_OFFLINE", CUPS_UNAVAILABLE_MESSAGE
     except subprocess.TimeoutExpired:
         return False, "PRN_CHECK_TIMEOUT", "Printer check timed out."
     except Exception as e:
@@ -356,30 +449,52 @@ def get_printer_readiness(printer_name: str) -> Tuple[bool, str, str]:
         return False, "PRN_CHECK_FAILED", "Could not check printer readiness."
 
 
+def _blocked_by_open_breaker(code: str) -> bool:
+    if code == "CUPS_OFFLINE":
+        return cups_breaker().is_open
+    if code.startswith("PRN_NETWORK"):
+        return any(breaker.is_open for breaker in open_breakers("printer-net:"))
+    return False
+
+
 def wait_for_printer_readiness(
     printer_name: str,
     *,
     attempts: int | None = None,
     delay_seconds: int | None = None,
+    deadline: Deadline | None = None,
 ) -> tuple[bool, str, str, int]:
     max_attempts = max(1, attempts if attempts is not None else config.PRINTER_CHECK_RETRY_ATTEMPTS)
-    delay = max(0, delay_seconds if delay_seconds is not None else config.PRINTER_CHECK_RETRY_DELAY_SECONDS)
+    delay: float = max(0, delay_seconds if delay_seconds is not None else config.PRINTER_CHECK_RETRY_DELAY_SECONDS)
     last_code = "PRN_CHECK_FAILED"
     last_message = "Could not check printer readiness."
+    attempts_made = 0
 
     for attempt in range(1, max_attempts + 1):
-        ready, code, message = get_printer_readiness(printer_name)
+        attempts_made = attempt
+        ready, code, message = get_printer_readiness(printer_name, deadline=deadline)
         if ready:
+            _READINESS_ATTEMPTS.observe(attempt, result="ready")
             return True, code, message, attempt
 
         last_code = code
         last_message = message
+        if deadline is not None and deadline.expired:
+            # No budget left for another attempt; stop retrying.
+            break
+        if _blocked_by_open_breaker(code):
+            # Retrying inside the breaker's reset window would only fail fast again.
+            break
         if attempt < max_attempts and delay > 0:
-            time.sleep(delay)
+            if deadline is None:
+                time.sleep(delay)
+            else:
+                deadline.sleep(delay)
 
-    if max_attempts > 1:
-        last_message = f"{last_message} Retried {max_attempts} times."
-    return False, last_code, last_message, max_attempts
+    _READINESS_ATTEMPTS.observe(attempts_made, result="not_ready")
+    if attempts_made > 1:
+        last_message = f"{last_message} Retried {attempts_made} times."
+    return False, last_code, last_message, attempts_made
 
 
 def collect_printer_diagnostics(preferred_name: str = "") -> dict:
@@ -414,6 +529,10 @@ def collect_printer_diagnostics(preferred_name: str = "") -> dict:
         data["ready_code"] = ready_code
         data["ready_message"] = ready_message
         return data
+    except CircuitOpenError:
+        data["detect_code"] = "CUPS_OFFLINE"
+        data["detect_message"] = CUPS_UNAVAILABLE_MESSAGE
+        return data
     except subprocess.TimeoutExpired:
         data["detect_code"] = "PRN_CHECK_TIMEOUT"
         data["detect_message"] = "Printer check timed out."
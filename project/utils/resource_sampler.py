@@ -0,0 +1,350 @@
+"""System resource sampler: CPU, memory, SD card I/O, temperature, throttling.
+
+Every RESOURCE_SAMPLE_SECONDS one row is read from ``/proc/stat``,
+``/proc/meminfo``, ``/proc/diskstats``, ``/sys/class/thermal`` and the
+firmware throttling flags into a fixed-size ring buffer (preallocated
+``array`` columns covering RESOURCE_HISTORY_MINUTES). A sample is a few small
+file reads, so the sampler costs well under 1% of one core.
+
+``summary(since, until)`` aggregates the rows in a time window; print jobs
+store it in job.json so a slow ``soffice`` run can be told apart as CPU
+contention, a busy SD card or a hot, throttled Pi. Throttling episodes
+(under-voltage, frequency cap, throttled, soft temperature limit) are kept
+separately for /status.
+
+The throttling flags come from the firmware's sysfs node when the kernel has
+it, otherwise from ``vcgencmd get_throttled`` every
+RESOURCE_THROTTLE_CHECK_SECONDS.
+"""
+
+from __future__ import annotations
+
+import glob
+import math
+import re
+import shutil
+import subprocess
+import threading
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from project.core import config
+from project.utils import metrics
+from project.utils.logging_utils import log_error, log_info
+
+
+THROTTLE_FLAGS = {
+    0x1: "under-voltage",
+    0x2: "arm frequency capped",
+    0x4: "throttled",
+    0x8: "soft temperature limit",
+}
+_THROTTLE_SYSFS = Path("/sys/devices/platform/soc/soc:firmware/get_throttled")
+_DISK_RE = re.compile(r"^(mmcblk\d+|sd[a-z]+|nvme\d+n\d+|vd[a-z]+)$")
+_SECTOR_BYTES = 512
+
+_TEMPERATURE = metrics.gauge("kiosk_cpu_temperature_celsius", "SoC temperature.")
+_THROTTLED = metrics.gauge("kiosk_throttled_flags", "Current firmware throttling flags (bits 0-3 of get_throttled).")
+
+# Ring buffer columns, one entry per sample.
+_COLUMNS = ("at", "cpu", "iowait", "mem_available", "read_bytes", "write_bytes", "io_busy", "temp", "throttled")
+
+
+def describe_throttle(flags: int) -> str:
+    names = [name for bit, name in THROTTLE_FLAGS.items() if flags & bit]
+    return ", ".join(names) if names else "none"
+
+
+def _read_cpu_times() -> tuple[float, float, float] | None:
+    """(total, idle, iowait) jiffies from the aggregate cpu line."""
+    try:
+        with open("/proc/stat", "rb") as handle:
+            fields = handle.readline().split()
+    except OSError:
+        return None
+    if not fields or fields[0] != b"cpu":
+        return None
+    values = [float(value) for value in fields[1:9]]
+    idle = values[3]
+    iowait = values[4] if len(values) > 4 else 0.0
+    return sum(values), idle, iowait
+
+
+def _read_mem_available() -> float:
+    try:
+        with open("/proc/meminfo", "rb") as handle:
+            for line in handle:
+                if line.startswith(b"MemAvailable:"):
+                    return float(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return math.nan
+
+
+def _read_disk_counters() -> tuple[float, float, float] | None:
+    """(sectors read, sectors written, ms doing I/O) summed over whole disks."""
+    read = written = busy_ms = 0.0
+    try:
+        with open("/proc/diskstats", "rb") as handle:
+            for line in handle:
+                fields = line.split()
+                if len(fields) < 13 or not _DISK_RE.match(fields[2].decode("ascii", "replace")):
+                    continue
+                read += float(fields[5])
+                written += float(fields[9])
+                busy_ms += float(fields[12])
+    except (OSError, ValueError):
+        return None
+    return read, written, busy_ms
+
+
+def _read_temperature() -> float:
+    hottest = math.nan
+    for path in glob.glob("/sys/class/thermal/thermal_zone*/temp"):
+        try:
+            with open(path, "rb") as handle:
+                value = float(handle.read().strip()) / 1000
+        except (OSError, ValueError):
+            continue
+        if math.isnan(hottest) or value > hottest:
+            hottest = value
+    return hottest
+
+
+def _read_throttled_sysfs() -> int | None:
+    try:
+        return int(_THROTTLE_SYSFS.read_text(encoding="ascii").strip(), 16)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_throttled_vcgencmd() -> int | None:
+    executable = shutil.which("vcgencmd")
+    if not executable:
+        return None
+    try:
+        completed = subprocess.run([executable, "get_throttled"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r"throttled=(0x[0-9a-fA-F]+)", completed.stdout or "")
+    return int(match.group(1), 16) if match else None
+
+
+@dataclass
+class ThrottleEvent:
+    started_at: float
+    ended_at: float | None
+    flags: int
+
+    @property
+    def duration(self) -> float:
+        return (self.ended_at or time.time()) - self.started_at
+
+
+class ResourceSampler:
+    def __init__(self, *, interval: float | None = None, history_minutes: int | None = None) -> None:
+        self.interval = max(0.5, float(interval if interval is not None else config.RESOURCE_SAMPLE_SECONDS))
+        minutes = history_minutes if history_minutes is not None else config.RESOURCE_HISTORY_MINUTES
+        self.capacity = max(10, int(minutes * 60 / self.interval))
+        self._columns = {name: array("d", [math.nan]) * self.capacity for name in _COLUMNS}
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._previous_cpu: tuple[float, float, float] | None = None
+        self._previous_disk: tuple[float, float, float] | None = None
+        self._previous_at = 0.0
+        self._throttle_source = "sysfs" if _THROTTLE_SYSFS.exists() else "vcgencmd"
+        self._throttled = 0
+        self._throttled_since_boot = 0
+        self._next_throttle_check = 0.0
+        self._events: deque[ThrottleEvent] = deque(maxlen=50)
+
+    def start(self) -> None:
+        if not config.RESOURCE_SAMPLER_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as exc:
+                log_error(f"[Resources] Sampling failed: {exc}")
+            self._stop_event.wait(self.interval)
+
+    def _read_throttled(self, now: float) -> int:
+        if self._throttle_source == "sysfs":
+            value = _read_throttled_sysfs()
+        elif now >= self._next_throttle_check:
+            self._next_throttle_check = now + max(self.interval, config.RESOURCE_THROTTLE_CHECK_SECONDS)
+            value = _read_throttled_vcgencmd()
+        else:
+            return self._throttled
+        if value is None:
+            return 0
+        self._throttled_since_boot = (value >> 16) & 0xF
+        return value & 0xF
+
+    def sample(self) -> None:
+        now = time.time()
+        cpu_times = _read_cpu_times()
+        disk = _read_disk_counters()
+        row = dict.fromkeys(_COLUMNS, math.nan)
+        row["at"] = now
+        if cpu_times and self._previous_cpu:
+            total = cpu_times[0] - self._previous_cpu[0]
+            if total > 0:
+                idle = cpu_times[1] - self._previous_cpu[1]
+                iowait = cpu_times[2] - self._previous_cpu[2]
+                row["cpu"] = max(0.0, (total - idle - iowait) / total * 100)
+                row["iowait"] = max(0.0, iowait / total * 100)
+        if disk and self._previous_disk and self._previous_at:
+            elapsed = max(0.001, now - self._previous_at)
+            row["read_bytes"] = max(0.0, disk[0] - self._previous_disk[0]) * _SECTOR_BYTES
+            row["write_bytes"] = max(0.0, disk[1] - self._previous_disk[1]) * _SECTOR_BYTES
+            row["io_busy"] = min(100.0, max(0.0, disk[2] - self._previous_disk[2]) / (elapsed * 1000) * 100)
+        row["mem_available"] = _read_mem_available()
+        row["temp"] = _read_temperature()
+        throttled = self._read_throttled(time.monotonic())
+        row["throttled"] = float(throttled)
+        self._previous_cpu = cpu_times
+        self._previous_disk = disk
+        self._previous_at = now
+
+        with self._lock:
+            index = self._next
+            for name, value in row.items():
+                self._columns[name][index] = value
+            self._next = (index + 1) % self.capacity
+            self._count = min(self.capacity, self._count + 1)
+            self._track_throttle(now, throttled)
+        if not math.isnan(row["temp"]):
+            _TEMPERATURE.set(row["temp"])
+        _THROTTLED.set(throttled)
+
+    def _track_throttle(self, now: float, flags: int) -> None:
+        current = self._events[-1] if self._events and self._events[-1].ended_at is None else None
+        if flags and current is None:
+            self._events.append(ThrottleEvent(now, None, flags))
+            log_info(f"[Resources] Throttling started: {describe_throttle(flags)}")
+        elif flags and current is not None:
+            current.flags |= flags
+        elif not flags and current is not None:
+            current.ended_at = now
+            log_info(f"[Resources] Throttling ended after {current.duration:.0f}s: {describe_throttle(current.flags)}")
+        self._throttled = flags
+
+    def _window(self, since: float, until: float) -> dict[str, list[float]]:
+        with self._lock:
+            start = (self._next - self._count) % self.capacity
+            order = [(start + offset) % self.capacity for offset in range(self._count)]
+            at = self._columns["at"]
+            selected = [index for index in order if since <= at[index] <= until]
+            return {name: [column[index] for index in selected] for name, column in self._columns.items()}
+
+    def summary(self, since: float, until: float | None = None) -> dict:
+        """Aggregate the samples taken between ``since`` and ``until`` (default now)."""
+        window = self._window(since, until if until is not None else time.time())
+        samples = len(window["at"])
+        result: dict = {"samples": samples, "interval_seconds": self.interval}
+        if not samples:
+            return result
+
+        def clean(name: str) -> list[float]:
+            return [value for value in window[name] if not math.isnan(value)]
+
+        def average(name: str) -> float | None:
+            values = clean(name)
+            return round(sum(values) / len(values), 1) if values else None
+
+        def peak(name: str) -> float | None:
+            values = clean(name)
+            return round(max(values), 1) if values else None
+
+        flags = 0
+        for value in clean("throttled"):
+            flags |= int(value)
+        mem = clean("mem_available")
+        result.update(
+            {
+                "cpu_avg_percent": average("cpu"),
+                "cpu_max_percent": peak("cpu"),
+                "iowait_avg_percent": average("iowait"),
+                "io_busy_avg_percent": average("io_busy"),
+                "io_busy_max_percent": peak("io_busy"),
+                "read_mb": round(sum(clean("read_bytes")) / 1_000_000, 2),
+                "write_mb": round(sum(clean("write_bytes")) / 1_000_000, 2),
+                "mem_available_min_mb": round(min(mem) / 1_048_576) if mem else None,
+                "temp_max_c": peak("temp"),
+                "throttled_flags": flags,
+                "throttled": describe_throttle(flags) if flags else "",
+            }
+        )
+        return result
+
+    def throttle_status(self, hours: float = 24) -> str:
+        cutoff = time.time() - hours * 3600
+        with self._lock:
+            events = [event for event in self._events if (event.ended_at or time.time()) >= cutoff]
+            since_boot = self._throttled_since_boot
+            now_flags = self._throttled
+        temp = _TEMPERATURE.value()
+        parts = [f"{temp:.0f}°C" if temp else "temperature unknown"]
+        if now_flags:
+            parts.append(f"NOW {describe_throttle(now_flags)}")
+        if events:
+            last = events[-1]
+            when = time.strftime("%d.%m. %H:%M", time.localtime(last.started_at))
+            parts.append(
+                f"{len(events)} throttling episode(s) in {hours:.0f}h, last {when} for {last.duration:.0f}s "
+                f"({describe_throttle(last.flags)})"
+            )
+        else:
+            parts.append(f"no throttling in {hours:.0f}h")
+        if since_boot:
+            parts.append(f"since boot: {describe_throttle(since_boot)}")
+        return "; ".join(parts)
+
+
+def format_resource_summary(summary: dict) -> str:
+    if not summary.get("samples"):
+        return "no resource samples"
+    parts = []
+    # CPU percentages need two samples; a very short job has only one.
+    if summary.get("cpu_avg_percent") is not None:
+        parts.append(f"CPU avg {summary['cpu_avg_percent']}% max {summary['cpu_max_percent']}%")
+    if summary.get("iowait_avg_percent") is not None:
+        parts.append(f"iowait {summary['iowait_avg_percent']}%")
+    if summary.get("io_busy_avg_percent") is not None:
+        parts.append(f"SD busy {summary['io_busy_avg_percent']}% (r {summary['read_mb']} MB, w {summary['write_mb']} MB)")
+    if summary.get("temp_max_c") is not None:
+        parts.append(f"max {summary['temp_max_c']}°C")
+    if summary.get("throttled"):
+        parts.append(f"THROTTLED: {summary['throttled']}")
+    return ", ".join(parts) or f"{summary['samples']} resource sample(s), too few for rates"
+
+
+_sampler_lock = threading.Lock()
+_sampler: ResourceSampler | None = None
+
+
+def get_resource_sampler() -> ResourceSampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = ResourceSampler()
+        return _sampler
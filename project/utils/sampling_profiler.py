@@ -0,0 +1,134 @@
+"""Sampling profiler for the running app (/profile).
+
+A background loop reads ``sys._current_frames()`` every ``interval`` seconds
+and counts each thread's stack, root to leaf, as one collapsed line
+("thread;outer;...;inner"). The result is the usual input for flamegraph
+tools (flamegraph.pl, speedscope, Perfetto) plus a short text summary of the
+hottest functions. Nothing is installed into the interpreter (no settrace), so
+the only cost is the sampling itself, and a run always ends after its
+duration; only one profile runs at a time.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from types import CodeType, FrameType
+
+from project.core import config
+
+
+MAX_STACK_DEPTH = 80
+
+_run_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running."""
+
+
+@dataclass
+class ProfileResult:
+    duration: float
+    interval: float
+    samples: int
+    stacks: Counter = field(default_factory=Counter)
+    thread_samples: Counter = field(default_factory=Counter)
+    sampling_seconds: float = 0.0
+
+    def collapsed(self) -> str:
+        """One "frame;frame;... count" line per distinct stack (flamegraph input)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 15) -> str:
+        self_counts: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                self_counts[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        total = max(1, sum(self.stacks.values()))
+        overhead = self.sampling_seconds / self.duration * 100 if self.duration else 0.0
+        lines = [
+            f"Profile: {self.duration:.1f}s, {self.samples} samples every {self.interval * 1000:.0f} ms, "
+            f"sampling overhead {overhead:.1f}% of one core",
+            "",
+            "Samples per thread:",
+        ]
+        for name, count in self.thread_samples.most_common(10):
+            lines.append(f"  {name}: {count}")
+        lines.append("")
+        lines.append(f"Top {top} by own samples (where threads were):")
+        for name, count in self_counts.most_common(top):
+            lines.append(f"  {count / total * 100:5.1f}%  {name}")
+        lines.append("")
+        lines.append(f"Top {top} inclusive:")
+        for name, count in inclusive.most_common(top):
+            lines.append(f"  {count / total * 100:5.1f}%  {name}")
+        return "\n".join(lines)
+
+
+def _frame_label(code: CodeType, cache: dict[CodeType, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+        cache[code] = label
+    return label
+
+
+def _collapse(thread_name: str, frame: FrameType | None, cache: dict[CodeType, str]) -> str:
+    labels: list[str] = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code, cache))
+        frame = frame.f_back
+    labels.append(thread_name.replace(";", ","))
+    labels.reverse()
+    return ";".join(labels)
+
+
+def profile(duration: float, *, interval: float | None = None) -> ProfileResult:
+    """Sample every thread for ``duration`` seconds (clamped to PROFILE_MAX_SECONDS)."""
+    duration = max(1.0, min(float(duration), float(max(1, config.PROFILE_MAX_SECONDS))))
+    interval = max(0.001, float(interval if interval is not None else config.PROFILE_INTERVAL_MS / 1000))
+    if not _run_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running.")
+    try:
+        result = ProfileResult(duration=duration, interval=interval, samples=0)
+        own_ident = threading.get_ident()
+        cache: dict[CodeType, str] = {}
+        started = time.monotonic()
+        deadline = started + duration
+        next_sample = started
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now < next_sample:
+                time.sleep(min(next_sample - now, deadline - now))
+                continue
+            next_sample += interval
+            if next_sample < now:
+                # Fell behind (e.g. the GIL was busy); do not sample back-to-back to catch up.
+                next_sample = now + interval
+            sample_started = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                thread_name = names.get(ident, f"thread-{ident}")
+                result.stacks[_collapse(thread_name, frame, cache)] += 1
+                result.thread_samples[thread_name] += 1
+            del frames
+            result.samples += 1
+            result.sampling_seconds += time.perf_counter() - sample_started
+        result.duration = time.monotonic() - started
+        return result
+    finally:
+        _run_lock.release()
@@ -0,0 +1,143 @@
+"""Lightweight span tracing with Chrome trace-event export (/trace).
+
+``span("name", key=value)`` is a context manager and ``traced(...)`` a
+decorator; both record a complete event (start, duration, thread) into a
+ring buffer of the last TRACE_BUFFER_EVENTS spans. ``start_span`` returns an
+open span for code that cannot use a ``with`` block (e.g. pipeline stages
+entered in one function and left in another). ``export_chrome_trace`` writes
+the buffer as trace-event JSON that chrome://tracing and Perfetto open.
+
+When tracing is disabled ``span`` returns a shared no-op object and
+``traced`` calls straight through, so instrumented code pays one global
+lookup. ``deque.append`` is atomic, so recording takes no lock.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, TypeVar
+
+from project.core import config
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_enabled = bool(config.TRACING_ENABLED)
+_events: deque[tuple] = deque(maxlen=max(1000, config.TRACE_BUFFER_EVENTS))
+_thread_names: dict[int, str] = {}
+_PID = os.getpid()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def clear() -> None:
+    _events.clear()
+
+
+def _now_us() -> int:
+    return time.perf_counter_ns() // 1000
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start_us", "tid", "_ended")
+
+    def __init__(self, name: str, category: str, args: dict[str, Any]) -> None:
+        self.name = name
+        self.category = category
+        self.args = args
+        self.tid = threading.get_ident()
+        self.start_us = _now_us()
+        self._ended = False
+
+    def end(self, **args: Any) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        if args:
+            self.args.update(args)
+        if self.tid not in _thread_names:
+            _thread_names[self.tid] = threading.current_thread().name
+        _events.append((self.name, self.category, self.start_us, _now_us() - self.start_us, self.tid, self.args))
+
+    def __enter__(self) -> "_Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.end()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def end(self, **args: Any) -> None:
+        return None
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, category: str = "app", **args: Any) -> _Span | _NoopSpan:
+    if not _enabled:
+        return _NOOP
+    return _Span(name, category, args)
+
+
+def start_span(name: str, category: str = "app", **args: Any) -> _Span | _NoopSpan:
+    """Open a span that is closed later with ``.end()``."""
+    return span(name, category, **args)
+
+
+def traced(name: str | None = None, category: str = "app") -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def event_count() -> int:
+    return len(_events)
+
+
+def export_chrome_trace() -> bytes:
+    """The buffered spans as Chrome trace-event JSON (complete "X" events)."""
+    events = list(_events)
+    trace: list[dict[str, Any]] = [
+        {"name": "process_name", "ph": "M", "pid": _PID, "tid": 0, "args": {"name": "uvjerenja-terminal"}},
+    ]
+    for tid, thread_name in list(_thread_names.items()):
+        trace.append({"name": "thread_name", "ph": "M", "pid": _PID, "tid": tid, "args": {"name": thread_name}})
+    for name, category, start_us, duration_us, tid, args in events:
+        event = {"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": duration_us, "pid": _PID, "tid": tid}
+        if args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool)) else str(value) for key, value in args.items()}
+        trace.append(event)
+    return json.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}).encode("utf-8")
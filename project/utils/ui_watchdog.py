@@ -0,0 +1,212 @@
+"""Detect stalls of the Tk main loop and record where it was stuck.
+
+The Tk thread calls ``beat()`` from a short ``after`` timer (ScreenManager's
+UI action pump). A watchdog thread checks how long ago the last beat was; when
+that passes UI_STALL_THRESHOLD_MS it captures the main thread's stack with
+``sys._current_frames()``, and when the beats resume it records the stall's
+length. The longest stalls are kept with their stacks for /status and
+/stalls, and their durations go into the metrics.
+
+If the process runs under systemd with ``WatchdogSec=`` (NOTIFY_SOCKET is
+set), ``WATCHDOG=1`` is sent only while the UI heartbeat is fresh, so a
+frozen touchscreen gets the service restarted.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+
+from project.core import config
+from project.utils import metrics
+from project.utils.logging_utils import log_error
+
+
+_STALLS = metrics.counter("kiosk_ui_stalls_total", "Tk main loop stalls longer than the threshold.")
+_STALL_SECONDS = metrics.histogram(
+    "kiosk_ui_stall_seconds",
+    "Length of Tk main loop stalls.",
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120),
+)
+_HEARTBEAT_AGE = metrics.gauge("kiosk_ui_heartbeat_age_seconds", "Time since the Tk main loop last ran its heartbeat timer.")
+
+
+@dataclass
+class Stall:
+    started_at: float
+    duration: float
+    stack: list[str]
+    ongoing: bool = False
+
+    @property
+    def top_frame(self) -> str:
+        for line in reversed(self.stack):
+            text = line.strip().splitlines()[0] if line.strip() else ""
+            if text.startswith("File "):
+                return text
+        return "unknown"
+
+
+def sd_notify(message: str) -> bool:
+    """Send a message to systemd's notify socket; False when not running under systemd."""
+    address = os.environ.get("NOTIFY_SOCKET", "")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(message.encode("utf-8"))
+        return True
+    except OSError:
+        return False
+
+
+class UiWatchdog:
+    def __init__(
+        self,
+        *,
+        threshold_seconds: float | None = None,
+        check_seconds: float = 0.25,
+        keep_worst: int = 5,
+    ) -> None:
+        self.threshold = max(0.2, float(threshold_seconds if threshold_seconds is not None else config.UI_STALL_THRESHOLD_MS / 1000))
+        self.check_seconds = max(0.05, check_seconds)
+        self.keep_worst = max(1, keep_worst)
+        self._main_ident = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._max_lag = 0.0
+        self._lock = threading.Lock()
+        self._current: Stall | None = None
+        self._worst: list[Stall] = []
+        self.stall_count = 0
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        watchdog_usec = int(os.environ.get("WATCHDOG_USEC", "0") or 0)
+        self._sd_interval = watchdog_usec / 2_000_000 if watchdog_usec > 0 else 10.0
+        self._next_sd_ping = 0.0
+
+    def beat(self, lag: float = 0.0) -> None:
+        """Called on the Tk thread with how late its timer ran; only stores numbers."""
+        self._last_beat = time.monotonic()
+        if lag > self._max_lag:
+            self._max_lag = lag
+
+    def take_max_lag(self) -> float:
+        """Largest timer lag since the previous call (per-minute UI lag for the health history)."""
+        lag, self._max_lag = self._max_lag, 0.0
+        return lag
+
+    def heartbeat_age(self) -> float:
+        return max(0.0, time.monotonic() - self._last_beat)
+
+    def start(self) -> None:
+        if not config.UI_WATCHDOG_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        _HEARTBEAT_AGE.set_function(self.heartbeat_age)
+        self._thread = threading.Thread(target=self._run, name="ui-watchdog", daemon=True)
+        self._thread.start()
+        sd_notify("READY=1")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        sd_notify("STOPPING=1")
+
+    def worst_stalls(self) -> list[Stall]:
+        with self._lock:
+            stalls = list(self._worst)
+            if self._current is not None:
+                stalls.append(Stall(self._current.started_at, self.heartbeat_age(), self._current.stack, ongoing=True))
+        return sorted(stalls, key=lambda stall: stall.duration, reverse=True)[: self.keep_worst]
+
+    def status_line(self) -> str:
+        age = self.heartbeat_age()
+        text = f"heartbeat {age:.1f}s ago"
+        if age >= self.threshold:
+            text += " (STALLED)"
+        worst = self.worst_stalls()
+        if not worst:
+            return f"{text}, no stalls"
+        top = worst[0]
+        when = time.strftime("%d.%m. %H:%M", time.localtime(top.started_at))
+        return f"{text}, {self.stall_count} stall(s); worst {top.duration:.1f}s at {when} in {top.top_frame}"
+
+    def format_stalls(self, frames: int = 12) -> str:
+        stalls = self.worst_stalls()
+        if not stalls:
+            return f"No UI stalls longer than {self.threshold:.1f}s since start."
+        parts = [f"UI stalls longer than {self.threshold:.1f}s: {self.stall_count}. Worst:"]
+        for stall in stalls:
+            when = time.strftime("%d.%m.%Y %H:%M:%S", time.localtime(stall.started_at))
+            state = " (still stalled)" if stall.ongoing else ""
+            parts.append(f"\n{stall.duration:.1f}s at {when}{state}\n" + "".join(stall.stack[-frames:]).rstrip())
+        return "\n".join(parts)
+
+    # -- internals ---------------------------------------------------------
+
+    def _capture_main_stack(self) -> list[str]:
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return []
+        try:
+            return traceback.format_stack(frame)
+        finally:
+            del frame
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.check_seconds):
+            try:
+                self._check()
+            except Exception as exc:
+                log_error(f"[UI] Watchdog check failed: {exc}")
+
+    def _check(self) -> None:
+        age = self.heartbeat_age()
+        now = time.monotonic()
+        if age >= self.threshold:
+            if self._current is None:
+                stack = self._capture_main_stack()
+                with self._lock:
+                    self._current = Stall(time.time() - age, age, stack)
+            return
+        current = self._current
+        if current is not None:
+            # Beats resumed: the stall lasted from its start until the last beat.
+            duration = max(current.duration, time.time() - current.started_at - age)
+            finished = Stall(current.started_at, duration, current.stack)
+            with self._lock:
+                self._current = None
+                self.stall_count += 1
+                self._worst.append(finished)
+                self._worst.sort(key=lambda stall: stall.duration, reverse=True)
+                del self._worst[self.keep_worst :]
+            _STALLS.inc()
+            _STALL_SECONDS.observe(duration)
+            log_error(f"[UI] Main loop stalled for {duration:.1f}s in {finished.top_frame}")
+        if now >= self._next_sd_ping:
+            self._next_sd_ping = now + self._sd_interval
+            sd_notify("WATCHDOG=1")
+
+
+_watchdog_lock = threading.Lock()
+_watchdog: UiWatchdog | None = None
+
+
+def get_ui_watchdog() -> UiWatchdog:
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = UiWatchdog()
+        return _watchdog